@@ -7,18 +7,41 @@ class ArffWriter():
         self.file = open(filename, mode='w')
     
     def write(self):
+        self.write_header()
+        for i in range(len(self.attributes[0].values)):
+            for comment in filter(lambda c: c.index == i, self.comments):
+                self.write_comment(comment.comment)
+            self.write_row([a.values[i] for a in self.attributes])
+        self.close()
+    
+    def write_header(self):
+        """
+        Write the relation and attributes, ready for write_row.
+
+        With write_comment, write_row and close this writes a file a row at
+        a time instead of from the attributes' values in one go.
+        """
+        self._pending_comments = []
         self.file.write('@relation ' + self.relation_name + '\n\n')
         for attr in self.attributes:
             # write out attribute metadata
             self.file.write('@attribute ' + attr.name + ' ' + attr.type + '\n')
         self.file.write('\n@data\n')
-        for i in range(len(self.attributes[0].values)):
-            for comment in filter(lambda c: c.index == i, self.comments):
-                self.file.write('% ' + comment.comment + '\n')
-            self.file.write(','.join(map(lambda v: '?' if v == 'None' else v,
-                                    [str(a.values[i]) for a in self.attributes]
-                                    )) 
-                            + '\n')
+    
+    def write_comment(self, comment):
+        """Write a comment before the next row (dropped if there isn't one)."""
+        self._pending_comments.append(comment)
+    
+    def write_row(self, values):
+        for comment in self._pending_comments:
+            self.file.write('% ' + comment + '\n')
+        self._pending_comments = []
+        self.file.write(','.join(map(lambda v: '?' if v == 'None' else v,
+                                [str(v) for v in values]
+                                )) 
+                        + '\n')
+    
+    def close(self):
         self.file.close()
 
 class ArffAttribute():
@@ -32,3 +55,13 @@ class ArffDataComment():
         self.index = index
         self.comment = comment
         
+
+
+def attributes_header(attributes):
+    """
+    Return the names and types of attributes, one "name type" per line.
+
+    Rows saved for later use record this, so they are only reused for the
+    same attributes.
+    """
+    return '\n'.join(a.name + ' ' + a.type for a in attributes)
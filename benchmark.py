@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark the extraction pipeline against synthetic log corpora.
+
+Each stage (parse_event, events_to_submissions, build_features,
+classify_problems and ArffWriter.write) is timed separately for each corpus
+size, along with process_submissions, the fused pass which extract.py
+actually uses in place of build_features, classify_problems and the row
+filter. The results are written out as a JSON baseline which later runs
+can be compared against.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from extract import read_events, classify_problems, build_arff, \
+    process_submissions
+from submission import events_to_submissions, SUBMISSION_EVENT_TYPES
+from features import build_features
+from arffwriter import ArffWriter
+from loggen import generate_corpus, parse_size
+
+DEFAULT_SIZES = '1MB,10MB'
+STAGES = [
+    'parse_event',
+    'events_to_submissions',
+    'build_features',
+    'classify_problems',
+    'process_submissions',
+    'ArffWriter.write'
+]
+
+
+class StageTimer():
+    def __init__(self):
+        self.seconds = dict((stage, 0.0) for stage in STAGES)
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+
+def corpus_dir(base_dir, size, students, skew, seed):
+    return os.path.join(base_dir, 'corpus-{0}-{1}-{2}-{3}'.format(
+        size, students, skew, seed))
+
+
+def ensure_corpus(base_dir, size, students, skew, seed):
+    """
+    Return the log files of a generated corpus, generating it if needed.
+
+    Corpora are cached in base_dir so that large ones are only generated
+    once; a corpus is reused only if its generation completed.
+    """
+    path = corpus_dir(base_dir, size, students, skew, seed)
+    done_marker = os.path.join(path, '.complete')
+    if not os.path.exists(done_marker):
+        paths = generate_corpus(path, size, students, skew, seed)
+        open(done_marker, mode='w').close()
+    else:
+        paths = sorted(os.path.join(path, f) for f in os.listdir(path)
+            if f.endswith('.log'))
+    return paths
+
+
+def benchmark_corpus(paths):
+    timer = StageTimer()
+    events_count = 0
+    submissions_count = 0
+    rows = 0
+    with open(os.devnull, mode='w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        for path in paths:
+            with timer.time('parse_event'):
+                events = read_events(path, wanted=SUBMISSION_EVENT_TYPES)
+            with timer.time('events_to_submissions'):
+                subms = events_to_submissions(events)
+            with timer.time('build_features'):
+                features = build_features(subms)
+            with timer.time('classify_problems'):
+                classify_problems(subms)
+            with timer.time('process_submissions'):
+                data = process_submissions(path, subms)
+            # written a file at a time, so only one file's data is held
+            with timer.time('ArffWriter.write'):
+                writer = ArffWriter(os.devnull, 'features')
+                writer.attributes = build_arff(data)
+                writer.write()
+            events_count += len(events)
+            submissions_count += len(subms)
+            rows += len(writer.attributes[0].values)
+            del events, subms, features, data, writer
+    return timer.seconds, events_count, submissions_count, rows
+
+
+def run(sizes, students, skew, seed, base_dir):
+    results = []
+    for size_str in sizes:
+        size = parse_size(size_str)
+        paths = ensure_corpus(base_dir, size, students, skew, seed)
+        corpus_bytes = sum(os.path.getsize(p) for p in paths)
+        print('Benchmarking {0} ({1} bytes, {2} files)'.format(
+            size_str, corpus_bytes, len(paths)), file=sys.stderr)
+        seconds, events, subms, rows = benchmark_corpus(paths)
+        # process_submissions repeats the work of build_features and
+        # classify_problems, so only one or the other counts to the total
+        total = sum(seconds.values()) - seconds['build_features'] - \
+            seconds['classify_problems']
+        results.append({
+            'size': size_str,
+            'bytes': corpus_bytes,
+            'files': len(paths),
+            'events': events,
+            'submissions': subms,
+            'rows': rows,
+            'seconds': seconds,
+            'total_seconds': total,
+            'mb_per_second': corpus_bytes / 2 ** 20 / total if total else None
+        })
+    return results
+
+
+def print_results(results, baseline=None):
+    baseline_by_size = {}
+    if baseline is not None:
+        baseline_by_size = dict((r['size'], r) for r in baseline['results'])
+    header = '{0:>8} {1:>22} {2:>10} {3:>8}'.format(
+        'size', 'stage', 'seconds', 'vs base')
+    print(header)
+    for result in results:
+        base = baseline_by_size.get(result['size'])
+        for stage in STAGES + ['total']:
+            if stage == 'total':
+                seconds = result['total_seconds']
+                base_seconds = base['total_seconds'] if base else None
+            else:
+                seconds = result['seconds'][stage]
+                base_seconds = base['seconds'].get(stage) if base else None
+            if base_seconds:
+                ratio = '{0:.2f}x'.format(seconds / base_seconds)
+            else:
+                ratio = '-'
+            print('{0:>8} {1:>22} {2:>10.3f} {3:>8}'.format(
+                result['size'], stage, seconds, ratio))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark each stage of the extraction pipeline.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+        help='comma separated corpus sizes, e.g. 1MB,10MB,100MB,1GB,10GB')
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir',
+        default=os.path.join(tempfile.gettempdir(), 'sqltutor-bench'),
+        help='where generated corpora are cached')
+    parser.add_argument('--output', default='benchmark.json',
+        help='file to write the JSON baseline to')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    results = run(args.sizes.split(','), args.students, args.skew,
+        args.seed, args.corpus_dir)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    with open(args.output, mode='w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'students': args.students,
+            'skew': args.skew,
+            'seed': args.seed,
+            'results': results
+        }, f, indent=2)
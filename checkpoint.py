@@ -0,0 +1,228 @@
+"""
+Checkpointed extraction runs, which can be resumed after a crash.
+
+A run's manifest (<out_name>.run.jsonl) is a journal with one JSON record
+appended as each log file finishes, giving the file's status, size, mtime,
+content hash, where its rows were saved (in the <out_name>.run directory)
+and, for a quarantined file, the error. A file whose extraction raises
+anything is quarantined rather than ending the run, and the output is
+assembled from the saved rows of every finished file once all have been
+tried.
+
+Resuming a run skips every file already finished or quarantined, unless it
+has changed since; a crash costs at most the file being extracted at the
+time. Records are only appended, so a crash while writing one loses just
+that record, and the last record for a file is the one that counts.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+MANIFEST_SUFFIX = '.run.jsonl'
+RESULTS_SUFFIX = '.run'
+MANIFEST_VERSION = 2
+
+DONE = 'done'
+QUARANTINED = 'quarantined'
+
+_HASH_BLOCK_SIZE = 2 ** 20
+
+
+def file_digest(path):
+    """Return a hex digest of the contents of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, mode='rb') as f:
+        while True:
+            block = f.read(_HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RunManifest():
+    def __init__(self, prefix, header, resume=False):
+        """
+        Open the manifest of the run writing to prefix (without extension).
+
+        header describes the rows (see arffwriter.attributes_header); a
+        run is only resumed if its rows were extracted for the same one.
+        Otherwise, or without resume, the run starts afresh.
+        """
+        self.path = prefix + MANIFEST_SUFFIX
+        self.results_dir = prefix + RESULTS_SUFFIX
+        self.header = header
+        self.records = {}
+        if resume and not self._load():
+            print('Not resuming {0}: no run for these features to '
+                'resume'.format(self.path))
+            resume = False
+        if not resume:
+            shutil.rmtree(self.results_dir, ignore_errors=True)
+            with open(self.path, mode='w') as f:
+                f.write(json.dumps({'version': MANIFEST_VERSION,
+                    'header': header}) + '\n')
+        os.makedirs(self.results_dir, exist_ok=True)
+        self._file = open(self.path, mode='a')
+
+    def _load(self):
+        """Read the records of an earlier run, returning False if unusable."""
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return False
+        if len(lines) == 0:
+            return False
+        try:
+            start = json.loads(lines[0])
+        except ValueError:
+            return False
+        if start.get('version') != MANIFEST_VERSION or \
+                start.get('header') != self.header:
+            return False
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the run crashed while writing this record
+                continue
+            self.records[record['path']] = record
+        return True
+
+    def close(self):
+        self._file.close()
+
+    def is_finished(self, path):
+        """Return True if path was done or quarantined and is unchanged."""
+        record = self.records.get(path)
+        if record is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if record['size'] == stat.st_size and record['mtime'] == stat.st_mtime:
+            return True
+        # touched, but perhaps not changed
+        return record['size'] == stat.st_size and \
+            record['hash'] == file_digest(path)
+
+    def _append(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        self.records[record['path']] = record
+
+    def _record(self, path, stat, digest, status):
+        return {
+            'path': path,
+            'status': status,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': digest
+        }
+
+    def finish(self, path, stat, digest, filename, rows, carried=()):
+        """
+        Save a file's rows (and the labels carried over after them, see
+        extract.LabelCarry) and record it as done.
+
+        stat and digest are of path from before it was extracted.
+        """
+        output = os.path.join(self.results_dir,
+            hashlib.blake2b(path.encode('utf-8'), digest_size=8).hexdigest() +
+            '.pickle')
+        temp_output = output + '.tmp'
+        with open(temp_output, mode='wb') as f:
+            pickle.dump((filename, rows, list(carried)), f,
+                pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_output, output)
+        record = self._record(path, stat, digest, DONE)
+        record['output'] = output
+        record['rows'] = len(rows)
+        self._append(record)
+
+    def quarantine(self, path, stat, digest, error, line=None):
+        """Record that extracting path raised error, at line if known."""
+        record = self._record(path, stat, digest, QUARANTINED)
+        record['error'] = {
+            'type': type(error).__name__,
+            'message': str(error),
+            'line': line
+        }
+        self._append(record)
+
+    def file_rows(self, paths):
+        """
+        Yield (filename, rows, carried labels) for each done file in paths,
+        in order.
+        """
+        for path in paths:
+            record = self.records.get(path)
+            if record is None or record['status'] != DONE:
+                continue
+            with open(record['output'], mode='rb') as f:
+                yield pickle.load(f)
+
+    def quarantined(self):
+        return [r for r in self.records.values()
+            if r['status'] == QUARANTINED]
+
+
+class _LineCounter():
+    """A text file which counts the lines read from it."""
+    def __init__(self, file):
+        self.file = file
+        self.line = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if len(line) == 0:
+            raise StopIteration
+        return line
+
+    def readline(self):
+        try:
+            line = self.file.readline()
+        except Exception:
+            # the line which couldn't be read
+            self.line += 1
+            raise
+        if len(line) > 0:
+            self.line += 1
+        return line
+
+
+def failure_line(path, error, wanted=None):
+    """
+    Return the line of path at which extracting it raised error, if known.
+
+    The log is parsed again (constructing the wanted event types, as the
+    failed extraction did) to find the line the parse fails on; None is
+    returned if it doesn't, e.g. if the error came from feature extraction.
+    """
+    # imported here as extract imports this module
+    from extract import read_event_stream
+    if isinstance(error, UnicodeDecodeError):
+        with open(path, mode='rb') as f:
+            data = f.read()
+        try:
+            data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            return data.count(b'\n', 0, e.start) + 1
+        return None
+    try:
+        with open(path) as f:
+            counter = _LineCounter(f)
+            try:
+                read_event_stream(counter, wanted)
+            except Exception:
+                return counter.line
+    except OSError:
+        pass
+    return None
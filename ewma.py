@@ -0,0 +1,90 @@
+"""
+Exponentially weighted moving mean and variance.
+
+An EwmaStats weights each value by 2^(-age / half_life), its age counted
+either in values added since it (a half-life in submissions) or in seconds
+between its timestamp and the latest one (a wall-clock half-life), so a
+student's recent submissions count for more than their first ones. Each
+value is added in O(1) time and space, by West's weighted update with
+the running weights decayed before each addition.
+
+In wall-clock time, values at the same time are weighted equally, and a
+value with no timestamp is taken to be at the time of the one before it.
+"""
+import re
+
+from timeutil import NO_TIME
+
+TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+HALF_LIFE_RE = '([0-9]+(?:\\.[0-9]+)?)([smhd]?)'
+
+
+class HalfLife():
+    def __init__(self, length, timed=False):
+        """A half-life of length submissions, or seconds if timed."""
+        if length <= 0:
+            raise ValueError('half-life must be positive')
+        self.length = length
+        self.timed = timed
+
+    def decay(self, steps):
+        """Return the weight left after steps submissions or seconds."""
+        return 2.0 ** (-steps / self.length)
+
+
+def parse_half_life(text):
+    """
+    Convert a half-life such as '8' (submissions) or '30m' (wall-clock
+    time, in s, m, h or d) into a HalfLife.
+    """
+    match = re.fullmatch(HALF_LIFE_RE, text.strip())
+    if not match:
+        raise ValueError("Couldn't parse half-life: " + text)
+    length = float(match.group(1))
+    if match.group(2) == '':
+        return HalfLife(length)
+    return HalfLife(length * TIME_UNITS[match.group(2)], timed=True)
+
+
+class EwmaStats():
+    def __init__(self, half_life):
+        self.half_life = half_life
+        # the decay for each submission, if not timed
+        self._step_decay = half_life.decay(1)
+        self.clear()
+
+    def clear(self):
+        """Forget every value added."""
+        self.count = 0
+        self.mean = None
+        self._weight = 0.0
+        self._sum_squares = 0.0
+        self._last_time = NO_TIME
+
+    def add(self, value, time=NO_TIME):
+        """Add value, submitted at time (int epoch seconds) if timed."""
+        if self.half_life.timed:
+            decay = 1.0
+            if time != NO_TIME:
+                if self._last_time != NO_TIME and time > self._last_time:
+                    decay = self.half_life.decay(time - self._last_time)
+                self._last_time = time
+        else:
+            decay = self._step_decay
+        self.count += 1
+        if self.mean is None:
+            self.mean = float(value)
+            self._weight = 1.0
+            return
+        self._weight = self._weight * decay + 1.0
+        delta = value - self.mean
+        self.mean += delta / self._weight
+        self._sum_squares = self._sum_squares * decay + \
+            delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """The weighted variance, or None before a second value."""
+        if self.count < 2:
+            return None
+        return max(0.0, self._sum_squares / self._weight)
@@ -1,19 +1,34 @@
 #!/usr/bin/env python3
 
 from logevents import parse_event, UnknownEvent
-from submission import events_to_submissions
+from submission import events_to_submissions, SUBMISSION_EVENT_TYPES
 from features import build_features, CumulativeStatisticsFeatureBase, \
-    should_skip_subm, ProblemsAttemptedCumulative
-from arffwriter import ArffWriter, ArffAttribute, ArffDataComment
-import re
-from datetime import datetime
+    should_skip_subm, ProblemsAttemptedCumulative, FEATURES, \
+    MAX_SUFFIX, MIN_SUFFIX, MEAN_SUFFIX, STDEV_SUFFIX, MEDIAN_SUFFIX, \
+    P90_SUFFIX, EWMA_MEAN_SUFFIX, EWMA_VAR_SUFFIX, set_ewma_half_life
+from arffwriter import ArffWriter, ArffAttribute, ArffDataComment, \
+    attributes_header
+from checkpoint import RunManifest, failure_line, file_digest
+from sharding import files_for_shard, shard_name, write_manifest
+from profiling import Profiler, profile_stage
+from store import Store
+from timeutil import timestamp_extract
+from spill import MemoryBudget
+from parallel import extract_parallel, worker_pool
+from pipeline import Pipeline, DEFAULT_READ_AHEAD, DEFAULT_WRITE_BEHIND
+import interning
+from loggen import parse_size
+from sampling import Sampler, parse_class_values
+from ewma import parse_half_life
+import argparse
 import os
 import sys
+import time
+from collections import deque
 
-MAX_SUFFIX = "_max"
-MIN_SUFFIX = "_min"
-MEAN_SUFFIX = "_mean"
-STDEV_SUFFIX = "_stdev"
+# rows are only kept once a session has attempted this many problems
+MIN_PROBLEMS_ATTEMPTED = 2
+CLASS_LABELS = ('abandoned', 'not_abandoned')
 
 class LogFileData():
     def __init__(self, filename, features, classifications):
@@ -22,124 +37,178 @@ class LogFileData():
         self.features = features
 
 
-def timestamp_extract(line):
+def read_events(in_file, profiler=None, wanted=None, skipped=None):
     """
-    Return a datetime and log file line remainder.
-    
-    The timestamp should be in HH:MM:SS DD/MM/YYYY format, where the
-    time is in 24-hour format. The timestamp should be at the
-    beginning of the line. A semicolon may optionally be present at the
-    end of the timestamp (in the log line) which will be stripped.
-    
-    If a conforming timestamp is not found, or if the log file line 
-    does not have the expected structure, a ValueError will be raised.
+    Read a log file into a list of log events.
+
+    If a set of wanted event types is given (such as
+    submission.SUBMISSION_EVENT_TYPES), events of other types are skipped
+    without being constructed and counted by type in the skipped dict, if
+    given.
+    """
+    if profiler is not None:
+        return _read_events_profiled(in_file, profiler, wanted)
+    with open(in_file) as f:
+        return read_event_stream(f, wanted, skipped)
+
+def read_event_stream(f, wanted=None, skipped=None):
+    """
+    Read the log events from an open text file, as for read_events.
+
+    The file need not start at the beginning of a log, e.g. it may hold
+    just some sessions (see sessionindex.py).
     """
-    try:
-        splitted = re.split(' ', line, maxsplit=2)
-        # sometimes there is a stray semicolon...
-        timestampstr = (splitted[0] + ' ' + splitted[1]).strip(';')
-        timestamp = datetime.strptime(timestampstr, '%H:%M:%S %d/%m/%Y')
-        final_value = (timestamp, splitted[2])
-    except ValueError:
-        raise ValueError("Couldn't parse log file timestamp")
-    except IndexError:
-        raise ValueError("Log file line has unexpected structure")
-    return final_value
-
-def extract_data(in_file):
-    """Extract a set of log files into a set of log events"""
     events = []
     no_timestamp_lines = []
     no_timestamps = 0
-    print(in_file)
+    for log_line in f:
+        try:
+            # trying to extract the timestamp
+            # the presence of a timestamp delimits a new log event
+            timestamp, log_line = timestamp_extract(log_line)
+            event = parse_event(timestamp, log_line, f, wanted, skipped)
+            if event is not None:
+                events.append(event)
+        except ValueError:
+            # we don't have a timestamp! oh no!
+            no_timestamps += 1
+            no_timestamp_lines.append(log_line)
+    #print("Found {0} lines with no timestamp".format(no_timestamps))
+    return events
+
+def _read_events_profiled(in_file, profiler, wanted=None):
+    """Instrumented version of read_events, used when profiling."""
+    events = []
+    skipped = {}
+    timer = time.perf_counter
+    cpu_timer = time.process_time
+    ts_wall = ts_cpu = event_wall = event_cpu = 0.0
+    lines = 0
     with open(in_file) as f:
         for log_line in f:
+            lines += 1
+            start, start_cpu = timer(), cpu_timer()
             try:
-                # trying to extract the timestamp
-                # the presence of a timestamp delimits a new log event
                 timestamp, log_line = timestamp_extract(log_line)
-                events.append(parse_event(timestamp, log_line, f))
             except ValueError:
-                # we don't have a timestamp! oh no!
-                no_timestamps += 1
-                no_timestamp_lines.append(log_line)
-    #print("Found {0} lines with no timestamp".format(no_timestamps))
-    unknown_events = filter(lambda x: isinstance(x, UnknownEvent), events)
-    #print("Found {0} unknown log events".format(len(list(unknown_events))))
-    subms = events_to_submissions(events)
-    problems = set()
-    features = build_features(subms)
-
-    problems_feature = next(f for f in features 
-        if isinstance(f, ProblemsAttemptedCumulative))
-    indices_to_delete = []
-    for i in range(len(features[0].values)):
-        if problems_feature.values[i] < 2:
-            indices_to_delete.append(i)
-    indices_to_delete.reverse()
-    for i in indices_to_delete:
+                ts_wall += timer() - start
+                ts_cpu += cpu_timer() - start_cpu
+                continue
+            mid, mid_cpu = timer(), cpu_timer()
+            ts_wall += mid - start
+            ts_cpu += mid_cpu - start_cpu
+            try:
+                event = parse_event(timestamp, log_line, f, wanted, skipped)
+            except ValueError:
+                continue
+            finally:
+                end = timer()
+                event_wall += end - mid
+                event_cpu += cpu_timer() - mid_cpu
+            if event is not None:
+                events.append(event)
+                profiler.add_event(type(event), end - mid)
+    profiler.add_skipped(skipped)
+    profiler.add_stage('timestamp parsing', ts_wall, ts_cpu)
+    profiler.add_stage('event construction', event_wall, event_cpu)
+    profiler.files += 1
+    profiler.lines += lines
+    profiler.bytes += os.path.getsize(in_file)
+    return events
+
+def extract_data(in_file, profiler=None, store=None):
+    """Extract a set of log files into a set of log events"""
+    return process_submissions(in_file,
+        read_submissions(in_file, profiler, store), profiler)
+
+def read_submissions(in_file, profiler=None, store=None):
+    """Return a log file's submissions, from the store if it's current."""
+    print(in_file)
+    if store is not None and store.is_current(in_file):
+        with profile_stage(profiler, 'submission building'):
+            subms = store.load_submissions(in_file)
+    else:
+        # the store keeps every event, otherwise only build what's needed
+        wanted = SUBMISSION_EVENT_TYPES if store is None else None
+        events = read_events(in_file, profiler, wanted)
+        with profile_stage(profiler, 'submission building'):
+            subms = events_to_submissions(events)
+        if store is not None:
+            store.ingest(in_file, events, subms)
+        del events
+    return subms
+
+def process_submissions(filename, subms, profiler=None,
+                        skip=should_skip_subm,
+                        min_problems=MIN_PROBLEMS_ATTEMPTED, expansions=True):
+    """
+    Compute the features and classifications for a log's submissions.
+
+    Labelling, skipping, feature computation and the row filter happen in
+    a single pass over subms (which may be any iterable), looking at most
+    one submission ahead. Rows for sessions with fewer than min_problems
+    problems attempted are dropped from the features as they are computed
+    (see FeatureBase.drop_row) but, as they always have been, not from the
+    labels (see LabelCarry). skip decides which
+    submissions are skipped altogether (see features.SKIP_RULES), and
+    without expansions the cumulative statistics features give only their
+    plain values.
+    """
+    features = [feature() for feature in FEATURES]
+    if not expansions:
         for feature in features:
-            del feature.values[i]
             if isinstance(feature, CumulativeStatisticsFeatureBase):
-                del feature.max_values[i]
-                del feature.min_values[i]
-                del feature.mean_values[i]
-                del feature.stdev_values[i]
-    abandon_state = classify_problems(subms)
-    return LogFileData(in_file, features, abandon_state)
-
-def build_arff(file_data):
+                feature.expansions = False
+    if profiler is not None:
+        if profiler.feature_costs is not None:
+            for feature in features:
+                profiler.feature_costs.wrap(feature)
+        timer = time.perf_counter
+        seconds = [0.0] * len(features)
+    problems_values = next(f for f in features
+        if isinstance(f, ProblemsAttemptedCumulative)).values
+    abandon_state = []
+    rows = 0
+    with profile_stage(profiler, 'feature computation'):
+        for subm, next_subm in _with_next(subms):
+            if skip(subm):
+                continue
+            if profiler is None:
+                for feature in features:
+                    feature.new_submission(subm)
+            else:
+                for i, feature in enumerate(features):
+                    start = timer()
+                    feature.new_submission(subm)
+                    seconds[i] += timer() - start
+            if problems_values[-1] < min_problems:
+                for feature in features:
+                    feature.drop_row()
+            abandon_state.append(classify_submission(subm, next_subm, skip))
+            rows += 1
+    if profiler is not None:
+        for feature, feature_seconds in zip(features, seconds):
+            profiler.add_feature(type(feature), rows, feature_seconds)
+    return LogFileData(filename, features, abandon_state)
+
+def _with_next(iterable):
+    """Yield (item, next item) pairs, with None after the last item."""
+    iterator = iter(iterable)
+    current = next(iterator, None)
+    while current is not None:
+        following = next(iterator, None)
+        yield current, following
+        current = following
+
+def build_arff(file_data, expansions=None):
     attributes = []
     for feature in file_data.features:
-        if isinstance(feature, CumulativeStatisticsFeatureBase):
-            attributes.append(
-                ArffAttribute(
-                    feature.name + MAX_SUFFIX,
-                    feature.type,
-                    feature.max_values
-                )
-            )
-            attributes.append(
-                ArffAttribute(
-                    feature.name + MIN_SUFFIX,
-                    feature.type,
-                    feature.min_values
-                )
-            )
-            attributes.append(
-                ArffAttribute(
-                    feature.name + MEAN_SUFFIX,
-                    feature.type,
-                    feature.mean_values
-                )
-            )
-            attributes.append(
-                ArffAttribute(
-                    feature.name + STDEV_SUFFIX,
-                    feature.type,
-                    feature.stdev_values
-                )
-            )
-            if feature.use_values():
-                attributes.append(
-                    ArffAttribute(
-                        feature.name,
-                        feature.type,
-                        feature.values
-                    )
-                )
-        else:
-            attributes.append(
-                ArffAttribute(
-                    feature.name,
-                    feature.type,
-                    feature.values
-                )
-            )
+        for name, type, values in feature.columns(expansions):
+            attributes.append(ArffAttribute(name, type, values))
     attributes.append(
         ArffAttribute(
             "Class",
-            "{abandoned, not_abandoned}",
+            '{' + ', '.join(CLASS_LABELS) + '}',
             file_data.classifications
         )
     )
@@ -150,32 +219,51 @@ def classify_problems(subms):
     for i in range(len(subms)):
         if should_skip_subm(subms[i]):
             continue
-        outcome = None
-        if subms[i].solved:
-            outcome = 'not_abandoned'
-        elif len(subms) <= i+1:
-            outcome = 'abandoned'
-        elif subms[i].problem_id == subms[i+1].problem_id:
-            if should_skip_subm(subms[i+1]):
-                outcome = 'abandoned'
-            else:
-                outcome = 'not_abandoned'
+        if len(subms) <= i+1:
+            result.append(classify_submission(subms[i], None))
         else:
-            outcome = 'abandoned'
-        result.append(outcome)
+            result.append(classify_submission(subms[i], subms[i+1]))
     return result
 
-def main(dir_path, out_name):
-    files = filter(
-        lambda f: f.is_file() and f.name.endswith('.log'), 
-        os.scandir(dir_path)
+def classify_submission(subm, next_subm, skip=should_skip_subm):
+    """Label subm as abandoned or not, given the submission after it."""
+    if subm.solved:
+        return 'not_abandoned'
+    elif next_subm is None:
+        return 'abandoned'
+    elif subm.problem_id == next_subm.problem_id:
+        if skip(next_subm):
+            return 'abandoned'
+        else:
+            return 'not_abandoned'
+    else:
+        return 'abandoned'
+
+def log_files(dir_path):
+    """Return the paths of all log files in dir_path, in a stable order."""
+    return sorted(
+        f.path for f in os.scandir(dir_path)
+        if f.is_file() and f.name.endswith('.log')
     )
-    file_data = []
-    for file in files:
+
+def extract_each(paths, profiler=None, store=None):
+    """Yield the LogFileData of each log file in paths, one at a time."""
+    for path in paths:
         try:
-            file_data.append(extract_data(file.path))
+            yield extract_data(path, profiler, store)
         except UnicodeDecodeError:
-            print("Couldn't decode file in utf-8: " + file.path)
+            print("Couldn't decode file in utf-8: " + path)
+
+def extract_files(paths, profiler=None, store=None):
+    return list(extract_each(paths, profiler, store))
+
+def write_arff(out_path, file_data, profiler=None):
+    """
+    Merge the data from each log file and write it to a single ARFF file.
+
+    Returns the merged attributes and the comments which mark where each
+    log file's rows begin.
+    """
     arff_attrs = []
     arff_comments = []
     instances = 0
@@ -190,11 +278,426 @@ def main(dir_path, out_name):
                 assert type(arff_attr) == type(file_attr)
                 assert arff_attr.name == file_attr.name
                 arff_attr.values += file_attr.values
-    writer = ArffWriter(out_name + '.arff', 'features')
-    writer.attributes = arff_attrs
-    writer.comments = arff_comments
-    writer.write()
-    
+    if len(arff_attrs) == 0:
+        # no rows, but we still want a valid header
+        arff_attrs = build_arff(LogFileData(None, build_features([]), []))
+    with profile_stage(profiler, 'arff writing'):
+        writer = ArffWriter(out_path, 'features')
+        writer.attributes = arff_attrs
+        writer.comments = arff_comments
+        writer.write()
+    return arff_attrs, arff_comments
+
+def data_columns(file_data):
+    """
+    Return the columns of a log file's rows, and the labels left over.
+
+    The row filter drops rows' features but not their labels, so once a
+    row has been filtered a file has more labels than rows. Its rows take
+    the first of them, and the rest are carried over to the rows written
+    after it (see LabelCarry).
+    """
+    columns = [a.values for a in build_arff(file_data)]
+    rows = len(columns[0])
+    return columns[:-1] + [columns[-1][:rows]], columns[-1][rows:]
+
+def data_rows(file_data):
+    """Return the rows of a log file as tuples, and the labels left over."""
+    columns, carried = data_columns(file_data)
+    return list(zip(*columns)), carried
+
+class LabelCarry():
+    """
+    Relabel rows as write_arff labels them.
+
+    Writing a whole dataset at once, every row takes the next label from
+    the labels of all the log files in turn, filtered rows' labels
+    included, so after the first filtered row each row is given a later
+    submission's label. Streamed rows are relabelled to match, a log file
+    at a time.
+
+    The labels waiting to be taken, one for each filtered row so far, are
+    kept a log file at a time in a SpillBuffer, so they count towards the
+    budget (a MemoryBudget) if one is given.
+    """
+    def __init__(self, budget=None):
+        self._labels = deque()
+        self._later = (budget or MemoryBudget()).buffer()
+
+    def relabel(self, rows, carried):
+        """Return rows with the labels they're written with."""
+        if len(self._labels) == 0 and len(self._later) == 0 and \
+                len(carried) == 0:
+            return rows
+        self._later.add(tuple(row[-1] for row in rows) + tuple(carried))
+        relabelled = []
+        for row in rows:
+            while len(self._labels) == 0:
+                self._labels.extend(self._later.popleft())
+            relabelled.append(row[:-1] + (self._labels.popleft(),))
+        return relabelled
+
+def _carry_labels(file_rows, budget=None):
+    carry = LabelCarry(budget)
+    for filename, rows, carried in file_rows:
+        yield filename, carry.relabel(rows, carried)
+
+def extracted_rows(paths, profiler=None, store=None, pool=None,
+                   workers=None):
+    """
+    Yield (filename, rows, carried labels) for each log file in paths, in
+    order.
+
+    Given a pool of workers (see parallel.py), the files are extracted in
+    parallel.
+    """
+    if pool is not None:
+        yield from extract_parallel(pool, paths, workers)
+        return
+    for path in paths:
+        try:
+            data = extract_data(path, profiler, store)
+        except UnicodeDecodeError:
+            print("Couldn't decode file in utf-8: " + path)
+            continue
+        rows, carried = data_rows(data)
+        yield data.filename, rows, carried
+
+def write_arff_rows(out_path, file_rows, memory_limit=None, profiler=None,
+                    sampler=None):
+    """
+    Write the rows of each log file to a single ARFF file, a row at a time.
+
+    file_rows yields (filename, rows, carried labels) for each log file, as
+    from extracted_rows, so at most one file's features need be in memory
+    at once. Rows are relabelled as write_arff would (see LabelCarry).
+    Given a sampler (see sampling.py), rows are sampled by class on
+    their way through.
+
+    Rows are written as soon as they arrive, so the only buffers that grow
+    over a run are the labels carried between files and any sampler
+    reservoirs. Given a memory_limit in bytes, these share a MemoryBudget
+    (see spill.py) and are spilled to temporary files beyond it. Returns
+    the attributes (without values), the comments and the number of rows.
+    """
+    attrs = build_arff(LogFileData(None, build_features([]), []))
+    budget = MemoryBudget(memory_limit)
+    file_rows = _carry_labels(file_rows, budget)
+    if sampler is not None:
+        file_rows = sampler.sample(file_rows, budget)
+    comments = []
+    rows = 0
+    try:
+        with profile_stage(profiler, 'arff writing'):
+            writer = ArffWriter(out_path, 'features')
+            writer.attributes = attrs
+            writer.write_header()
+        for filename, records in file_rows:
+            with profile_stage(profiler, 'arff writing'):
+                comments.append(ArffDataComment(rows, filename))
+                writer.write_comment(filename)
+                for row in records:
+                    writer.write_row(row)
+                rows += len(records)
+        with profile_stage(profiler, 'arff writing'):
+            writer.close()
+    finally:
+        budget.close()
+    if budget.spills > 0:
+        print("Spilled {0} bytes of labels and samples to disk".format(
+            budget.spilled_bytes))
+    if sampler is not None:
+        print(sampler.summary())
+    return attrs, comments, rows
+
+def write_pipelined(out_path, paths, memory_limit=None, pool=None,
+                    workers=None, queue_depths=None, sampler=None):
+    """
+    Write the rows of paths as write_arff_rows, reading, parsing and writing
+    in a pipeline (see pipeline.py), and print its stage utilization.
+
+    queue_depths is the number of files read ahead and waiting to be
+    written.
+    """
+    read_ahead, write_behind = queue_depths or \
+        (DEFAULT_READ_AHEAD, DEFAULT_WRITE_BEHIND)
+    pipeline = Pipeline(paths, read_ahead, write_behind, pool, workers)
+    result = pipeline.run(out_path, memory_limit, sampler)
+    print(pipeline.report())
+    return result
+
+def extract_checkpointed(paths, run, profiler=None, store=None):
+    """
+    Extract each log file in paths not yet finished in run (a RunManifest),
+    saving its rows as it completes and quarantining it if it fails.
+    """
+    wanted = SUBMISSION_EVENT_TYPES if store is None else None
+    for path in paths:
+        if run.is_finished(path):
+            continue
+        stat = os.stat(path)
+        digest = file_digest(path)
+        try:
+            data = extract_data(path, profiler, store)
+        except Exception as e:
+            line = failure_line(path, e, wanted)
+            run.quarantine(path, stat, digest, e, line)
+            print('Quarantined {0}{1}: {2}: {3}'.format(path,
+                '' if line is None else ' (line {0})'.format(line),
+                type(e).__name__, e))
+            continue
+        rows, carried = data_rows(data)
+        run.finish(path, stat, digest, data.filename, rows, carried)
+
+def write_checkpointed(prefix, paths, resume=False, profiler=None,
+                       store=None, memory_limit=None, sampler=None):
+    """
+    Write the rows of paths to prefix.arff as write_arff_rows, through a
+    run manifest (see checkpoint.py) which lets a crashed run be resumed.
+    """
+    header = attributes_header(
+        build_arff(LogFileData(None, build_features([]), [])))
+    run = RunManifest(prefix, header, resume)
+    try:
+        extract_checkpointed(paths, run, profiler, store)
+        result = write_arff_rows(prefix + '.arff', run.file_rows(paths),
+            memory_limit, profiler, sampler)
+    finally:
+        run.close()
+    quarantined = run.quarantined()
+    if len(quarantined) > 0:
+        print('{0} files quarantined, see {1}'.format(len(quarantined),
+            run.path))
+    return result
+
+def write_shard(paths, out_name, shard_index, shard_count, profiler=None,
+                store=None, memory_limit=None, pool=None, workers=None,
+                queue_depths=None, checkpoint=False, resume=False,
+                sampler=None):
+    shard_paths = files_for_shard(paths, shard_index, shard_count)
+    prefix = shard_name(out_name, shard_index, shard_count)
+    if checkpoint:
+        attrs, comments, rows = write_checkpointed(prefix, shard_paths,
+            resume, profiler, store, memory_limit, sampler)
+    elif queue_depths is not None:
+        attrs, comments, rows = write_pipelined(prefix + '.arff',
+            shard_paths, memory_limit, pool, workers, queue_depths, sampler)
+    else:
+        attrs, comments, rows = write_arff_rows(prefix + '.arff',
+            extracted_rows(shard_paths, profiler, store, pool, workers),
+            memory_limit, profiler, sampler)
+    write_manifest(out_name, shard_index, shard_count, attrs, comments, rows)
+
+def main(dir_path, out_name, shard_count=None, shard_index=None,
+         profile=False, profile_features=False, store_path=None,
+         memory_limit=None, workers=None, queue_depths=None,
+         solution_limit=interning.DEFAULT_SOLUTION_LIMIT, checkpoint=False,
+         resume=False, variants=None, sampler=None, ewma_half_life=None):
+    # before any worker processes are started, so they see it too
+    interning.set_solution_limit(solution_limit)
+    set_ewma_half_life(ewma_half_life)
+    profiler = None
+    if profile or profile_features:
+        profiler = Profiler(feature_costs=profile_features)
+    if profile_features:
+        profiler.feature_costs.start()
+    store = None
+    pool = None
+    if workers is not None:
+        # each worker opens the store itself
+        pool = worker_pool(workers, store_path)
+    elif store_path is not None:
+        store = Store(store_path)
+    paths = log_files(dir_path)
+    if sampler is not None:
+        paths = sampler.select_files(paths)
+        print('Sampled {0} log files'.format(len(paths)))
+        if not sampler.samples_rows:
+            sampler = None
+    if variants is not None:
+        # imported here as variants imports this module
+        from variants import write_variants
+        write_variants(paths, out_name, variants, profiler, store)
+    elif shard_count is None:
+        if checkpoint:
+            write_checkpointed(out_name, paths, resume, profiler, store,
+                memory_limit, sampler)
+        elif queue_depths is not None:
+            write_pipelined(out_name + '.arff', paths, memory_limit, pool,
+                workers, queue_depths, sampler)
+        else:
+            write_arff_rows(out_name + '.arff',
+                extracted_rows(paths, profiler, store, pool, workers),
+                memory_limit, profiler, sampler)
+    elif shard_index is None:
+        for i in range(shard_count):
+            write_shard(paths, out_name, i, shard_count, profiler, store,
+                memory_limit, pool, workers, queue_depths, checkpoint,
+                resume, sampler)
+    else:
+        write_shard(paths, out_name, shard_index, shard_count, profiler,
+            store, memory_limit, pool, workers, queue_depths, checkpoint,
+            resume, sampler)
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if store is not None:
+        store.close()
+    if profile_features:
+        profiler.feature_costs.stop()
+    if profiler is not None:
+        print(profiler.summary())
+        profiler.write_json(out_name + '.profile.json')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Extract features from SQL-Tutor log files.')
+    parser.add_argument('dir_path', help='directory containing .log files')
+    parser.add_argument('out_name', help='output name (without extension)')
+    parser.add_argument('--shards', type=int, dest='shard_count',
+        help='partition the output into this many shards, by log file')
+    parser.add_argument('--shard-index', type=int,
+        help='only produce this shard (for running shards as separate '
+             'workers); requires --shards')
+    parser.add_argument('--profile', action='store_true',
+        help='report time spent in each stage, also written to '
+             '<out_name>.profile.json')
+    parser.add_argument('--profile-features', action='store_true',
+        help='also rank feature classes by time and memory allocated per '
+             'call, and how that grows with history length (implies '
+             '--profile)')
+    parser.add_argument('--store', dest='store_path',
+        help='SQLite store (see store.py) to load unchanged log files from '
+             'instead of re-parsing them; new or changed files are parsed '
+             'and ingested into it')
+    parser.add_argument('--memory-limit',
+        help='keep carried labels and reservoir samples within this much '
+             'memory (e.g. 512MB), spilling the rest to temporary files')
+    parser.add_argument('--workers', type=int,
+        help='extract log files in this many worker processes')
+    parser.add_argument('--pipeline', action='store_true',
+        help='overlap reading, parsing and writing of log files, and report '
+             'the utilization of each stage')
+    parser.add_argument('--read-ahead', type=int, default=DEFAULT_READ_AHEAD,
+        help='with --pipeline, log files to read ahead of parsing '
+             '(default %(default)s)')
+    parser.add_argument('--write-behind', type=int,
+        default=DEFAULT_WRITE_BEHIND,
+        help='with --pipeline, parsed log files which may wait to be '
+             'written (default %(default)s)')
+    parser.add_argument('--intern-solutions', type=int,
+        default=interning.DEFAULT_SOLUTION_LIMIT,
+        help='share one copy of each of at most this many distinct '
+             'solutions, least recently used dropped first (default '
+             '%(default)s, 0 for no limit)')
+    parser.add_argument('--checkpoint', action='store_true',
+        help='save each log file\'s rows as it completes, recording them '
+             'in <out_name>.run.jsonl, and quarantine files which fail '
+             'instead of stopping')
+    parser.add_argument('--resume', action='store_true',
+        help='resume a --checkpoint run, skipping the log files it '
+             'finished (implies --checkpoint)')
+    parser.add_argument('--variants',
+        help='JSON config of dataset variants (see variants.py) to write '
+             'from a single parse, each to <out_name>.<variant>.arff')
+    parser.add_argument('--sample-files', type=float, metavar='FRACTION',
+        help='only extract this fraction of the log files, chosen at random '
+             'by --seed')
+    parser.add_argument('--undersample', action='append', default=[],
+        metavar='CLASS=RATIO',
+        help='keep each row of CLASS with probability RATIO (may be repeated)')
+    parser.add_argument('--reservoir', action='append', default=[],
+        metavar='CLASS=N',
+        help='keep a uniform random sample of N rows of CLASS in each output '
+             'file, written after the other rows (may be repeated)')
+    parser.add_argument('--seed', type=int, default=0,
+        help='seed for --sample-files, --undersample and --reservoir '
+             '(default %(default)s)')
+    parser.add_argument('--ewma-half-life',
+        help='add exponentially weighted mean and variance columns to each '
+             'cumulative statistics feature, with this half-life in '
+             'submissions (e.g. 8) or wall-clock time (e.g. 30m, 2h)')
+    args = parser.parse_args(argv)
+    if args.shard_index is not None:
+        if args.shard_count is None:
+            parser.error('--shard-index requires --shards')
+        if not 0 <= args.shard_index < args.shard_count:
+            parser.error('--shard-index must be in range [0, --shards)')
+    if args.shard_count is not None and args.shard_count < 1:
+        parser.error('--shards must be at least 1')
+    if args.workers is not None:
+        if args.workers < 1:
+            parser.error('--workers must be at least 1')
+        if args.profile or args.profile_features:
+            parser.error("--profile can't be used with --workers")
+    if args.intern_solutions < 0:
+        parser.error('--intern-solutions must not be negative')
+    args.solution_limit = args.intern_solutions or None
+    args.checkpoint = args.checkpoint or args.resume
+    if args.checkpoint and (args.workers is not None or args.pipeline):
+        parser.error("--checkpoint can't be used with --workers or "
+            "--pipeline")
+    if args.variants is not None:
+        if args.shard_count is not None or args.workers is not None or \
+                args.pipeline or args.checkpoint or \
+                args.memory_limit is not None:
+            parser.error("--variants can't be used with --shards, "
+                "--workers, --pipeline, --checkpoint or --memory-limit")
+        from variants import load_variants
+        try:
+            args.variants = load_variants(args.variants)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    args.queue_depths = None
+    if args.pipeline:
+        if args.read_ahead < 1 or args.write_behind < 1:
+            parser.error('--read-ahead and --write-behind must be at least 1')
+        if args.profile or args.profile_features:
+            parser.error("--profile can't be used with --pipeline")
+        if args.store_path is not None:
+            parser.error("--store can't be used with --pipeline")
+        args.queue_depths = (args.read_ahead, args.write_behind)
+    if args.memory_limit is not None:
+        try:
+            args.memory_limit = parse_size(args.memory_limit)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.ewma_half_life is not None:
+        try:
+            args.ewma_half_life = parse_half_life(args.ewma_half_life)
+        except ValueError as e:
+            parser.error(str(e))
+    args.sampler = None
+    if args.sample_files is not None or args.undersample or args.reservoir:
+        if args.sample_files is not None and \
+                not 0 < args.sample_files <= 1:
+            parser.error('--sample-files must be in range (0, 1]')
+        try:
+            undersample = parse_class_values(args.undersample, CLASS_LABELS,
+                float)
+            reservoir = parse_class_values(args.reservoir, CLASS_LABELS, int)
+        except ValueError as e:
+            parser.error(str(e))
+        if any(not 0 <= r <= 1 for r in undersample.values()):
+            parser.error('--undersample ratios must be in range [0, 1]')
+        if any(n < 1 for n in reservoir.values()):
+            parser.error('--reservoir sizes must be at least 1')
+        if set(undersample) & set(reservoir):
+            parser.error("a class can't be both undersampled and reservoir "
+                "sampled")
+        if args.variants is not None and (undersample or reservoir):
+            parser.error("--undersample and --reservoir can't be used with "
+                "--variants")
+        args.sampler = Sampler(args.seed, args.sample_files, undersample,
+            reservoir)
+    return args
+
 
 if __name__ == '__main__':
-    main(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    args = parse_args(sys.argv[1:])
+    main(args.dir_path, args.out_name, args.shard_count, args.shard_index,
+        args.profile, args.profile_features, args.store_path,
+        args.memory_limit, args.workers, args.queue_depths,
+        args.solution_limit, args.checkpoint, args.resume, args.variants,
+        args.sampler, args.ewma_half_life)
@@ -1,6 +1,23 @@
 import logevents
+from submission import count_bits, from_bitset
+from timeutil import NO_TIME, elapsed
+from quantiles import QuantileSketch
+from ewma import EwmaStats
 from abc import abstractmethod, ABCMeta
 from statistics import mean, stdev
+from math import isnan
+
+CLAUSES = logevents.StudentModelClauseEvent.CLAUSES
+COMPLEXITY_FILE = 'complexity-data.txt'
+
+MAX_SUFFIX = "_max"
+MIN_SUFFIX = "_min"
+MEAN_SUFFIX = "_mean"
+STDEV_SUFFIX = "_stdev"
+MEDIAN_SUFFIX = "_median"
+P90_SUFFIX = "_p90"
+EWMA_MEAN_SUFFIX = "_ewma_mean"
+EWMA_VAR_SUFFIX = "_ewma_var"
 
 class FeatureBase(metaclass=ABCMeta):
     """Base class for features."""
@@ -32,6 +49,22 @@ class FeatureBase(metaclass=ABCMeta):
     def values(self):
         return self._values
     
+    def drop_row(self):
+        """
+        Drop the latest submission's row from the columns.
+
+        The submission still counts towards the rows of later submissions.
+        """
+        self._values.pop()
+    
+    def columns(self, expansions=None):
+        """
+        Return (name, type, values) for each ARFF column of the feature.
+
+        expansions only matters to CumulativeStatisticsFeatureBase.
+        """
+        return [(self.name, self.type, self._values)]
+    
     def clear_submissions(self):
         self._last_submission = None
         self._submission = None
@@ -42,6 +75,13 @@ class FeatureBase(metaclass=ABCMeta):
 
 
 class CumulativeStatisticsFeatureBase(FeatureBase, metaclass=ABCMeta):
+    # set False on an instance to skip computing the max, min, mean, stdev
+    # and quantiles, whose columns are then replaced by the plain values
+    expansions = True
+    # a HalfLife (see ewma.py) adds exponentially weighted mean and variance
+    # columns; set with set_ewma_half_life
+    ewma_half_life = None
+
     def __init__(self):
         super().__init__()
         self._mean_values = []
@@ -52,16 +92,39 @@ class CumulativeStatisticsFeatureBase(FeatureBase, metaclass=ABCMeta):
         self._max_values_src = []
         self._min_values = []
         self._min_values_src = []
+        # the max and min so far (missing values aside), over every
+        # submission including those whose rows were dropped
+        self._max = None
+        self._min = None
+        # the median and p90 are approximate (see quantiles.py), as exact
+        # ones would mean sorting the whole history for every submission
+        self._quantiles_src = QuantileSketch()
+        self._median_values = []
+        self._p90_values = []
+        self._ewma_src = None
+        if self.ewma_half_life is not None:
+            self._ewma_src = EwmaStats(self.ewma_half_life)
+        self._ewma_mean_values = []
+        self._ewma_var_values = []
     
     def new_submission(self, submission):
         super().new_submission(submission)
+        if not self.expansions:
+            return
         if self.clear_src_values_for_session():
             self._mean_values_src = []
             self._stdev_values_src = []
             self._max_values_src = []
             self._min_values_src = []
+            self._quantiles_src.clear()
+            if self._ewma_src is not None:
+                self._ewma_src.clear()
         if self.should_add_mean():
             self._mean_values_src.append(self._values[-1])
+            self._quantiles_src.add(self._values[-1])
+            if self._ewma_src is not None:
+                self._ewma_src.add(self._values[-1],
+                    self._submission.submit_ts)
         if len(self._mean_values_src) > 0:
             self._mean_values.append(mean(self._mean_values_src))
         else:
@@ -72,16 +135,62 @@ class CumulativeStatisticsFeatureBase(FeatureBase, metaclass=ABCMeta):
             self._stdev_values.append(stdev(self._stdev_values_src))
         else:
             self._stdev_values.append(None)
-        self._max_values.append(
-            max(
-                filter(
-                    lambda v: v is not None, self._values),
-                default=None))
-        self._min_values.append(
-            min(
-                filter(
-                    lambda v: v is not None, self._values),
-                default=None))
+        value = self._values[-1]
+        if value is not None:
+            # as max and min do, keep the first of equal values
+            if self._max is None or value > self._max:
+                self._max = value
+            if self._min is None or value < self._min:
+                self._min = value
+        self._max_values.append(self._max)
+        self._min_values.append(self._min)
+        self._median_values.append(self._quantiles_src.quantile(0.5))
+        self._p90_values.append(self._quantiles_src.quantile(0.9))
+        if self._ewma_src is not None:
+            self._ewma_mean_values.append(self._ewma_src.mean)
+            self._ewma_var_values.append(self._ewma_src.variance)
+    
+    def drop_row(self):
+        super().drop_row()
+        if not self.expansions:
+            return
+        for values in (self._max_values, self._min_values,
+                self._mean_values, self._stdev_values, self._median_values,
+                self._p90_values):
+            values.pop()
+        if self._ewma_src is not None:
+            self._ewma_mean_values.pop()
+            self._ewma_var_values.pop()
+    
+    def columns(self, expansions=None):
+        """
+        Return the max, min, mean, stdev, median and p90 columns (then the
+        EWMA mean and variance, if computed, and the values, if
+        use_values), or just the values if not expansions.
+
+        expansions defaults to the instance's; the statistics can only be
+        given if they were computed.
+        """
+        if expansions is None:
+            expansions = self.expansions
+        if not expansions:
+            return [(self.name, self.type, self._values)]
+        columns = [
+            (self.name + MAX_SUFFIX, self.type, self._max_values),
+            (self.name + MIN_SUFFIX, self.type, self._min_values),
+            (self.name + MEAN_SUFFIX, self.type, self._mean_values),
+            (self.name + STDEV_SUFFIX, self.type, self._stdev_values),
+            (self.name + MEDIAN_SUFFIX, self.type, self._median_values),
+            (self.name + P90_SUFFIX, self.type, self._p90_values)
+        ]
+        if self._ewma_src is not None:
+            columns.append((self.name + EWMA_MEAN_SUFFIX, self.type,
+                self._ewma_mean_values))
+            columns.append((self.name + EWMA_VAR_SUFFIX, self.type,
+                self._ewma_var_values))
+        if self.use_values():
+            columns.append((self.name, self.type, self._values))
+        return columns
     
     def clear_src_values_for_session(self):
         return False
@@ -101,6 +210,22 @@ class CumulativeStatisticsFeatureBase(FeatureBase, metaclass=ABCMeta):
     def stdev_values(self):
         return self._stdev_values
     
+    @property
+    def median_values(self):
+        return self._median_values
+    
+    @property
+    def p90_values(self):
+        return self._p90_values
+    
+    @property
+    def ewma_mean_values(self):
+        return self._ewma_mean_values
+    
+    @property
+    def ewma_var_values(self):
+        return self._ewma_var_values
+    
     @property
     def max_values(self):
         return self._max_values
@@ -133,18 +258,16 @@ class TimeUntilFirstSubmission(CumulativeStatisticsFeatureBase):
             self._submission.problem_id is not None:
             self._current_prob_id = self._submission.problem_id
             self._current_prob_first_submission = self._submission
-        if self._current_prob_first_submission is not None and \
-            self._current_prob_first_submission.begin_time is not None:
-            return (self._current_prob_first_submission.submit_time -
-                     self._current_prob_first_submission.begin_time) \
-                    .total_seconds()
+        if self._current_prob_first_submission is not None:
+            return elapsed(self._current_prob_first_submission.submit_ts,
+                self._current_prob_first_submission.begin_ts)
         else:
             return None
     
     def should_add_mean(self):
         return self._current_prob_id is not None and \
             self._current_prob_first_submission is not None and \
-            self._current_prob_first_submission.begin_time is not None
+            self._current_prob_first_submission.begin_ts != NO_TIME
     
     def should_add_stdev(self):
         return self.should_add_mean()
@@ -186,7 +309,7 @@ class ViolatedConstraints(CumulativeStatisticsFeatureBase):
     
     def _submission_value(self):
         if self._submission.solution is not None:
-            return len(self._submission.violated_constraints)
+            return self._submission.violated_count
         else:
             return None
     
@@ -211,7 +334,7 @@ class SatisfiedConstraints(FeatureBase):
     
     def _submission_value(self):
         if self._submission.solution is not None:
-            return len(self._submission.satisfied_constraints)
+            return self._submission.satisfied_count
         else:
             return None
     
@@ -251,8 +374,8 @@ class DecreasedViolatedConstraints(FeatureBase):
         if self._last_submission is None:
             return None
         else:
-            return len(self._submission.violated_constraints) < \
-                len(self._last_submission.violated_constraints)
+            return self._submission.violated_count < \
+                self._last_submission.violated_count
                 
 
 class TimeSincePreviousSubmission(FeatureBase):
@@ -267,14 +390,11 @@ class TimeSincePreviousSubmission(FeatureBase):
     def _submission_value(self):
         if self._last_submission is None:
             return None
-        elif self._submission.begin_session is not None:
+        elif self._submission.begin_session_ts != NO_TIME:
             return None
         else:
-            try:
-                return (self._submission.submit_time - 
-                    self._last_submission.submit_time).total_seconds()
-            except TypeError:
-                return None
+            return elapsed(self._submission.submit_ts,
+                self._last_submission.submit_ts)
 
 
 class ProblemTimeFromStart(FeatureBase):
@@ -289,20 +409,13 @@ class ProblemTimeFromStart(FeatureBase):
     def __init__(self):
         super().__init__()
         self._current_problem_id = None
-        self._problem_start_time = None
+        self._problem_start_time = NO_TIME
     
     def _submission_value(self):
-        try:
-            if self._current_problem_id == self._submission.problem_id:
-                return (self._submission.submit_time 
-                    - self._problem_start_time).total_seconds()
-            else:
-                self._current_problem_id = self._submission.problem_id
-                self._problem_start_time = self._submission.begin_time
-                return (self._submission.submit_time - 
-                    self._submission.begin_time).total_seconds()
-        except TypeError:
-            return None
+        if self._current_problem_id != self._submission.problem_id:
+            self._current_problem_id = self._submission.problem_id
+            self._problem_start_time = self._submission.begin_ts
+        return elapsed(self._submission.submit_ts, self._problem_start_time)
                 
                 
 class SubmissionNumber(FeatureBase):
@@ -339,18 +452,14 @@ class SessionTimeFromStart(FeatureBase):
     
     def __init__(self):
         super().__init__()
-        self._session_start = None
+        self._session_start = NO_TIME
     
     def _submission_value(self):
-        try:
-            if self._submission.begin_session is not None:
-                self._session_start = self._submission.begin_session
-            time = (self._submission.submit_time - 
-                self._session_start).total_seconds()
-            assert time >= 0
-            return time
-        except TypeError:
-            return None
+        if self._submission.begin_session_ts != NO_TIME:
+            self._session_start = self._submission.begin_session_ts
+        time = elapsed(self._submission.submit_ts, self._session_start)
+        assert time is None or time >= 0
+        return time
 
 
 class SubmissionTimeDifference(FeatureBase):
@@ -366,11 +475,9 @@ class SubmissionTimeDifference(FeatureBase):
         if self._last_submission is None:
             return None
         else:
-            try:
-                return (self._submission.submit_time - 
-                    self._last_submission.submit_time).total_seconds() ** 2
-            except TypeError:
-                return None
+            time = elapsed(self._submission.submit_ts,
+                self._last_submission.submit_ts)
+            return None if time is None else time ** 2
 
 
 class FirstSubmitTimePrev(PreviousProblemFeatureBase):
@@ -384,11 +491,7 @@ class FirstSubmitTimePrev(PreviousProblemFeatureBase):
     
     def _submission_value(self):
         first_sub = self._prev_prob_submissions[0]
-        try:
-            return (first_sub.submit_time - 
-                first_sub.begin_time).total_seconds()
-        except TypeError:
-            return None
+        return elapsed(first_sub.submit_ts, first_sub.begin_ts)
 
 
 class TimeTakenPrev(PreviousProblemFeatureBase):
@@ -403,14 +506,10 @@ class TimeTakenPrev(PreviousProblemFeatureBase):
     def _submission_value(self):
         first_sub = self._prev_prob_submissions[0]
         last_sub = self._prev_prob_submissions[-1]
-        try:
-            time = (last_sub.submit_time - 
-                first_sub.begin_time).total_seconds()
-            if time > 1000000:
-                print(last_sub.submit_time)
-                print(first_sub.begin_time)
-        except TypeError:
-            return None
+        time = elapsed(last_sub.submit_ts, first_sub.begin_ts)
+        if time is not None and time > 1000000:
+            print(last_sub.submit_time)
+            print(first_sub.begin_time)
 
 
 class CompletedPrev(PreviousProblemFeatureBase):
@@ -449,8 +548,7 @@ class MaxViolatedConstraints(PreviousProblemFeatureBase):
         return "numeric"
     
     def _submission_value(self):
-        return max([len(s.violated_constraints) 
-            for s in self._prev_prob_submissions])
+        return max([s.violated_count for s in self._prev_prob_submissions])
 
 
 class NumberWrongSubmissions(PreviousProblemFeatureBase):
@@ -467,6 +565,12 @@ class NumberWrongSubmissions(PreviousProblemFeatureBase):
             filter(lambda s: not s.solved, self._prev_prob_submissions)))
 
 
+def _submission_times(submissions):
+    """Return the time taken by each submission with both times known."""
+    return [float(s.submit_ts - s.begin_ts) for s in submissions
+        if s.submit_ts != NO_TIME and s.begin_ts != NO_TIME]
+
+
 class AverageSubmissionTime(PreviousProblemFeatureBase):
     @property
     def name(self):
@@ -477,9 +581,7 @@ class AverageSubmissionTime(PreviousProblemFeatureBase):
         return "numeric"
     
     def _submission_value(self):
-        data = [(s.submit_time - s.begin_time).total_seconds() 
-            for s in self._prev_prob_submissions
-            if s.submit_time is not None and s.begin_time is not None]
+        data = _submission_times(self._prev_prob_submissions)
         if len(data) == 0:
             return None
         else:
@@ -497,12 +599,9 @@ class LatestSubmissionTime(PreviousProblemFeatureBase):
     
     def _submission_value(self):
         last_sub = self._prev_prob_submissions[-1]
-        if last_sub.submit_time is not None and \
-            last_sub.begin_time is not None:
-            assert last_sub.submit_time >= last_sub.begin_time
-            return (last_sub.submit_time - last_sub.begin_time).total_seconds()
-        else:
-            return None
+        time = elapsed(last_sub.submit_ts, last_sub.begin_ts)
+        assert time is None or time >= 0
+        return time
 
 
 class StdevSubmissionTime(PreviousProblemFeatureBase):
@@ -515,9 +614,7 @@ class StdevSubmissionTime(PreviousProblemFeatureBase):
         return "numeric"
     
     def _submission_value(self):
-        data = [(s.submit_time - s.begin_time).total_seconds()
-                for s in self._prev_prob_submissions
-                if s.submit_time is not None and s.begin_time is not None]
+        data = _submission_times(self._prev_prob_submissions)
         if len(data) < 2:
             return None
         else:
@@ -534,9 +631,7 @@ class MaxSubmissionTime(PreviousProblemFeatureBase):
         return "numeric"
     
     def _submission_value(self):
-        data = [(s.submit_time - s.begin_time).total_seconds()
-            for s in self._prev_prob_submissions
-            if s.submit_time is not None and s.begin_time is not None]
+        data = _submission_times(self._prev_prob_submissions)
         if len(data) == 0:
             return None
         else:
@@ -553,9 +648,7 @@ class MinSubmissionTime(PreviousProblemFeatureBase):
         return "numeric"
     
     def _submission_value(self):
-        data = [(s.submit_time - s.begin_time).total_seconds()
-            for s in self._prev_prob_submissions
-            if s.submit_time is not None and s.begin_time is not None]
+        data = _submission_times(self._prev_prob_submissions)
         if len(data) == 0:
             return None
         else:
@@ -600,19 +693,19 @@ class TimeSinceSessionStartPrev(PreviousProblemFeatureBase):
     
     def __init__(self):
         super().__init__()
-        self._session_start = None
+        self._session_start = NO_TIME
     
     def _submission_value(self):
-        if self._prev_prob_submissions[0].begin_time is None:
+        begin = self._prev_prob_submissions[0].begin_ts
+        if begin == NO_TIME:
             print("Inspect log file!")
             return None
         for sub in self._prev_prob_submissions:
-            if sub.begin_session is not None and (self._session_start is None
-                or (self._prev_prob_submissions[0].begin_time 
-                    - sub.begin_session).total_seconds() >= 0):
-                self._session_start = sub.begin_session
-        time = (self._prev_prob_submissions[0].begin_time -
-            self._session_start).total_seconds()
+            if sub.begin_session_ts != NO_TIME and (
+                self._session_start == NO_TIME or
+                begin >= sub.begin_session_ts):
+                self._session_start = sub.begin_session_ts
+        time = elapsed(begin, self._session_start)
         if time > 100000:
             print(self._submission.submit_time)
             print('huh?' + str(time))
@@ -634,7 +727,7 @@ class ProblemsAttemptedCumulative(FeatureBase):
         self._attempted_problems = set()
     
     def _submission_value(self):
-        if self._submission.begin_session is not None:
+        if self._submission.begin_session_ts != NO_TIME:
             self._attempted_problems = set()
         self._attempted_problems.add(self._submission.problem_id)
         return len(self._attempted_problems)
@@ -654,7 +747,7 @@ class ProblemsCompletedCumulative(FeatureBase):
         self._completed_problems = set()
     
     def _submission_value(self):
-        if self._submission.begin_session is not None:
+        if self._submission.begin_session_ts != NO_TIME:
             self._completed_problems = set()
         if self._submission.solved:
             self._completed_problems.add(self._submission.problem_id)
@@ -687,20 +780,20 @@ class TimeSpentOnProblem(CumulativeStatisticsFeatureBase):
     def __init__(self):
         super().__init__()
         self._current_problem_id = None
-        self._current_problem_start = None
+        self._current_problem_start = NO_TIME
         self._last_problem_duration = None
         self._problem_changed = False
     
     def _submission_value(self):
         if self._current_problem_id != self._submission.problem_id:
-            if self._current_problem_start is not None and \
-                self._last_submission.submit_time is not None:
-                self._last_problem_duration = (
-                    self._last_submission.submit_time -
-                    self._current_problem_start).total_seconds()
+            if self._current_problem_start != NO_TIME and \
+                self._last_submission.submit_ts != NO_TIME:
+                self._last_problem_duration = elapsed(
+                    self._last_submission.submit_ts,
+                    self._current_problem_start)
                 self._problem_changed = True
             self._current_problem_id = self._submission.problem_id
-            self._current_problem_start = self._submission.begin_time
+            self._current_problem_start = self._submission.begin_ts
         else:
             self._problem_changed = False
         return self._last_problem_duration
@@ -718,26 +811,22 @@ class TimeBetweenSubmissions(CumulativeStatisticsFeatureBase):
         return "session_time_between_submissions"
     
     def _submission_value(self):
-        if self._submission.begin_session is not None:
+        if self._submission.begin_session_ts != NO_TIME:
             self._last_submission = None
             return None
-        elif self._last_submission is not None and \
-            self._submission.submit_time is not None and \
-            self._last_submission.submit_time is not None:
-            return (self._submission.submit_time - 
-                self._last_submission.submit_time).total_seconds()
+        elif self._last_submission is not None:
+            return elapsed(self._submission.submit_ts,
+                self._last_submission.submit_ts)
         else:
             return None
             
     def should_add_mean(self):  
         return self._last_submission is not None and \
-            self._submission.submit_time is not None and \
-            self._last_submission.submit_time is not None
+            self._submission.submit_ts != NO_TIME and \
+            self._last_submission.submit_ts != NO_TIME
     
     def should_add_stdev(self):
-        return self._last_submission is not None and \
-            self._submission.submit_time is not None and \
-            self._last_submission.submit_time is not None
+        return self.should_add_mean()
 
 
 class NumberOfSubmissions(CumulativeStatisticsFeatureBase):
@@ -774,8 +863,22 @@ class NumberOfSubmissions(CumulativeStatisticsFeatureBase):
         return self._problem_changed
 
 
+def load_complexities(filename=COMPLEXITY_FILE):
+    """
+    Return {problem ID: complexity} from the complexity data file.
+
+    The file is opened afresh each time rather than held open, as a file
+    object shared with forked worker processes would share its position.
+    """
+    lookup = {}
+    with open(filename) as f:
+        for line in f:
+            line_split = line.split()
+            lookup[int(line_split[0])] = int(line_split[1])
+    return lookup
+
+
 class ProblemComplexityPrev(PreviousProblemFeatureBase):
-    FILE = open('complexity-data.txt')
     LOOKUP = {}
     
     @property
@@ -789,9 +892,7 @@ class ProblemComplexityPrev(PreviousProblemFeatureBase):
     def __init__(self):
         super().__init__()
         if len(self.LOOKUP) == 0:
-            for line in self.FILE:
-                line_split = line.split()
-                self.LOOKUP[int(line_split[0])] = int(line_split[1])
+            self.LOOKUP.update(load_complexities())
     
     def _submission_value(self):
         try:
@@ -801,7 +902,6 @@ class ProblemComplexityPrev(PreviousProblemFeatureBase):
 
 
 class ProblemComplexity(CumulativeStatisticsFeatureBase):
-    FILE = open('complexity-data.txt')
     LOOKUP = {}
     
     @property
@@ -811,9 +911,7 @@ class ProblemComplexity(CumulativeStatisticsFeatureBase):
     def __init__(self):
         super().__init__()
         if len(self.LOOKUP) == 0:
-            for line in self.FILE:
-                line_split = line.split()
-                self.LOOKUP[int(line_split[0])] = int(line_split[1])
+            self.LOOKUP.update(load_complexities())
         self._current_prob_id = None
         self._problem_changed = False
     
@@ -844,7 +942,6 @@ class ProblemComplexity(CumulativeStatisticsFeatureBase):
 
 
 class StudentLevel(FeatureBase):
-    FILE = open('complexity-data.txt')
     LOOKUP = {}
     
     def __init__(self):
@@ -858,9 +955,7 @@ class StudentLevel(FeatureBase):
         self._prev_prob_solved = False
         self._prev_prob_attempts = 0
         if len(self.LOOKUP) == 0:
-            for line in self.FILE:
-                line_split = line.split()
-                self.LOOKUP[int(line_split[0])] = int(line_split[1])
+            self.LOOKUP.update(load_complexities())
     
     @property
     def name(self):
@@ -921,10 +1016,324 @@ class IdenticalSubmission(StudentLevel):
     
     def _submission_value(self):
         if self._submission is not None and self._last_submission is not None:
-            return self._submission.solution == self._last_submission.solution
+            return self._submission.solution_fingerprint == \
+                self._last_submission.solution_fingerprint
         else:
             return False
 
+
+class SolutionHistoryFeatureBase(FeatureBase, metaclass=ABCMeta):
+    """
+    Base class for features over the solutions seen for each problem.
+
+    Keeps a set of normalised solution fingerprints per problem, so each
+    submission costs one hash set lookup and insert.
+    """
+    def __init__(self):
+        super().__init__()
+        self._problem_solutions = {}
+        self._seen_before = False
+        self._solutions = None
+
+    def new_submission(self, submission):
+        solutions = self._problem_solutions.get(submission.problem_id)
+        if solutions is None:
+            solutions = set()
+            self._problem_solutions[submission.problem_id] = solutions
+        fingerprint = submission.solution_fingerprint
+        if fingerprint is not None:
+            self._seen_before = fingerprint in solutions
+            solutions.add(fingerprint)
+        self._solutions = solutions
+        super().new_submission(submission)
+
+
+class SameAsEarlierSubmission(SolutionHistoryFeatureBase):
+    @property
+    def name(self):
+        return "submission_same_as_earlier"
+
+    @property
+    def type(self):
+        return "{True, False}"
+
+    def _submission_value(self):
+        if self._submission.solution_fingerprint is None:
+            return None
+        return self._seen_before
+
+
+class DistinctSolutions(SolutionHistoryFeatureBase):
+    @property
+    def name(self):
+        return "problem_distinct_solutions"
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        return len(self._solutions)
+
+class ConstraintHistoryFeatureBase(FeatureBase, metaclass=ABCMeta):
+    """
+    Base class for features over the constraints violated on each problem.
+
+    The history is a ProblemConstraintHistories, kept once for all the
+    constraint history features made together (by build_features or
+    extract.process_submissions) and updated once per submission by
+    whichever of them sees it first.
+    """
+    STUCK_ATTEMPTS = 3
+    # the histories of the features being made, until they are used
+    _shared_histories = None
+
+    def __init__(self):
+        super().__init__()
+        histories = ConstraintHistoryFeatureBase._shared_histories
+        if histories is None or histories.submission is not None:
+            # the features made before this have started on their log
+            histories = ProblemConstraintHistories(self.STUCK_ATTEMPTS)
+            ConstraintHistoryFeatureBase._shared_histories = histories
+        self._histories = histories
+
+    def new_submission(self, submission):
+        self._histories.add(submission)
+        super().new_submission(submission)
+
+
+class ProblemConstraintHistories():
+    """
+    The constraints violated on each problem a student has attempted.
+
+    For every problem this keeps the violated constraint bitset of the
+    latest attempt, the union of all constraints violated so far, a sparse
+    map of how many times each constraint has been violated, and bitsets of
+    the constraints violated on each of the last stuck_attempts consecutive
+    attempts. All of it is updated with bitset operations or by visiting
+    only the constraints violated in the current submission.
+    """
+    def __init__(self, stuck_attempts):
+        self.stuck_attempts = stuck_attempts
+        self.problems = {}
+        # the latest submission added and its problem's ConstraintHistory
+        # (None without a solution), and its bits from before it was added
+        self.submission = None
+        self.state = None
+        self.previous_bits = None
+        self.earlier_bits = 0
+
+    def add(self, submission):
+        """Add submission, unless it is the latest one added."""
+        if submission is self.submission:
+            return
+        self.submission = submission
+        if submission.solution is None:
+            self.state = None
+            return
+        state = self.problems.get(submission.problem_id)
+        if state is None:
+            state = ConstraintHistory(self.stuck_attempts)
+            self.problems[submission.problem_id] = state
+        self.previous_bits = state.last_bits
+        self.earlier_bits = state.ever_bits
+        state.add(submission.violated_bits)
+        self.state = state
+
+
+class ConstraintHistory():
+    """Violated constraint history for a single problem."""
+    __slots__ = ('last_bits', 'ever_bits', 'counts', 'runs')
+
+    def __init__(self, stuck_attempts):
+        self.last_bits = None
+        self.ever_bits = 0
+        self.counts = {}
+        # runs[k] holds the constraints violated on each of the last k + 1
+        # attempts
+        self.runs = [0] * stuck_attempts
+
+    def add(self, bits):
+        self.last_bits = bits
+        self.ever_bits |= bits
+        counts = self.counts
+        for constraint in from_bitset(bits):
+            counts[constraint] = counts.get(constraint, 0) + 1
+        runs = self.runs
+        for k in range(len(runs) - 1, 0, -1):
+            runs[k] = runs[k - 1] & bits
+        runs[0] = bits
+
+
+class NewlyViolatedConstraints(ConstraintHistoryFeatureBase):
+    @property
+    def name(self):
+        return "newly_violated_constraints"
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        histories = self._histories
+        if histories.state is None or histories.previous_bits is None:
+            return None
+        return count_bits(self._submission.violated_bits &
+            ~histories.previous_bits)
+
+
+class RepeatedViolatedConstraints(ConstraintHistoryFeatureBase):
+    @property
+    def name(self):
+        return "problem_repeated_violated_constraints"
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        histories = self._histories
+        if histories.state is None:
+            return None
+        return count_bits(self._submission.violated_bits &
+            histories.earlier_bits)
+
+
+class MaxConstraintViolations(ConstraintHistoryFeatureBase):
+    @property
+    def name(self):
+        return "problem_max_constraint_violations"
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        state = self._histories.state
+        if state is None:
+            return None
+        counts = state.counts
+        return max((counts[c] for c in
+            from_bitset(self._submission.violated_bits)), default=0)
+
+
+class StuckConstraints(ConstraintHistoryFeatureBase):
+    @property
+    def name(self):
+        return "problem_stuck_constraints"
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        state = self._histories.state
+        if state is None:
+            return None
+        return count_bits(state.runs[-1])
+
+
+class StudentModelFeatureBase(FeatureBase, metaclass=ABCMeta):
+    """
+    Base class for features over the student model's clause percentages.
+
+    MODEL selects which Submission arrays to read (model_measure or
+    model_coverage, and their _prev counterparts) and CLAUSE the index into
+    StudentModelClauseEvent.CLAUSES. Concrete classes for every clause are
+    generated by _student_model_features.
+    """
+    MODEL = None
+    SUFFIX = None
+    CLAUSE = None
+
+    def _current(self):
+        return getattr(self._submission, 'model_' + self.MODEL)
+
+    def _previous(self):
+        return getattr(self._submission, 'model_' + self.MODEL + '_prev')
+
+
+class ClausePercentage(StudentModelFeatureBase, metaclass=ABCMeta):
+    @property
+    def name(self):
+        return "model_{0}_{1}".format(CLAUSES[self.CLAUSE], self.SUFFIX)
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        current = self._current()
+        if current is None or isnan(current[self.CLAUSE]):
+            return None
+        return current[self.CLAUSE]
+
+
+class ClausePercentageChange(StudentModelFeatureBase, metaclass=ABCMeta):
+    @property
+    def name(self):
+        return "model_{0}_{1}_change".format(
+            CLAUSES[self.CLAUSE], self.SUFFIX)
+
+    @property
+    def type(self):
+        return "numeric"
+
+    def _submission_value(self):
+        current = self._current()
+        previous = self._previous()
+        if current is None or previous is None:
+            return None
+        change = current[self.CLAUSE] - previous[self.CLAUSE]
+        if isnan(change):
+            return None
+        return change
+
+
+class WeakestClause(StudentModelFeatureBase, metaclass=ABCMeta):
+    @property
+    def name(self):
+        return "model_weakest_" + self.SUFFIX
+
+    @property
+    def type(self):
+        return "{" + ", ".join(CLAUSES) + "}"
+
+    def _submission_value(self):
+        current = self._current()
+        if current is None:
+            return None
+        weakest = None
+        for i, value in enumerate(current):
+            if not isnan(value) and (weakest is None or
+                    value < current[weakest]):
+                weakest = i
+        if weakest is None:
+            return None
+        return CLAUSES[weakest]
+
+
+def _student_model_features():
+    """Return a feature class for each student model clause column."""
+    features = []
+    for model, suffix in (('measure', 'meas'), ('coverage', 'cov')):
+        for i, clause in enumerate(CLAUSES):
+            for base in (ClausePercentage, ClausePercentageChange):
+                name = model.capitalize() + clause.capitalize() + \
+                    base.__name__
+                features.append(type(name, (base,),
+                    {'MODEL': model, 'SUFFIX': suffix, 'CLAUSE': i}))
+        features.append(type(model.capitalize() + WeakestClause.__name__,
+            (WeakestClause,), {'MODEL': model, 'SUFFIX': suffix}))
+    # make the generated classes importable (and picklable) by name
+    for feature in features:
+        globals()[feature.__name__] = feature
+    return features
+
+
+STUDENT_MODEL_FEATURES = _student_model_features()
+
+
 def build_features(submissions):
     submission_features = [feature() for feature in FEATURES]
     for submission in submissions:
@@ -934,12 +1343,37 @@ def build_features(submissions):
             feature.new_submission(submission)
     return submission_features
 
+def set_ewma_half_life(half_life):
+    """
+    Add EWMA mean and variance columns, with half_life (a HalfLife, or None
+    for no columns), to every cumulative statistics feature made from now.
+    """
+    CumulativeStatisticsFeatureBase.ewma_half_life = half_life
+
 def should_skip_subm(submission):
-    skip = submission.solution is None and submission.begin_session is None
+    skip = submission.solution is None and \
+        submission.begin_session_ts == NO_TIME
     if skip:
-        print(submission.__dict__)
+        print(submission.as_dict())
     return skip
 
+def skip_nothing(submission):
+    return False
+
+def skip_without_solution(submission):
+    return submission.solution is None
+
+def skip_without_session(submission):
+    return submission.begin_session_ts == NO_TIME
+
+# alternatives to should_skip_subm, by name
+SKIP_RULES = {
+    'default': should_skip_subm,
+    'none': skip_nothing,
+    'no-solution': skip_without_solution,
+    'no-session': skip_without_session
+}
+
 FEATURES = [
     ViolatedConstraints,
     SatisfiedConstraints,
@@ -975,5 +1409,11 @@ FEATURES = [
     StudentLevel,
     StudentLevelComplexityDifference,
     IdenticalSubmission,
+    SameAsEarlierSubmission,
+    DistinctSolutions,
+    NewlyViolatedConstraints,
+    RepeatedViolatedConstraints,
+    MaxConstraintViolations,
+    StuckConstraints,
     TimeUntilFirstSubmission
-]
\ No newline at end of file
+] + STUDENT_MODEL_FEATURES
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Interning of strings which repeat throughout the logs.
+
+Many students submit the same SQL for the same problem, and database names,
+problem statuses and feedback levels come from a handful of values, yet
+every event parsed holds its own copy of them. Passing each through a
+StringPool makes equal strings share one object for the whole run (per
+process), so the copies can be freed as soon as they are parsed.
+
+Solutions are far more varied than the other values, so their pool can be
+bounded to the most recently used ones; strings already handed out stay
+shared after they are dropped from the pool. Each pool counts the bytes of
+the copies it made redundant, reported by report() and --profile.
+"""
+import sys
+from collections import OrderedDict
+
+DEFAULT_SOLUTION_LIMIT = 65536
+
+
+class StringPool():
+    """A pool of strings, so that equal strings can share one object."""
+    def __init__(self, limit=None):
+        self.lookups = 0
+        self.hits = 0
+        self.saved_bytes = 0
+        self.evictions = 0
+        self.set_limit(limit)
+
+    def __len__(self):
+        return len(self._strings)
+
+    def set_limit(self, limit):
+        """
+        Keep at most limit strings, least recently used dropped first.
+
+        A limit of None keeps every string. Changing the limit empties the
+        pool.
+        """
+        self.limit = limit
+        self._strings = {} if limit is None else OrderedDict()
+
+    def intern(self, string):
+        """Return the pooled string equal to string, pooling it if new."""
+        self.lookups += 1
+        pooled = self._strings.get(string)
+        if pooled is not None:
+            self.hits += 1
+            self.saved_bytes += sys.getsizeof(string)
+            if self.limit is not None:
+                self._strings.move_to_end(pooled)
+            return pooled
+        self._strings[string] = string
+        if self.limit is not None and len(self._strings) > self.limit:
+            self._strings.popitem(last=False)
+            self.evictions += 1
+        return string
+
+    def report(self):
+        return {
+            'strings': len(self._strings),
+            'limit': self.limit,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'evictions': self.evictions,
+            'saved_bytes': self.saved_bytes
+        }
+
+
+# solution text, from PreProcessEvents
+SOLUTIONS = StringPool(DEFAULT_SOLUTION_LIMIT)
+# database names, problem statuses and feedback levels
+VALUES = StringPool()
+
+
+def set_solution_limit(limit):
+    """Bound the solutions pool to limit strings (None for no bound)."""
+    SOLUTIONS.set_limit(limit)
+
+
+def report():
+    return {'solutions': SOLUTIONS.report(), 'values': VALUES.report()}
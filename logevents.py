@@ -1,14 +1,48 @@
 from abc import abstractmethod, ABCMeta
-from datetime import datetime
+from array import array
 import re
 
-def parse_event(timestamp, line, file):
+from interning import SOLUTIONS, VALUES
+from timeutil import timestamp_extract
+
+NAN = float('nan')
+
+def parse_event(timestamp, line, file, wanted=None, skipped=None):
+    """
+    Return the event for a log line (with its timestamp removed).
+
+    If a set of wanted event types is given, events of any other type are
+    not constructed: their continuation lines are consumed (see
+    LogEvent.skip), they are counted in the skipped dict of event type to
+    count, if given, and None is returned.
+    """
     for event_type in REGISTERED_EVENTS:
         if event_type.is_event(line):
-            return event_type(timestamp, line, file)
+            if wanted is None or event_type in wanted:
+                return event_type(timestamp, line, file)
+            event_type.skip(line, file)
+            if skipped is not None:
+                skipped[event_type] = skipped.get(event_type, 0) + 1
+            return None
+
+
+def event_types(consumed):
+    """
+    Return the registered event types a consumer of consumed classes needs.
+
+    These are the types which are subclasses of any class in consumed, so
+    that isinstance checks against consumed still see every event they
+    would without a filter.
+    """
+    consumed = tuple(consumed)
+    return frozenset(t for t in REGISTERED_EVENTS if issubclass(t, consumed))
 
 class LogEvent(metaclass=ABCMeta):
-    """Base class for log events."""
+    """
+    Base class for log events.
+
+    timestamp is in seconds since the epoch (see timeutil).
+    """
     def __init__(self, timestamp, line, file):
         self.timestamp = timestamp
         self.line = line
@@ -20,31 +54,25 @@ class LogEvent(metaclass=ABCMeta):
         """Return True if this event could be created based on log_line."""
         pass
 
+    @classmethod
+    def skip(cls, line, file):
+        """
+        Consume the rest of an event without constructing it.
+
+        Multiline events override this to read past their continuation
+        lines, exactly as constructing the event would.
+        """
+        pass
+
 
 class MultilineLogEvent(LogEvent, metaclass=ABCMeta):
     def _timestamp_extract(self, line):
         """
-        Return a datetime and log file line remainder.
-    
-        The timestamp should be in HH:MM:SS DD/MM/YYYY format, where the
-        time is in 24-hour format. The timestamp should be at the
-        beginning of the line. A semicolon may optionally be present at the
-        end of the timestamp (in the log line) which will be stripped.
-    
-        If a conforming timestamp is not found, or if the log file line 
-        does not have the expected structure, a ValueError will be raised.
+        Return a timestamp and log file line remainder.
+
+        See timeutil.timestamp_extract.
         """
-        try:
-            splitted = re.split(' ', line, maxsplit=2)
-            # sometimes there is a stray semicolon...
-            timestampstr = (splitted[0] + ' ' + splitted[1]).strip(';')
-            timestamp = datetime.strptime(timestampstr, '%H:%M:%S %d/%m/%Y')
-            final_value = (timestamp, splitted[2])
-        except ValueError:
-            raise ValueError("Couldn't parse log file timestamp")
-        except IndexError:
-            raise ValueError("Log file line has unexpected structure")
-        return final_value
+        return timestamp_extract(line)
 
 
 class LoggedInEvent(LogEvent):
@@ -75,7 +103,7 @@ class DatabaseSetEvent(LogEvent):
     """Event representing a database change in the tutor."""
     def __init__(self, timestamp, line, file):
         super().__init__(timestamp, line, file)
-        self._database = line.split(' ').pop().strip()
+        self._database = VALUES.intern(line.split(' ').pop().strip())
 
     @property
     def database(self):
@@ -109,7 +137,7 @@ class DatabaseChangeEvent(LogEvent):
         
     def __init__(self, timestamp, line, file):
         super().__init__(timestamp, line, file)
-        self._database = re.match(self.DB_RE, line).group(1)
+        self._database = VALUES.intern(re.match(self.DB_RE, line).group(1))
         self._problem = int(line.split(' ').pop().strip())
 
     @property
@@ -141,7 +169,7 @@ class DrawingProblemEvent(LogEvent):
             match = re.match(self.RE_OLD, line)
         try:
             self._problem_id = int(match.group(1))
-            self._problem_status = match.group(2)
+            self._problem_status = VALUES.intern(match.group(2))
         except AttributeError:
             raise ValueError("Couldn't extract to DrawingProblemEvent")
     
@@ -175,16 +203,16 @@ class ClientRespondingEvent(MultilineLogEvent):
         match = re.match(self.RE_1, line)
         if match:
             self._problem_id = int(match.group(1))
-            self._problem_status = match.group(2)
+            self._problem_status = VALUES.intern(match.group(2))
         
         # there are two lines here
         line2_timestamp, line2 = self._timestamp_extract(file.readline())
-        if not (line2_timestamp - timestamp).total_seconds() <= 1:
+        if not line2_timestamp - timestamp <= 1:
             print("Inspect log file - slow server?")
         line2_match = re.match(self.RE_2, line2)
         if line2_match:
             self._help_level = int(line2_match.group(1))
-            self._feedback_level = line2_match.group(2)
+            self._feedback_level = VALUES.intern(line2_match.group(2))
     
     @property
     def problem_id(self):
@@ -210,15 +238,27 @@ class ClientRespondingEvent(MultilineLogEvent):
     def is_event(log_line):
         return 'responding:' in log_line
 
+    @classmethod
+    def skip(cls, line, file):
+        file.readline()
+
 
 class PreProcessEvent(MultilineLogEvent):
     # this one is a stub since we don't really need it
     def __init__(self, timestamp, line, file):
         super().__init__(timestamp, line, file)
-        self._solution = line
+        self._solution = SOLUTIONS.intern(self._read_solution(line, file))
+
+    @staticmethod
+    def _read_solution(line, file):
+        # the solution runs up to the 'Mode: ' line
+        solution = line
         while 'Mode: ' not in line:
             line = file.readline()
-            self._solution += line
+            if len(line) == 0:
+                break
+            solution += line
+        return solution
     
     @property
     def solution(self): 
@@ -228,6 +268,10 @@ class PreProcessEvent(MultilineLogEvent):
     def is_event(log_line):
         return 'Pre-process:' in log_line
 
+    @classmethod
+    def skip(cls, line, file):
+        cls._read_solution(line, file)
+
 
 class AnswerCorrectEvent(LogEvent):
     """Event representing a correct submission (yay! :D)"""
@@ -268,6 +312,20 @@ class PostProcessEvent(MultilineLogEvent):
         else:
             # need to iterate over lines until blank line
             self._parse_multiline(line)
+
+    @staticmethod
+    def _read_continuation(file):
+        # the event ends after its second whitespace-only line
+        space_count = 0
+        result = ''
+        while space_count < 2:
+            last_line = file.readline()
+            if len(last_line) == 0:
+                break
+            result += last_line
+            if last_line.isspace():
+                space_count += 1
+        return result
     
     def _parse_one_line(self, line):
         match_groups = re.match(self.RE, line)
@@ -284,15 +342,7 @@ class PostProcessEvent(MultilineLogEvent):
         self._feedback_level = int(match_groups.group(3))
     
     def _parse_multiline(self, init_line):
-        space_count = 0
-        last_line = init_line
-        final_result = init_line
-        while space_count < 2:
-            last_line = self.file.readline()
-            final_result += last_line
-            if last_line.isspace():
-                space_count += 1
-        self._parse_one_line(final_result)
+        self._parse_one_line(init_line + self._read_continuation(self.file))
     
     @property
     def satisfied_constraints(self):
@@ -313,6 +363,11 @@ class PostProcessEvent(MultilineLogEvent):
     def is_event(log_line):
         return 'Post-process:' in log_line
 
+    @classmethod
+    def skip(cls, line, file):
+        if not ('Satisfied' in line and 'Violated' in line):
+            cls._read_continuation(file)
+
 
 class IncorrectFeedbackEvent(LogEvent):
     def __init__(self, timestamp, line, file):
@@ -328,243 +383,94 @@ class IncorrectFeedbackEvent(LogEvent):
         return ' feedback ' in log_line
 
 
-class StudentModelMeasureEvent(LogEvent):
-    RE = re.compile('select-meas:([0-9]+)/?([0-9]*) ' + 
-        'from-meas:([0-9]+)/?([0-9]*) where-meas:([0-9]+)/?([0-9]*) ' + 
-        'group-meas:([0-9]+)/?([0-9]*) having-meas:([0-9]+)/?([0-9]*) ' +
-        'order-meas:([0-9]+)/?([0-9]*)')
+class StudentModelClauseEvent(LogEvent, metaclass=ABCMeta):
+    """
+    Base class for student model events scoring each SQL clause.
+
+    The log line holds a correct/total pair (the total may be missing) for
+    each clause in CLAUSES. These are kept in fixed-size arrays indexed in
+    CLAUSES order.
+
+    Each subclass also gets the per-clause properties the events used to
+    have, such as from_meas_correct, from_meas_total and
+    from_meas_percentage.
+    """
+    CLAUSES = ('select', 'from', 'where', 'group', 'having', 'order')
+    SUFFIX = None
+    RE = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for i, clause in enumerate(cls.CLAUSES):
+            name = '{0}_{1}_'.format(clause, cls.SUFFIX)
+            setattr(cls, name + 'correct',
+                property(lambda self, i=i: self._correct[i]))
+            setattr(cls, name + 'total',
+                property(lambda self, i=i: self._total[i]))
+            setattr(cls, name + 'percentage',
+                property(lambda self, c=clause: self.percentage(c)))
+
+    @classmethod
+    def _clause_re(cls, suffix):
+        return re.compile(' '.join('{0}-{1}:([0-9]+)/?([0-9]*)'.format(
+            clause, suffix) for clause in cls.CLAUSES))
 
     def __init__(self, timestamp, line, file):
         super().__init__(timestamp, line, file)
         match_groups = re.match(self.RE, line)
-        self._select_meas_correct = int(match_groups.group(1))
-        self._select_meas_total = self._zero_if_empty(match_groups.group(2))
-        self._from_meas_correct = int(match_groups.group(3))
-        self._from_meas_total = self._zero_if_empty(match_groups.group(4))
-        self._where_meas_correct = int(match_groups.group(5))
-        self._where_meas_total = self._zero_if_empty(match_groups.group(6))
-        self._group_meas_correct = int(match_groups.group(7))
-        self._group_meas_total = self._zero_if_empty(match_groups.group(8))
-        self._having_meas_correct = int(match_groups.group(9))
-        self._having_meas_total = self._zero_if_empty(match_groups.group(10))
-        self._order_meas_correct = int(match_groups.group(11))
-        self._order_meas_total = self._zero_if_empty(match_groups.group(12))
-    
-    @property
-    def from_meas_correct(self):
-        return self._from_meas_correct
-    
-    @property
-    def from_meas_total(self):
-        return self._from_meas_total
-    
-    @property
-    def where_meas_correct(self):
-        return self._where_meas_correct
-    
-    @property
-    def where_meas_total(self): 
-        return self._where_meas_total
-    
-    @property
-    def group_meas_correct(self):
-        return self._group_meas_correct
-    
-    @property
-    def group_meas_total(self):
-        return self._group_meas_total
-    
-    @property
-    def having_meas_correct(self):
-        return self._having_meas_correct
-    
-    @property
-    def having_meas_total(self):
-        return self._having_meas_total
-    
-    @property
-    def order_meas_correct(self):
-        return self._order_meas_correct
-    
-    @property
-    def order_meas_total(self):
-        return self._order_meas_total
-    
-    @property
-    def select_meas_percentage(self):
-        if self._select_meas_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._select_meas_correct / self._select_meas_total
-    
-    @property
-    def from_meas_percentage(self):
-        if self._from_meas_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._from_meas_correct / self._from_meas_total
-    
-    @property
-    def where_meas_percentage(self):
-        if self._where_meas_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._where_meas_correct / self._where_meas_total
-    
-    @property
-    def group_meas_percentage(self):
-        if self._group_meas_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._group_meas_correct / self._group_meas_total
-    
+        self._correct = array('i', [0] * len(self.CLAUSES))
+        self._total = array('i', [0] * len(self.CLAUSES))
+        for i in range(len(self.CLAUSES)):
+            self._correct[i] = int(match_groups.group(2 * i + 1))
+            self._total[i] = self._zero_if_empty(match_groups.group(2 * i + 2))
+
     @property
-    def having_meas_percentage(self):
-        if self._having_meas_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._having_meas_correct / self._having_meas_total
-    
+    def correct(self):
+        """Get the number correct for each clause, in CLAUSES order."""
+        return self._correct
+
     @property
-    def order_meas_percentage(self):
-        if self._order_meas_total == 0:
+    def total(self):
+        """Get the total for each clause (0 if missing), in CLAUSES order."""
+        return self._total
+
+    def percentages(self):
+        """
+        Return the fraction correct for each clause, in CLAUSES order.
+
+        Clauses with a total of 0 are NaN rather than dividing by zero.
+        """
+        return array('d', [c / t if t != 0 else NAN
+            for c, t in zip(self._correct, self._total)])
+
+    def percentage(self, clause):
+        """Return the fraction correct for clause, or None if no total."""
+        i = self.CLAUSES.index(clause)
+        if self._total[i] == 0:
             # return None instead of divide by zero
             return None
-        else:
-            return self._order_meas_correct / self._order_meas_total
-    
+        return self._correct[i] / self._total[i]
+
     def _zero_if_empty(self, string):
         if len(string) == 0:
             return 0
         else:
             return int(string)
-    
+
+
+class StudentModelMeasureEvent(StudentModelClauseEvent):
+    SUFFIX = 'meas'
+    RE = StudentModelClauseEvent._clause_re(SUFFIX)
+
     @staticmethod
     def is_event(log_line):
         return 'from-meas:' in log_line
 
 
-class StudentModelCoverageEvent(LogEvent):
-    RE = re.compile('select-cov:([0-9]+)/?([0-9]*) ' + 
-        'from-cov:([0-9]+)/?([0-9]*) where-cov:([0-9]+)/?([0-9]*) ' + 
-        'group-cov:([0-9]+)/?([0-9]*) having-cov:([0-9]+)/?([0-9]*) ' +
-        'order-cov:([0-9]+)/?([0-9]*)')
+class StudentModelCoverageEvent(StudentModelClauseEvent):
+    SUFFIX = 'cov'
+    RE = StudentModelClauseEvent._clause_re(SUFFIX)
 
-    def __init__(self, timestamp, line, file):
-        super().__init__(timestamp, line, file)
-        match_groups = re.match(self.RE, line)
-        self._select_cov_correct = int(match_groups.group(1))
-        self._select_cov_total = self._zero_if_empty(match_groups.group(2))
-        self._from_cov_correct = int(match_groups.group(3))
-        self._from_cov_total = self._zero_if_empty(match_groups.group(4))
-        self._where_cov_correct = int(match_groups.group(5))
-        self._where_cov_total = self._zero_if_empty(match_groups.group(6))
-        self._group_cov_correct = int(match_groups.group(7))
-        self._group_cov_total = self._zero_if_empty(match_groups.group(8))
-        self._having_cov_correct = int(match_groups.group(9))
-        self._having_cov_total = self._zero_if_empty(match_groups.group(10))
-        self._order_cov_correct = int(match_groups.group(11))
-        self._order_cov_total = self._zero_if_empty(match_groups.group(12))
-    
-    @property
-    def from_cov_correct(self):
-        return self._from_cov_correct
-    
-    @property
-    def from_cov_total(self):
-        return self._from_cov_total
-    
-    @property
-    def where_cov_correct(self):
-        return self._where_cov_correct
-    
-    @property
-    def where_cov_total(self): 
-        return self._where_cov_total
-    
-    @property
-    def group_cov_correct(self):
-        return self._group_cov_correct
-    
-    @property
-    def group_cov_total(self):
-        return self._group_cov_total
-    
-    @property
-    def having_cov_correct(self):
-        return self._having_cov_correct
-    
-    @property
-    def having_cov_total(self):
-        return self._having_cov_total
-    
-    @property
-    def order_cov_correct(self):
-        return self._order_cov_correct
-    
-    @property
-    def order_cov_total(self):
-        return self._order_cov_total
-    
-    @property
-    def select_cov_percentage(self):
-        if self._select_cov_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._select_cov_correct / self._select_cov_total
-    
-    @property
-    def from_cov_percentage(self):
-        if self._from_cov_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._from_cov_correct / self._from_cov_total
-    
-    @property
-    def where_cov_percentage(self):
-        if self._where_cov_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._where_cov_correct / self._where_cov_total
-    
-    @property
-    def group_cov_percentage(self):
-        if self._group_cov_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._group_cov_correct / self._group_cov_total
-    
-    @property
-    def having_cov_percentage(self):
-        if self._having_cov_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._having_cov_correct / self._having_cov_total
-    
-    @property
-    def order_cov_percentage(self):
-        if self._order_cov_total == 0:
-            # return None instead of divide by zero
-            return None
-        else:
-            return self._order_cov_correct / self._order_cov_total
-    
-    def _zero_if_empty(self, string):
-        if len(string) == 0:
-            return 0
-        else:
-            return int(string)
-    
     @staticmethod
     def is_event(log_line):
         return 'from-cov:' in log_line
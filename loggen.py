@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic SQL-Tutor log files.
+
+The generated logs exercise every event type in logevents.REGISTERED_EVENTS,
+including multiline Pre-process:/Post-process: blocks, both the old
+'Chosing new problem' and newer 'drawing problem' formats, and occasional
+very long sessions. They are meant for benchmarking and testing, since the
+real student logs cannot be shared.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+DATABASES = ['movies', 'company', 'books-db', 'cd-collection', 'library']
+STATUSES = ['NEW', 'CONSIDERED', 'FINISHED']
+FEEDBACK = ['Simple Feedback', 'Error Flag', 'Hint', 'Partial Solution',
+    'All Errors', 'Complete Solution']
+SOLUTIONS = [
+    'SELECT title\nFROM movie\nWHERE year > {0}',
+    'select title, year\nfrom movie\nwhere director = {0}\norder by year',
+    'SELECT lname, COUNT(*)\nFROM employee, works_on\n' +
+        'WHERE ssn = essn AND hours > {0}\nGROUP BY lname\n' +
+        'HAVING COUNT(*) > 1',
+    'SELECT  *  FROM   book WHERE  id = {0}',
+]
+CLAUSES = ['select', 'from', 'where', 'group', 'having', 'order']
+MAX_PROBLEM = 278
+MAX_CONSTRAINT = 700
+SIZE_RE = re.compile(r'^([0-9.]+)\s*([KMG]?B?)$', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 2 ** 10, 'KB': 2 ** 10, 'M': 2 ** 20,
+    'MB': 2 ** 20, 'G': 2 ** 30, 'GB': 2 ** 30}
+
+
+def parse_size(size):
+    """Convert a size such as '10MB' or '1.5G' into a number of bytes."""
+    match = re.match(SIZE_RE, size.strip())
+    if not match:
+        raise ValueError("Couldn't parse size: " + size)
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def student_sizes(total_size, students, skew):
+    """
+    Split total_size bytes between students.
+
+    Student i gets a share proportional to 1 / (i + 1) ** skew, so a skew
+    of 0 gives equally sized logs and larger skews give a few very large
+    logs and many small ones.
+    """
+    weights = [1 / (i + 1) ** skew for i in range(students)]
+    total_weight = sum(weights)
+    return [max(1, int(total_size * w / total_weight)) for w in weights]
+
+
+class StudentLogGenerator():
+    def __init__(self, student_id, rng, start, long_session_prob=0.02):
+        self.student_id = student_id
+        self.rng = rng
+        self.time = start
+        self.long_session_prob = long_session_prob
+        self.registered = False
+        self.database = rng.choice(DATABASES)
+        self.help_level = rng.randint(0, 5)
+        self._ts_cache_time = None
+        self._ts_cache = None
+
+    def _ts(self):
+        if self._ts_cache_time != self.time:
+            self._ts_cache_time = self.time
+            self._ts_cache = self.time.strftime('%H:%M:%S %d/%m/%Y')
+        return self._ts_cache
+
+    def _advance(self, low, high):
+        self.time += timedelta(seconds=self.rng.randint(low, high))
+
+    def _line(self, text):
+        # the tutor sometimes leaves a stray semicolon after the timestamp
+        if self.rng.random() < 0.01:
+            return self._ts() + '; ' + text + '\n'
+        return self._ts() + ' ' + text + '\n'
+
+    def _constraints(self, count):
+        if count == 0:
+            return 'NIL'
+        ids = sorted(self.rng.sample(range(1, MAX_CONSTRAINT), count))
+        return '(' + ' '.join(str(i) for i in ids) + ')'
+
+    def _clause_scores(self, suffix):
+        scores = []
+        for clause in CLAUSES:
+            total = self.rng.randint(0, 12)
+            correct = self.rng.randint(0, total)
+            if total == 0:
+                scores.append('{0}-{1}:{2}'.format(clause, suffix, correct))
+            else:
+                scores.append('{0}-{1}:{2}/{3}'.format(
+                    clause, suffix, correct, total))
+        return ' '.join(scores)
+
+    def session(self):
+        """Return the text of one login session."""
+        rng = self.rng
+        lines = []
+        w = lines.append
+        self._advance(3600, 3 * 86400)
+        if not self.registered:
+            self.registered = True
+            if rng.random() < 0.5:
+                w(self._line('Registered as a new user ' + self.student_id))
+            else:
+                w(self._line('Registred as a new user ' + self.student_id))
+            w(self._line('Student model file created.'))
+        w(self._line('Logged in as ' + self.student_id))
+        w(self._line('Database is set to ' + self.database))
+        if rng.random() < self.long_session_prob:
+            problems = rng.randint(20, 60)
+        else:
+            problems = rng.randint(1, 6)
+        for p in range(problems):
+            self._problem(lines)
+        if rng.random() < 0.9:
+            self._advance(1, 120)
+            w(self._line('Logged out'))
+        return ''.join(lines)
+
+    def _problem(self, lines):
+        rng = self.rng
+        w = lines.append
+        self._advance(2, 60)
+        problem = rng.randint(1, MAX_PROBLEM)
+        status = rng.choice(STATUSES)
+        if rng.random() < 0.1:
+            self.database = rng.choice(DATABASES)
+            w(self._line('Changing database to {0} problem {1}'.format(
+                self.database, problem)))
+        if rng.random() < 0.5:
+            w(self._line('drawing problem: {0}, problem status: {1}'.format(
+                problem, status)))
+        else:
+            w(self._line('Chosing new problem. Current problem No ' +
+                '{0}; status: {1}'.format(problem, status)))
+        w(self._line('set-new-problem ' + str(self.help_level)))
+        violated = rng.randint(1, 6)
+        for attempt in range(rng.randint(1, 12)):
+            self._advance(5, 400)
+            if rng.random() < 0.1:
+                self.help_level = rng.randint(0, 5)
+                w(self._line('Now help-level is ' + str(self.help_level)))
+            w(self._line('responding: problem is {0} its status is {1}'
+                .format(problem, status)))
+            w(self._line('responding: also set help-level to ' +
+                '{0}, feedback={1}'.format(
+                    self.help_level, rng.choice(FEEDBACK))))
+            solution = rng.choice(SOLUTIONS).format(rng.randint(1, 5))
+            w(self._line('Pre-process: ' + solution + '\nMode: submit'))
+            violated = max(0, violated - rng.randint(-1, 2))
+            satisfied = self._constraints(rng.randint(0, 40))
+            violated_str = self._constraints(violated)
+            if rng.random() < 0.5:
+                w(self._line(('Post-process: Satisfied constraints: {0}; ' +
+                    'Violated constraints: {1}; Feedback level: {2}').format(
+                    satisfied, violated_str, rng.randint(0, 5))))
+            else:
+                w(self._line(('Post-process:\nSatisfied constraints: {0}\n' +
+                    'Violated constraints: {1}\nFeedback level: {2}\n\n')
+                    .format(satisfied, violated_str, rng.randint(0, 5))))
+            w(self._line(self._clause_scores('meas')))
+            if rng.random() < 0.5:
+                w(self._line(self._clause_scores('cov')))
+            if rng.random() < 0.05:
+                w(self._line('displaying student model'))
+            if violated == 0:
+                w(self._line('Answer correct'))
+                break
+            w(self._line('Incorrect: feedback given to student'))
+            if rng.random() < 0.02:
+                w(self._line('Unrecognised client message'))
+                w('continuation line without a timestamp\n')
+
+
+def generate_student(path, student_id, size, seed, long_session_prob=0.02):
+    """Write a log of roughly size bytes for one student to path."""
+    rng = random.Random(seed)
+    start = datetime(2010, 2, 1, 8, 0, 0) + timedelta(
+        seconds=rng.randint(0, 180 * 86400))
+    generator = StudentLogGenerator(
+        student_id, rng, start, long_session_prob)
+    written = 0
+    with open(path, mode='w') as f:
+        while written < size:
+            session = generator.session()
+            f.write(session)
+            written += len(session)
+    return written
+
+
+def generate_corpus(out_dir, size, students, skew=1.0, seed=0,
+                    long_session_prob=0.02):
+    """
+    Generate a corpus of roughly size bytes spread across students logs.
+
+    Returns the paths of the generated log files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, student_size in enumerate(student_sizes(size, students, skew)):
+        student_id = 'student{0:05d}'.format(i)
+        path = os.path.join(out_dir, student_id + '.log')
+        generate_student(path, student_id, student_size, seed * 1000003 + i,
+            long_session_prob)
+        paths.append(path)
+    return paths
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic SQL-Tutor log files.')
+    parser.add_argument('out_dir', help='directory to write .log files to')
+    parser.add_argument('--size', default='10MB',
+        help='approximate total corpus size, e.g. 1MB or 10GB')
+    parser.add_argument('--students', type=int, default=100,
+        help='number of student log files')
+    parser.add_argument('--skew', type=float, default=1.0,
+        help='Zipf exponent for the spread of log sizes between students')
+    parser.add_argument('--long-sessions', type=float, default=0.02,
+        help='probability that a session is unusually long')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    generate_corpus(args.out_dir, parse_size(args.size), args.students,
+        args.skew, args.seed, args.long_sessions)
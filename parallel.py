@@ -0,0 +1,99 @@
+"""
+Parallel extraction of log files in worker processes.
+
+Each worker process extracts one log file at a time and sends its rows
+back to the parent, pickled. Handing them back through shared memory
+instead was tried and was slower at both ends: on a 791 row, 100 column
+file, encoding the columns took the worker 15ms against 1.7ms to pickle
+the rows, and the parent took 7.2ms to read them back against 3.0ms to
+unpickle them, next to the ~400ms the worker spends extracting the file.
+
+At most IN_FLIGHT_PER_WORKER files per worker are extracted ahead of the
+one the parent is waiting for, so finished rows never pile up in the
+parent faster than they are written.
+
+With a store, each worker ingests the files it parses through its own
+connection. SQLite lets one connection write at a time, so the others wait
+for it (up to store.BUSY_TIMEOUT) rather than failing.
+"""
+from collections import deque
+from multiprocessing import Pool
+import time
+
+from store import Store
+
+IN_FLIGHT_PER_WORKER = 2
+
+_store = None
+
+
+def _init_worker(store_path):
+    global _store
+    if store_path is not None:
+        _store = Store(store_path)
+
+
+def _extract_rows(path):
+    # imported here as extract is also the command line entry point
+    from extract import extract_data, data_rows
+    try:
+        data = extract_data(path, store=_store)
+    except UnicodeDecodeError:
+        print("Couldn't decode file in utf-8: " + path)
+        return None
+    rows, carried = data_rows(data)
+    return data.filename, rows, carried
+
+
+def _extract_record_rows(filename, data):
+    # imported here as extract is also the command line entry point
+    from extract import data_rows
+    from pipeline import extract_record
+    start = time.perf_counter()
+    try:
+        file_data = extract_record(filename, data)
+    except UnicodeDecodeError:
+        print("Couldn't decode file in utf-8: " + filename)
+        return None, 0.0
+    rows, carried = data_rows(file_data)
+    return (file_data.filename, rows, carried), time.perf_counter() - start
+
+
+def extract_record_async(pool, filename, data):
+    """
+    Extract a log file's contents on pool, returning an AsyncResult.
+
+    Its result is (filename, rows, carried labels) (None if the contents
+    couldn't be decoded) and the seconds the worker spent on it.
+    """
+    return pool.apply_async(_extract_record_rows, (filename, data))
+
+
+def extract_parallel(pool, paths, workers):
+    """
+    Extract paths on a pool of workers, yielding (filename, rows, carried
+    labels) for each in order.
+
+    Files which can't be decoded are skipped.
+    """
+    pending = deque()
+    paths = iter(paths)
+    for path in paths:
+        pending.append(pool.apply_async(_extract_rows, (path,)))
+        if len(pending) >= IN_FLIGHT_PER_WORKER * workers:
+            break
+    while pending:
+        record = pending.popleft().get()
+        path = next(paths, None)
+        if path is not None:
+            pending.append(pool.apply_async(_extract_rows, (path,)))
+        if record is not None:
+            yield record
+
+
+def worker_pool(workers, store_path=None):
+    """Return a Pool of extraction workers, each with its own Store."""
+    if store_path is not None:
+        # create or rebuild the schema once, before the workers open it
+        Store(store_path).close()
+    return Pool(workers, initializer=_init_worker, initargs=(store_path,))
@@ -0,0 +1,222 @@
+"""
+Pipelined extraction, overlapping reading, parsing and writing.
+
+A reader thread reads upcoming log files whole, in large blocks, and hands
+them on through a bounded queue of read_ahead files. The parse stage turns
+each file's bytes into rows, either in the main thread or, given a worker
+pool (see parallel.py), in up to IN_FLIGHT_PER_WORKER tasks per worker at
+once. A writer
+thread streams the rows out to the ARFF file from a bounded queue of
+write_behind files. So while one file is parsed, the next ones are being
+read and the previous ones written, which keeps the CPU busy when reads are
+slow (e.g. on network mounted storage).
+
+Each stage counts the time it spends working, waiting for input (starved)
+and waiting for room in the next queue (blocked), reported at the end.
+"""
+import io
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+# bytes read at a time
+READ_BLOCK_SIZE = 8 * 2 ** 20
+DEFAULT_READ_AHEAD = 4
+DEFAULT_WRITE_BEHIND = 4
+
+_DONE = object()
+
+
+class StageStats():
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+
+def _get(from_queue, stats):
+    start = time.perf_counter()
+    item = from_queue.get()
+    stats.starved += time.perf_counter() - start
+    return item
+
+
+def _put(to_queue, item, stats):
+    start = time.perf_counter()
+    to_queue.put(item)
+    stats.blocked += time.perf_counter() - start
+
+
+def read_file(path):
+    """Read the whole of a file, in large blocks."""
+    blocks = []
+    with open(path, mode='rb') as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            blocks.append(block)
+    return b''.join(blocks)
+
+
+def extract_record(filename, data):
+    """Return the LogFileData of a log file's contents, as extract_data."""
+    # imported here as extract imports this module
+    from extract import read_event_stream, process_submissions
+    from submission import events_to_submissions, SUBMISSION_EVENT_TYPES
+    events = read_event_stream(
+        io.StringIO(data.decode('utf-8'), newline=None),
+        SUBMISSION_EVENT_TYPES)
+    subms = events_to_submissions(events)
+    del events
+    return process_submissions(filename, subms)
+
+
+class Pipeline():
+    def __init__(self, paths, read_ahead=DEFAULT_READ_AHEAD,
+                 write_behind=DEFAULT_WRITE_BEHIND, pool=None, workers=1):
+        self.paths = paths
+        self.read_ahead = read_ahead
+        self.write_behind = write_behind
+        self.pool = pool
+        self.read = StageStats('read')
+        self.parse = StageStats('parse', workers if pool is not None else 1)
+        self.write = StageStats('write')
+        self.bytes = 0
+        self.wall = 0.0
+
+    def run(self, out_path, memory_limit=None, sampler=None):
+        """
+        Extract the log files to out_path, as extract.write_arff_rows.
+
+        Returns the attributes, the comments and the number of rows.
+        """
+        read_queue = queue.Queue(self.read_ahead)
+        write_queue = queue.Queue(self.write_behind)
+        result = []
+        # daemon threads, so an error in one stage can't hang the others
+        reader = threading.Thread(target=self._read_files,
+            args=(read_queue,), daemon=True)
+        writer = threading.Thread(target=self._write_rows,
+            args=(write_queue, out_path, memory_limit, sampler, result),
+            daemon=True)
+        start = time.perf_counter()
+        reader.start()
+        writer.start()
+        try:
+            self._parse_files(read_queue, write_queue)
+        finally:
+            write_queue.put(_DONE)
+        writer.join()
+        self.wall = time.perf_counter() - start
+        if isinstance(result[0], BaseException):
+            raise result[0]
+        return result[0]
+
+    def _read_files(self, read_queue):
+        try:
+            for path in self.paths:
+                start = time.perf_counter()
+                data = read_file(path)
+                self.read.busy += time.perf_counter() - start
+                self.read.items += 1
+                self.bytes += len(data)
+                _put(read_queue, (path, data), self.read)
+        except BaseException as e:
+            read_queue.put(e)
+            return
+        read_queue.put(_DONE)
+
+    def _parse_files(self, read_queue, write_queue):
+        # imported here as extract imports this module
+        from extract import data_rows
+        from parallel import IN_FLIGHT_PER_WORKER, extract_record_async
+        pending = deque()
+        while True:
+            item = _get(read_queue, self.parse)
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            filename, data = item
+            print(filename)
+            if self.pool is not None:
+                pending.append(extract_record_async(self.pool, filename, data))
+                if len(pending) >= IN_FLIGHT_PER_WORKER * self.parse.workers:
+                    self._collect(pending.popleft(), write_queue)
+                continue
+            start = time.perf_counter()
+            try:
+                file_data = extract_record(filename, data)
+            except UnicodeDecodeError:
+                print("Couldn't decode file in utf-8: " + filename)
+                continue
+            finally:
+                del data
+            rows, carried = data_rows(file_data)
+            self.parse.busy += time.perf_counter() - start
+            self.parse.items += 1
+            _put(write_queue, (filename, rows, carried), self.parse)
+        while pending:
+            self._collect(pending.popleft(), write_queue)
+
+    def _collect(self, task, write_queue):
+        record, seconds = _get_result(task, self.parse)
+        if record is None:
+            return
+        self.parse.busy += seconds
+        self.parse.items += 1
+        _put(write_queue, record, self.parse)
+
+    def _queued_rows(self, write_queue):
+        while True:
+            item = _get(write_queue, self.write)
+            if item is _DONE:
+                return
+            self.write.items += 1
+            yield item
+
+    def _write_rows(self, write_queue, out_path, memory_limit, sampler,
+                    result):
+        # imported here as extract imports this module
+        from extract import write_arff_rows
+        start = time.perf_counter()
+        try:
+            result.append(write_arff_rows(out_path,
+                self._queued_rows(write_queue), memory_limit, None,
+                sampler))
+        except BaseException as e:
+            result.append(e)
+            # keep draining, so the parse stage is never blocked for good
+            for _ in self._queued_rows(write_queue):
+                pass
+        self.write.busy = time.perf_counter() - start - self.write.starved
+
+    def report(self):
+        """Return a table of each stage's time and utilization."""
+        lines = ['{0:>6} {1:>6} {2:>9} {3:>9} {4:>9} {5:>12}'.format(
+            'stage', 'files', 'busy s', 'starved s', 'blocked s',
+            'utilization')]
+        for stats in (self.read, self.parse, self.write):
+            utilization = stats.busy / (stats.workers * self.wall) \
+                if self.wall else 0.0
+            lines.append('{0:>6} {1:>6} {2:>9.3f} {3:>9.3f} {4:>9.3f} '
+                '{5:>11.0%}'.format(stats.name, stats.items, stats.busy,
+                stats.starved, stats.blocked, utilization))
+        lines.append('{0:.3f}s wall, {1:.1f} MB/s read'.format(self.wall,
+            self.bytes / 2 ** 20 / self.wall if self.wall else 0.0))
+        return '\n'.join(lines)
+
+
+def _get_result(task, stats):
+    start = time.perf_counter()
+    result = task.get()
+    stats.starved += time.perf_counter() - start
+    return result
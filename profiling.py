@@ -0,0 +1,320 @@
+import contextlib
+import json
+import time
+import tracemalloc
+
+import interning
+
+STAGES = [
+    'timestamp parsing',
+    'event construction',
+    'submission building',
+    # features, labels and the row filter are computed in a single pass
+    'feature computation',
+    'arff writing'
+]
+
+
+class Profiler():
+    """
+    Collects per-stage timings and throughput for an extraction run.
+
+    Only created when profiling is requested; everywhere else a profiler of
+    None is passed around and the uninstrumented code paths are used, so
+    there is no per-line cost when profiling is switched off.
+    """
+    def __init__(self, feature_costs=False):
+        self.feature_costs = FeatureCostProfiler() if feature_costs else None
+        self.wall = dict((stage, 0.0) for stage in STAGES)
+        self.cpu = dict((stage, 0.0) for stage in STAGES)
+        self.lines = 0
+        self.bytes = 0
+        self.files = 0
+        self.event_counts = {}
+        self.event_seconds = {}
+        self.skipped_counts = {}
+        self.feature_calls = {}
+        self.feature_seconds = {}
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start_wall,
+                time.process_time() - start_cpu)
+
+    def add_stage(self, name, wall, cpu):
+        self.wall[name] = self.wall.get(name, 0.0) + wall
+        self.cpu[name] = self.cpu.get(name, 0.0) + cpu
+
+    def add_event(self, event_type, seconds):
+        name = event_type.__name__
+        self.event_counts[name] = self.event_counts.get(name, 0) + 1
+        self.event_seconds[name] = self.event_seconds.get(name, 0.0) + seconds
+
+    def add_skipped(self, skipped):
+        """Add counts of events skipped without construction, by type."""
+        for event_type, count in skipped.items():
+            name = event_type.__name__
+            self.skipped_counts[name] = self.skipped_counts.get(name, 0) + count
+
+    def add_feature(self, feature_type, calls, seconds):
+        name = feature_type.__name__
+        self.feature_calls[name] = self.feature_calls.get(name, 0) + calls
+        self.feature_seconds[name] = \
+            self.feature_seconds.get(name, 0.0) + seconds
+
+    def report(self):
+        """Return the collected measurements as a JSON-compatible dict."""
+        total_wall = time.perf_counter() - self._start_wall
+        total_cpu = time.process_time() - self._start_cpu
+        parse_wall = self.wall['timestamp parsing'] + \
+            self.wall['event construction']
+        events = {}
+        for name, count in self.event_counts.items():
+            seconds = self.event_seconds[name]
+            events[name] = {
+                'count': count,
+                'seconds': seconds,
+                'events_per_second': _rate(count, seconds)
+            }
+        features = {}
+        for name, calls in self.feature_calls.items():
+            seconds = self.feature_seconds[name]
+            features[name] = {
+                'calls': calls,
+                'seconds': seconds,
+                'seconds_per_call': seconds / calls if calls else None
+            }
+        return {
+            'total': {'wall': total_wall, 'cpu': total_cpu},
+            'stages': dict((stage, {'wall': self.wall[stage],
+                'cpu': self.cpu[stage]}) for stage in self.wall),
+            'files': self.files,
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'lines_per_second': _rate(self.lines, parse_wall),
+            'events': events,
+            'skipped_events': dict(self.skipped_counts),
+            'interning': interning.report(),
+            'features': features,
+            'feature_costs': self.feature_costs.report()
+                if self.feature_costs is not None else None
+        }
+
+    def write_json(self, path):
+        with open(path, mode='w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self):
+        """Return a human readable summary table of the measurements."""
+        report = self.report()
+        total_wall = report['total']['wall']
+        out = []
+        out.append('{0:<24} {1:>10} {2:>10} {3:>7}'.format(
+            'stage', 'wall (s)', 'cpu (s)', 'wall %'))
+        for stage, times in report['stages'].items():
+            out.append('{0:<24} {1:>10.3f} {2:>10.3f} {3:>6.1f}%'.format(
+                stage, times['wall'], times['cpu'],
+                100 * times['wall'] / total_wall if total_wall else 0))
+        out.append('{0:<24} {1:>10.3f} {2:>10.3f}'.format(
+            'total', total_wall, report['total']['cpu']))
+        out.append('')
+        out.append('{0} files, {1} lines, {2} bytes, {3} lines/s'.format(
+            report['files'], report['lines'], report['bytes'],
+            _format_rate(report['lines_per_second'])))
+        out.append('')
+        out.append('{0:<30} {1:>10} {2:>10} {3:>12}'.format(
+            'event class', 'count', 'secs', 'events/s'))
+        for name, data in sorted(report['events'].items(),
+                key=lambda item: -item[1]['seconds']):
+            out.append('{0:<30} {1:>10} {2:>10.3f} {3:>12}'.format(
+                name, data['count'], data['seconds'],
+                _format_rate(data['events_per_second'])))
+        if report['skipped_events']:
+            out.append('')
+            out.append('{0:<30} {1:>10}'.format('skipped event class',
+                'count'))
+            for name, count in sorted(report['skipped_events'].items(),
+                    key=lambda item: -item[1]):
+                out.append('{0:<30} {1:>10}'.format(name, count))
+        out.append('')
+        out.append('{0:<16} {1:>10} {2:>10} {3:>10} {4:>10} {5:>14}'.format(
+            'interned', 'strings', 'lookups', 'hits', 'evictions',
+            'bytes saved'))
+        for name, pool in report['interning'].items():
+            out.append('{0:<16} {1:>10} {2:>10} {3:>10} {4:>10} {5:>14}'
+                .format(name, pool['strings'], pool['lookups'], pool['hits'],
+                pool['evictions'], pool['saved_bytes']))
+        out.append('')
+        out.append('{0:<36} {1:>10} {2:>10} {3:>10}'.format(
+            'feature class', 'calls', 'secs', 'us/call'))
+        for name, data in sorted(report['features'].items(),
+                key=lambda item: -item[1]['seconds']):
+            out.append('{0:<36} {1:>10} {2:>10.3f} {3:>10.1f}'.format(
+                name, data['calls'], data['seconds'],
+                1e6 * (data['seconds_per_call'] or 0)))
+        if self.feature_costs is not None:
+            out.append('')
+            out.append(self.feature_costs.summary())
+        return '\n'.join(out)
+
+
+class FeatureCost():
+    """Call count, time and allocation totals for one feature class."""
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocated = 0
+        self.retained = 0
+        # keyed by history length bucket: [calls, seconds, allocated]
+        self.buckets = {}
+
+    def add(self, history_length, seconds, allocated, retained):
+        self.calls += 1
+        self.seconds += seconds
+        self.allocated += allocated
+        self.retained += retained
+        bucket = self.buckets.setdefault(history_length.bit_length(),
+            [0, 0.0, 0])
+        bucket[0] += 1
+        bucket[1] += seconds
+        bucket[2] += allocated
+
+    def growth_curve(self):
+        """
+        Return (history lengths, microseconds per call) pairs.
+
+        History lengths are grouped into power of two buckets, so the
+        curve is flat for features with constant cost per submission and
+        roughly doubles from one bucket to the next for features whose
+        cost grows linearly with the history.
+        """
+        curve = []
+        for bit_length in sorted(self.buckets):
+            calls, seconds, allocated = self.buckets[bit_length]
+            low = 1 << (bit_length - 1)
+            high = (1 << bit_length) - 1
+            label = str(low) if low == high else '{0}-{1}'.format(low, high)
+            curve.append((label, 1e6 * seconds / calls))
+        return curve
+
+    def growth(self):
+        """Return cost per call in the longest histories over the shortest."""
+        curve = self.growth_curve()
+        if len(curve) < 2 or curve[0][1] == 0:
+            return None
+        return curve[-1][1] / curve[0][1]
+
+
+class FeatureCostProfiler():
+    """
+    Measures the cost of each feature class by wrapping new_submission.
+
+    For each call the wall time and the memory allocated (from tracemalloc)
+    are recorded against the number of submissions the feature instance
+    has seen so far, so that features whose cost grows with the length of
+    the history stand out. Tracing allocations slows everything down, so
+    the absolute times are inflated; the ranking between features is what
+    is meaningful.
+    """
+    def __init__(self):
+        self.costs = {}
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def wrap(self, feature):
+        """Replace feature's new_submission with a measuring wrapper."""
+        cost = self.costs.setdefault(type(feature).__name__, FeatureCost())
+        inner = feature.new_submission
+        timer = time.perf_counter
+        traced = tracemalloc.get_traced_memory
+        reset_peak = tracemalloc.reset_peak
+        history = [0]
+
+        def new_submission(submission):
+            history[0] += 1
+            before = traced()[0]
+            reset_peak()
+            start = timer()
+            inner(submission)
+            elapsed = timer() - start
+            current, peak = traced()
+            cost.add(history[0], elapsed, peak - before, current - before)
+
+        feature.new_submission = new_submission
+
+    def ranked(self):
+        return sorted(self.costs.items(), key=lambda item: -item[1].seconds)
+
+    def report(self):
+        result = {}
+        for name, cost in self.ranked():
+            result[name] = {
+                'calls': cost.calls,
+                'seconds': cost.seconds,
+                'seconds_per_call': cost.seconds / cost.calls
+                    if cost.calls else None,
+                'allocated_bytes': cost.allocated,
+                'retained_bytes': cost.retained,
+                'growth': cost.growth(),
+                'growth_curve': [{'history': label, 'us_per_call': us}
+                    for label, us in cost.growth_curve()]
+            }
+        return result
+
+    def summary(self):
+        out = []
+        out.append('{0:<4} {1:<36} {2:>8} {3:>9} {4:>9} {5:>11} {6:>10} '
+            '{7:>7}'.format('rank', 'feature class', 'calls', 'secs',
+            'us/call', 'alloc KiB', 'kept B/call', 'growth'))
+        for rank, (name, cost) in enumerate(self.ranked(), start=1):
+            growth = cost.growth()
+            out.append('{0:<4} {1:<36} {2:>8} {3:>9.3f} {4:>9.1f} {5:>11.1f} '
+                '{6:>10.1f} {7:>7}'.format(rank, name, cost.calls,
+                cost.seconds, 1e6 * cost.seconds / max(cost.calls, 1),
+                cost.allocated / 1024, cost.retained / max(cost.calls, 1),
+                '-' if growth is None else '{0:.1f}x'.format(growth)))
+        out.append('')
+        out.append('us/call by history length:')
+        for name, cost in self.ranked():
+            out.append('  {0:<36} '.format(name) + ' '.join(
+                '{0}:{1:.1f}'.format(label, us)
+                for label, us in cost.growth_curve()))
+        return '\n'.join(out)
+
+
+def profile_stage(profiler, name):
+    """
+    Return a context manager timing stage name, or a no-op if profiler is
+    None.
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name)
+
+
+def _rate(count, seconds):
+    if seconds > 0:
+        return count / seconds
+    return None
+
+
+def _format_rate(rate):
+    if rate is None:
+        return '-'
+    return '{0:.0f}'.format(rate)
@@ -0,0 +1,126 @@
+"""
+Streaming quantiles in bounded memory.
+
+A QuantileSketch keeps its values exactly until it holds exact_limit of
+them, so short histories (most sessions) give exact quantiles. Beyond that
+it becomes a log-bucketed sketch (after DDSketch): each value is counted in
+the bucket (gamma^(k-1), gamma^k] of its magnitude, with
+gamma = (1 + accuracy) / (1 - accuracy), and a bucket is read back as
+2 gamma^k / (gamma + 1). Any quantile is then within a relative error of
+accuracy (1% by default) of the exact one, whatever the number of values,
+as long as at most max_buckets buckets are needed; a 1% sketch needs that
+many only for magnitudes spanning a factor of e^40. Past it, the buckets
+of the smallest magnitudes are merged, and only quantiles falling in them
+lose the guarantee. Values of magnitude below MIN_MAGNITUDE count as 0.
+
+The q quantile of n values is the one at rank floor(q (n - 1)) in sorted
+order, so the median of an even number of values is the lower middle one.
+"""
+import bisect
+import math
+
+DEFAULT_ACCURACY = 0.01
+DEFAULT_EXACT_LIMIT = 64
+DEFAULT_MAX_BUCKETS = 2048
+MIN_MAGNITUDE = 1e-9
+
+
+class _Buckets():
+    """Counts of values of one sign, by the key of their magnitude."""
+    def __init__(self):
+        self.counts = {}
+        # the keys in counts, in ascending order
+        self.keys = []
+
+    def add(self, key, count=1):
+        if key in self.counts:
+            self.counts[key] += count
+        else:
+            self.counts[key] = count
+            bisect.insort(self.keys, key)
+
+    def collapse(self, buckets):
+        """Merge the lowest keys until only buckets remain."""
+        if len(self.keys) <= buckets:
+            return
+        merged = self.keys[:len(self.keys) - buckets + 1]
+        del self.keys[:len(merged) - 1]
+        self.counts[self.keys[0]] = sum(self.counts.pop(k) for k in merged)
+
+
+class QuantileSketch():
+    def __init__(self, accuracy=DEFAULT_ACCURACY,
+                 exact_limit=DEFAULT_EXACT_LIMIT,
+                 max_buckets=DEFAULT_MAX_BUCKETS):
+        if not 0 < accuracy < 1:
+            raise ValueError('accuracy must be in range (0, 1)')
+        self.accuracy = accuracy
+        self.exact_limit = exact_limit
+        self.max_buckets = max_buckets
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.clear()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """Forget every value added."""
+        self.count = 0
+        # sorted values, until there are more than exact_limit
+        self._exact = []
+        self._positive = None
+        self._negative = None
+        self._zeros = 0
+
+    def add(self, value):
+        self.count += 1
+        if self._exact is not None:
+            bisect.insort(self._exact, value)
+            if len(self._exact) > self.exact_limit:
+                exact = self._exact
+                self._exact = None
+                self._positive = _Buckets()
+                self._negative = _Buckets()
+                for v in exact:
+                    self._add_bucketed(v)
+            return
+        self._add_bucketed(value)
+
+    def _add_bucketed(self, value):
+        if value > MIN_MAGNITUDE:
+            buckets = self._positive
+        elif value < -MIN_MAGNITUDE:
+            buckets = self._negative
+        else:
+            self._zeros += 1
+            return
+        buckets.add(math.ceil(math.log(abs(value)) / self._log_gamma))
+        if len(buckets.keys) > self.max_buckets:
+            buckets.collapse(self.max_buckets)
+
+    def _bucket_value(self, key):
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def quantile(self, q):
+        """Return the q quantile (0 <= q <= 1) of the values, or None."""
+        if self.count == 0:
+            return None
+        rank = math.floor(q * (self.count - 1))
+        if self._exact is not None:
+            return self._exact[rank]
+        seen = 0
+        negative = self._negative
+        for key in reversed(negative.keys):
+            seen += negative.counts[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self._zeros
+        if seen > rank:
+            return 0
+        positive = self._positive
+        for key in positive.keys:
+            seen += positive.counts[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(positive.keys[-1])
@@ -0,0 +1,134 @@
+"""
+Sampling of log files and of rows by class, as rows are written.
+
+Every random choice is made by a generator seeded from the run's seed and
+the log file's base name, so whether a file or a row is sampled doesn't
+depend on the other files, their order, sharding or workers.
+
+A Sampler sits between extraction and writing, a log file's rows at a
+time. Undersampling keeps each row of a class with a fixed probability. A
+reservoir keeps a uniform sample of a fixed number of rows of a class from
+the whole run: each row is given a random key and the rows with the
+smallest keys are kept, so only the reservoir is ever held. Its rows wait
+in a SpillBuffer (see spill.py) with just their keys in memory. As the
+reservoir isn't settled until the last file, its rows are written after
+every other row, in log order under their files' comments again.
+"""
+import heapq
+import os
+import random
+
+from spill import MemoryBudget
+
+
+def file_random(seed, path, purpose='rows'):
+    """Return a random generator for one log file and purpose."""
+    return random.Random('{0}:{1}:{2}'.format(seed, purpose,
+        os.path.basename(path)))
+
+
+def sample_files(paths, fraction, seed=0):
+    """Return a random fraction of paths, chosen file by file."""
+    return [p for p in paths
+        if file_random(seed, p, 'files').random() < fraction]
+
+
+def parse_class_values(specs, labels, convert):
+    """
+    Return a dict of class label to value from specs like 'abandoned=0.5',
+    converting each value with convert and raising ValueError if bad.
+    """
+    values = {}
+    for spec in specs:
+        label, sep, value = spec.partition('=')
+        if sep == '' or label not in labels:
+            raise ValueError('expected CLASS=VALUE with CLASS one of {0}: '
+                '{1!r}'.format(', '.join(labels), spec))
+        values[label] = convert(value)
+    return values
+
+
+class Sampler():
+    def __init__(self, seed=0, files=None, undersample=None, reservoir=None):
+        """
+        files is the fraction of log files to keep (None for all of them),
+        undersample maps class labels to the probability of keeping each
+        row, and reservoir maps class labels to the number of rows to keep.
+        """
+        self.seed = seed
+        self.files = files
+        self.undersample = undersample or {}
+        self.reservoir = reservoir or {}
+        self.seen = {}
+        self.kept = {}
+
+    @property
+    def samples_rows(self):
+        return len(self.undersample) > 0 or len(self.reservoir) > 0
+
+    def select_files(self, paths):
+        if self.files is None:
+            return paths
+        return sample_files(paths, self.files, self.seed)
+
+    def sample(self, file_rows, budget=None):
+        """
+        Yield (filename, rows) for each log file in file_rows, sampled.
+
+        The class label is the last value in each row. Reservoirs are kept
+        for each call, i.e. for each output file, within budget (a
+        MemoryBudget) if given.
+        """
+        self.seen = {}
+        self.kept = {}
+        # every row that has entered a reservoir, as (file seq, filename,
+        # row), in log order
+        held_rows = (budget or MemoryBudget()).buffer()
+        # max-heaps, by negated key, of (-key, index in held_rows)
+        heaps = dict((label, []) for label in self.reservoir)
+        for file_seq, (filename, rows) in enumerate(file_rows):
+            rng = file_random(self.seed, filename)
+            kept = []
+            for row_seq, row in enumerate(rows):
+                label = row[-1]
+                key = rng.random()
+                self.seen[label] = self.seen.get(label, 0) + 1
+                heap = heaps.get(label)
+                if heap is not None:
+                    if self.reservoir[label] == 0:
+                        continue
+                    item = (-key, len(held_rows))
+                    if len(heap) < self.reservoir[label]:
+                        heapq.heappush(heap, item)
+                    elif -key > heap[0][0]:
+                        heapq.heapreplace(heap, item)
+                    else:
+                        continue
+                    held_rows.add((file_seq, filename, row))
+                    continue
+                ratio = self.undersample.get(label)
+                if ratio is None or key < ratio:
+                    kept.append(row)
+                    self.kept[label] = self.kept.get(label, 0) + 1
+            yield filename, kept
+        for label in heaps:
+            self.kept[label] = len(heaps[label])
+        held = set(index for heap in heaps.values() for _, index in heap)
+        current_seq = None
+        for index, (file_seq, filename, row) in enumerate(held_rows):
+            if index not in held:
+                continue
+            if file_seq != current_seq:
+                if current_seq is not None:
+                    yield current_filename, current_rows
+                current_seq = file_seq
+                current_filename = filename
+                current_rows = []
+            current_rows.append(row)
+        if current_seq is not None:
+            yield current_filename, current_rows
+
+    def summary(self):
+        return 'Sampled rows: ' + ', '.join('{0} {1}/{2}'.format(label,
+            self.kept.get(label, 0), seen)
+            for label, seen in sorted(self.seen.items()))
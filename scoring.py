@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Score submissions with an abandonment model exported from Weka.
+
+Two simple model formats are supported, both stored as JSON:
+
+Logistic regression::
+
+    {"type": "logistic", "intercept": -1.3,
+     "coefficients": {"violated_constraints": 0.21,
+                      "prev_completed=True": -0.8},
+     "replace_missing": {"violated_constraints": 2.4}}
+
+Nominal attributes are one-hot encoded as "name=value", as Weka's
+Logistic does. Missing numeric values are replaced by the value in
+replace_missing (Weka uses the training mean), or 0 if there isn't one.
+
+J48-style decision tree::
+
+    {"type": "tree",
+     "root": {"attribute": "violated_constraints", "threshold": 2,
+              "le": {"distribution": {"abandoned": 3, "not_abandoned": 40}},
+              "gt": {"attribute": "prev_completed",
+                     "branches": {"True": {"probability": 0.2},
+                                  "False": {"probability": 0.7}}}}}
+
+Numeric splits send values <= threshold to "le" and the rest to "gt";
+nominal splits follow "branches". As in C4.5, a missing value is sent down
+every branch, weighted by the optional "weights" of the node's branches
+(equal weights if not given). Leaves give the probability of abandonment
+directly or as a class distribution.
+
+Either kind of model may list the "attributes" (name and type) it was
+trained on; these are checked against the attributes build_arff produces
+before anything is scored. With numpy installed, a log file is scored a
+column at a time: the logistic model as a dot product of its feature
+matrix, and the tree with a mask of the rows taking each branch of each
+split. Without numpy it is scored a row at a time.
+"""
+import argparse
+import csv
+import json
+import math
+import sys
+from abc import ABCMeta, abstractmethod
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+POSITIVE_CLASS = 'abandoned'
+NOMINAL_SEPARATOR = '='
+
+
+class SchemaError(ValueError):
+    """Raised when a model doesn't match the attributes being scored."""
+    pass
+
+
+def is_nominal(type):
+    return type.startswith('{')
+
+
+def nominal_values(type):
+    return [v.strip() for v in type.strip('{}').split(',')]
+
+
+def load_model(filename):
+    """Load a model from a JSON file as a LogisticModel or TreeModel."""
+    with open(filename) as f:
+        spec = json.load(f)
+    kind = spec.get('type')
+    if kind == 'logistic':
+        return LogisticModel(spec)
+    elif kind == 'tree':
+        return TreeModel(spec)
+    else:
+        raise ValueError("Unknown model type: " + str(kind))
+
+
+class ModelBase(metaclass=ABCMeta):
+    def __init__(self, spec):
+        self.positive_class = spec.get('class', POSITIVE_CLASS)
+        self.attributes = spec.get('attributes')
+
+    @abstractmethod
+    def referenced_attributes(self):
+        """Return {name: 'numeric' or 'nominal'} of attributes it uses."""
+        pass
+
+    def check_schema(self, attributes):
+        """
+        Check the model against ArffAttributes from build_arff.
+
+        Raises a SchemaError if an attribute the model was trained on or uses
+        is missing or has a different type.
+        """
+        types = dict((a.name, a.type) for a in attributes)
+        if self.attributes is not None:
+            for attribute in self.attributes:
+                name = attribute['name']
+                if name not in types:
+                    raise SchemaError("Model attribute missing from data: " +
+                        name)
+                if attribute['type'] != types[name]:
+                    raise SchemaError(("Model attribute {0} has type {1} " +
+                        "but data has {2}").format(name, attribute['type'],
+                        types[name]))
+        for name, kind in self.referenced_attributes().items():
+            if name not in types:
+                raise SchemaError("Model uses attribute missing from data: " +
+                    name)
+            if (kind == 'nominal') != is_nominal(types[name]):
+                raise SchemaError("Model uses {0} as {1} but data has {2}"
+                    .format(name, kind, types[name]))
+
+    def score(self, attributes):
+        """Return the probability of abandonment for each row."""
+        rows = len(attributes[0].values) if attributes else 0
+        if numpy is not None:
+            return self._score_columns(_Columns(attributes), rows).tolist()
+        columns = dict((a.name, a.values) for a in attributes)
+        return [self._score_row(columns, i) for i in range(rows)]
+
+    @abstractmethod
+    def _score_columns(self, columns, rows):
+        """Return a numpy array of the probability for each row."""
+        pass
+
+    @abstractmethod
+    def _score_row(self, columns, i):
+        """Return the probability for row i of columns (lists of values)."""
+        pass
+
+
+class _Columns():
+    """Attributes' values as numpy arrays, converted when first used."""
+    def __init__(self, attributes):
+        self._values = dict((a.name, a.values) for a in attributes)
+        self._numeric = {}
+        self._nominal = {}
+
+    def numeric(self, name):
+        """Return a float array of the column, with NaN for missing values."""
+        column = self._numeric.get(name)
+        if column is None:
+            column = self._numeric[name] = numpy.array(self._values[name],
+                dtype=float)
+        return column
+
+    def nominal(self, name):
+        """Return a str array of the column, with 'None' for missing values."""
+        column = self._nominal.get(name)
+        if column is None:
+            column = self._nominal[name] = numpy.array(self._values[name],
+                dtype=str)
+        return column
+
+
+class LogisticModel(ModelBase):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.intercept = float(spec.get('intercept', 0.0))
+        self.coefficients = dict((k, float(v))
+            for k, v in spec['coefficients'].items())
+        self.replace_missing = spec.get('replace_missing', {})
+        # (name, nominal value or None, coefficient, fill for missing)
+        self._terms = []
+        for key, coefficient in self.coefficients.items():
+            name, value = self._split(key)
+            self._terms.append((name, value, coefficient,
+                float(self.replace_missing.get(name, 0.0))))
+
+    def _split(self, key):
+        if NOMINAL_SEPARATOR in key:
+            name, value = key.split(NOMINAL_SEPARATOR, 1)
+            return name, value
+        return key, None
+
+    def referenced_attributes(self):
+        result = {}
+        for key in self.coefficients:
+            name, value = self._split(key)
+            result[name] = 'numeric' if value is None else 'nominal'
+        return result
+
+    def _score_columns(self, columns, rows):
+        z = numpy.full(rows, self.intercept)
+        if len(self._terms) > 0:
+            features = numpy.empty((rows, len(self._terms)))
+            for j, (name, value, coefficient, fill) in enumerate(self._terms):
+                if value is None:
+                    x = columns.numeric(name)
+                    features[:, j] = numpy.where(numpy.isnan(x), fill, x)
+                else:
+                    features[:, j] = columns.nominal(name) == value
+            z += features @ numpy.array([t[2] for t in self._terms])
+        return 1 / (1 + numpy.exp(-numpy.clip(z, -500, 500)))
+
+    def _score_row(self, columns, i):
+        z = self.intercept
+        for name, value, coefficient, fill in self._terms:
+            v = columns[name][i]
+            if value is None:
+                z += coefficient * (fill if v is None else v)
+            elif v is not None and str(v) == value:
+                z += coefficient
+        return _sigmoid(z)
+
+
+class _Split():
+    """A decision tree node splitting on an attribute."""
+    def __init__(self, node, compile_node):
+        self.attribute = node['attribute']
+        self.nominal = 'branches' in node
+        if self.nominal:
+            self.names = list(node['branches'])
+            self.children = [compile_node(node['branches'][n])
+                for n in self.names]
+            self._lookup = dict((n, j) for j, n in enumerate(self.names))
+        else:
+            self.names = ['le', 'gt']
+            self.children = [compile_node(node['le']),
+                compile_node(node['gt'])]
+            self.threshold = node['threshold']
+        weights = node.get('weights')
+        if weights is None:
+            self.fractions = [1 / len(self.children)] * len(self.children)
+        else:
+            total = sum(weights.get(n, 0) for n in self.names)
+            self.fractions = [weights.get(n, 0) / total for n in self.names]
+
+    def branch(self, value):
+        """Return the child index for value, or None to take every branch."""
+        if value is None:
+            return None
+        if self.nominal:
+            return self._lookup.get(str(value))
+        return 0 if value <= self.threshold else 1
+
+    def masks(self, columns):
+        """Return a mask of the rows taking each branch, and of those taking
+        every branch."""
+        if self.nominal:
+            column = columns.nominal(self.attribute)
+            masks = [column == name for name in self.names]
+            missing = ~numpy.logical_or.reduce(masks)
+        else:
+            column = columns.numeric(self.attribute)
+            missing = numpy.isnan(column)
+            le = column <= self.threshold
+            masks = [le, ~le & ~missing]
+        return masks, missing
+
+
+class TreeModel(ModelBase):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.root = spec['root']
+        # splits become _Splits and leaves their probability of abandonment
+        self._tree = self._compile(self.root)
+
+    def _compile(self, node):
+        if 'attribute' not in node:
+            return self._leaf_probability(node)
+        return _Split(node, self._compile)
+
+    def referenced_attributes(self):
+        result = {}
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if 'attribute' not in node:
+                continue
+            if 'branches' in node:
+                result[node['attribute']] = 'nominal'
+                nodes.extend(node['branches'].values())
+            else:
+                result[node['attribute']] = 'numeric'
+                nodes.append(node['le'])
+                nodes.append(node['gt'])
+        return result
+
+    def _leaf_probability(self, node):
+        if 'probability' in node:
+            return float(node['probability'])
+        distribution = node['distribution']
+        total = sum(distribution.values())
+        if total == 0:
+            return 0.0
+        return distribution.get(self.positive_class, 0) / total
+
+    def _score_columns(self, columns, rows):
+        # each node is visited once, with the weight of every row reaching it
+        result = numpy.zeros(rows)
+        nodes = [(self._tree, numpy.ones(rows))]
+        while nodes:
+            node, weights = nodes.pop()
+            if not isinstance(node, _Split):
+                result += weights * node
+                continue
+            masks, missing = node.masks(columns)
+            for child, mask, fraction in zip(node.children, masks,
+                    node.fractions):
+                child_weights = numpy.where(mask, weights,
+                    numpy.where(missing, weights * fraction, 0.0))
+                if child_weights.any():
+                    nodes.append((child, child_weights))
+        return result
+
+    def _score_row(self, columns, i):
+        probability = 0.0
+        nodes = [(self._tree, 1.0)]
+        while nodes:
+            node, weight = nodes.pop()
+            if not isinstance(node, _Split):
+                probability += weight * node
+                continue
+            branch = node.branch(columns[node.attribute][i])
+            if branch is None:
+                # missing (or unseen nominal value): go down every branch
+                for child, fraction in zip(node.children, node.fractions):
+                    nodes.append((child, weight * fraction))
+            else:
+                nodes.append((node.children[branch], weight))
+        return probability
+
+
+def _sigmoid(z):
+    if z < -500:
+        return 0.0
+    return 1 / (1 + math.exp(-z))
+
+
+def score_files(model, file_data, out_file):
+    """
+    Score each log file's rows, writing file, row, probability as CSV.
+
+    file_data may be any iterable of LogFileData, so files can be extracted
+    one at a time as they are scored.
+    """
+    # imported here as extract is also the command line entry point
+    from extract import build_arff
+    writer = csv.writer(out_file)
+    writer.writerow(['file', 'row', 'probability'])
+    checked = False
+    rows = 0
+    for data in file_data:
+        attributes = build_arff(data)
+        if not checked:
+            model.check_schema(attributes)
+            checked = True
+        for row, probability in enumerate(model.score(attributes)):
+            writer.writerow([data.filename, row, probability])
+        rows += len(attributes[0].values)
+    return rows
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Score log files with an exported abandonment model.')
+    parser.add_argument('model', help='JSON model file')
+    parser.add_argument('dir_path', help='directory containing .log files')
+    parser.add_argument('out_file', help='CSV file to write scores to')
+    parser.add_argument('--store',
+        help='SQLite store to load unchanged log files from')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    from extract import extract_each, log_files
+    from store import Store
+    model = load_model(args.model)
+    store = Store(args.store) if args.store is not None else None
+    file_data = extract_each(log_files(args.dir_path), store=store)
+    with open(args.out_file, mode='w', newline='') as f:
+        score_files(model, file_data, f)
+    if store is not None:
+        store.close()
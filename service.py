@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+A local HTTP service returning the features of a single log on demand.
+
+POST /features with a JSON body of {"path": "<log file>"} (relative to the
+--log-dir the service was started with) or with the log text itself as the
+body. The response is JSON:
+
+    {"filename": ..., "attributes": [{"name": ..., "type": ...}, ...],
+     "rows": [[...], ...], "labels": ["abandoned", ...]}
+
+with one row of feature values and one label per submission, exactly as
+extract.py would write them (missing values are null). GET /health reports
+the load.
+
+The event loop only reads requests and writes responses; parsing, feature
+extraction and JSON encoding run in a process pool. At most workers +
+queue_size requests are extracting or waiting for a worker at once, and
+beyond that requests are turned away straight away with a 503, so a burst
+can't pile up unbounded work. Every response has a Server-Timing header
+giving the time queued for a worker, the time extracting and the total, in
+milliseconds.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from extract import build_arff, process_submissions, read_event_stream, \
+    read_events
+from loggen import parse_size
+from submission import events_to_submissions, SUBMISSION_EVENT_TYPES
+
+DEFAULT_PORT = 8366
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_MAX_BODY = '64MB'
+# seconds allowed for a client to send its request
+REQUEST_TIMEOUT = 60
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def extract_features(path=None, text=None, name='upload'):
+    """
+    Return the status and JSON body of the features of a log.
+
+    The log is read from path or, if path is None, parsed from text (bytes
+    of utf-8). Runs in a worker process.
+    """
+    try:
+        if path is not None:
+            events = read_events(path, wanted=SUBMISSION_EVENT_TYPES)
+            name = path
+        else:
+            events = read_event_stream(
+                io.StringIO(text.decode('utf-8'), newline=None),
+                SUBMISSION_EVENT_TYPES)
+    except FileNotFoundError:
+        return HTTPStatus.NOT_FOUND, _error_body('no such log file')
+    except UnicodeDecodeError:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, \
+            _error_body("couldn't decode log in utf-8")
+    subms = events_to_submissions(events)
+    del events
+    attributes = build_arff(process_submissions(name, subms))
+    labels = attributes.pop()
+    return HTTPStatus.OK, json.dumps({
+        'filename': name,
+        'attributes': [{'name': a.name, 'type': a.type} for a in attributes],
+        'rows': [[_json_value(v) for v in row]
+            for row in zip(*[a.values for a in attributes])],
+        'labels': labels.values
+    }).encode('utf-8')
+
+
+def _timed_extract_features(path, text):
+    started = time.time()
+    status, body = extract_features(path, text)
+    return status, body, started, time.time()
+
+
+def _error_body(message):
+    return json.dumps({'error': message}).encode('utf-8')
+
+
+async def read_request(reader, max_body):
+    """Return the method, path, headers and body of an HTTP request."""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'incomplete request')
+    except asyncio.LimitOverrunError:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+            'request headers too large')
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'malformed request line')
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    if 'transfer-encoding' in headers:
+        raise HttpError(HTTPStatus.LENGTH_REQUIRED,
+            'send a Content-Length rather than a Transfer-Encoding')
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'bad Content-Length')
+    if length > max_body:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            'request body larger than {0} bytes'.format(max_body))
+    try:
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'incomplete request body')
+    return method, target.split('?', 1)[0], headers, body
+
+
+class FeatureService():
+    def __init__(self, workers, queue_size=DEFAULT_QUEUE_SIZE, log_dir=None,
+                 max_body=parse_size(DEFAULT_MAX_BODY)):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.log_dir = None if log_dir is None else os.path.realpath(log_dir)
+        self.max_body = max_body
+        self.pool = ProcessPoolExecutor(workers)
+        # requests extracting or waiting for a worker
+        self.pending = 0
+        self.served = 0
+        self.rejected = 0
+
+    def close(self):
+        self.pool.shutdown()
+
+    def resolve_path(self, path):
+        """Return the log file path a request names, inside the log dir."""
+        if self.log_dir is None:
+            raise HttpError(HTTPStatus.FORBIDDEN,
+                'log file paths are only accepted with --log-dir')
+        resolved = os.path.realpath(os.path.join(self.log_dir, path))
+        if not resolved.startswith(self.log_dir + os.sep):
+            raise HttpError(HTTPStatus.FORBIDDEN,
+                'log file paths must be inside the log directory')
+        return resolved
+
+    async def features(self, headers, body):
+        path = None
+        text = None
+        if headers.get('content-type', '').startswith('application/json'):
+            try:
+                path = json.loads(body)['path']
+            except (ValueError, TypeError, KeyError):
+                raise HttpError(HTTPStatus.BAD_REQUEST,
+                    'expected a JSON object with a "path"')
+            if not isinstance(path, str):
+                raise HttpError(HTTPStatus.BAD_REQUEST,
+                    '"path" must be a string')
+            path = self.resolve_path(path)
+        else:
+            text = body
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE,
+                'too many requests queued, try again shortly')
+        self.pending += 1
+        submitted = time.time()
+        try:
+            status, body, started, finished = \
+                await asyncio.get_running_loop().run_in_executor(
+                    self.pool, _timed_extract_features, path, text)
+        finally:
+            self.pending -= 1
+        self.served += 1
+        return status, body, [('queue', started - submitted),
+            ('extract', finished - started)]
+
+    def health(self):
+        return HTTPStatus.OK, json.dumps({
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'pending': self.pending,
+            'served': self.served,
+            'rejected': self.rejected
+        }).encode('utf-8'), []
+
+    async def dispatch(self, method, path, headers, body):
+        if path == '/features':
+            if method != 'POST':
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 'use POST')
+            return await self.features(headers, body)
+        if path == '/health':
+            return self.health()
+        raise HttpError(HTTPStatus.NOT_FOUND, 'no such endpoint')
+
+    async def handle(self, reader, writer):
+        start = time.time()
+        timings = []
+        try:
+            request = await asyncio.wait_for(
+                read_request(reader, self.max_body), REQUEST_TIMEOUT)
+            status, body, timings = await self.dispatch(*request)
+        except HttpError as e:
+            status, body = e.status, _error_body(str(e))
+        except asyncio.TimeoutError:
+            status, body = HTTPStatus.REQUEST_TIMEOUT, \
+                _error_body('request not received in time')
+        except Exception as e:
+            print('Error handling request: {0!r}'.format(e), file=sys.stderr)
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, \
+                _error_body('internal error')
+        timings.append(('total', time.time() - start))
+        headers = [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Connection', 'close'),
+            ('Server-Timing', ', '.join('{0};dur={1:.1f}'.format(
+                name, seconds * 1000) for name, seconds in timings))
+        ]
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            headers.append(('Retry-After', '1'))
+        try:
+            writer.write('HTTP/1.1 {0} {1}\r\n{2}\r\n\r\n'.format(
+                status.value, status.phrase,
+                '\r\n'.join(n + ': ' + v for n, v in headers))
+                .encode('latin-1'))
+            writer.write(body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port,
+            backlog=1024)
+        print('Serving on http://{0}:{1}/'.format(host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Serve the features of SQL-Tutor logs over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+        help='extraction processes (default: one per CPU)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+        help='requests which may wait for a worker before more are turned '
+             'away with 503 (default %(default)s)')
+    parser.add_argument('--log-dir',
+        help='directory log file paths are relative to; without it only '
+             'uploaded log text is accepted')
+    parser.add_argument('--max-body', type=parse_size,
+        default=parse_size(DEFAULT_MAX_BODY),
+        help='largest log text accepted (default ' + DEFAULT_MAX_BODY + ')')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.queue_size < 0:
+        parser.error('--queue-size must not be negative')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    service = FeatureService(args.workers, args.queue_size, args.log_dir,
+        args.max_body)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
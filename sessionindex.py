@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Sidecar indexes of the sessions in each log file, for random access.
+
+A log file's index (<log>.sessions.json) records, for every session, the
+byte offset it starts at, the timestamps of its first and last events,
+whether it ended with a logout and the problem ids it touched. Sessions are
+numbered as in the store (see store.session_numbers): a new one starts at
+every LoggedInEvent, and anything before the first login is in session 0.
+
+With the index, a range of sessions, or the sessions overlapping a time
+range, can be parsed and featurized by seeking straight to them instead of
+re-reading the whole file. Features are then computed from the start of
+the first session read, so cumulative features only count the sessions
+extracted. Indexes are refreshed whenever they are used: a log which has
+only grown is scanned from its last session onwards, and anything else
+which changed is indexed again from scratch.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+
+import logevents
+from logevents import parse_event, LoggedInEvent, SessionEndEvent
+from submission import events_to_submissions, SUBMISSION_EVENT_TYPES
+from timeutil import NO_TIME, from_datetime, parse_timestamp, \
+    timestamp_extract, to_datetime
+
+INDEX_SUFFIX = '.sessions.json'
+INDEX_VERSION = 1
+# a log whose first bytes change has been replaced rather than appended to
+HEAD_BYTES = 4096
+
+# the events the index needs: boundaries, and those naming a problem
+_INDEXED_EVENTS = logevents.event_types([LoggedInEvent, SessionEndEvent,
+    logevents.DrawingProblemEvent, logevents.ClientRespondingEvent,
+    logevents.DatabaseChangeEvent])
+
+
+class Session():
+    def __init__(self, offset, start=NO_TIME, end=NO_TIME, logged_out=False,
+                 problems=()):
+        self.offset = offset
+        self.start = start
+        self.end = end
+        self.logged_out = logged_out
+        self.problems = set(problems)
+
+    def add_event(self, event):
+        if self.start == NO_TIME:
+            self.start = event.timestamp
+        self.end = event.timestamp
+        if isinstance(event, SessionEndEvent):
+            self.logged_out = True
+        problem_id = getattr(event, 'problem_id', None)
+        if problem_id is None:
+            problem_id = getattr(event, 'problem', None)
+        if problem_id is not None:
+            self.problems.add(problem_id)
+
+    def to_json(self):
+        return {
+            'offset': self.offset,
+            'start': None if self.start == NO_TIME else self.start,
+            'end': None if self.end == NO_TIME else self.end,
+            'logged_out': self.logged_out,
+            'problems': sorted(self.problems)
+        }
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(value['offset'],
+            NO_TIME if value['start'] is None else value['start'],
+            NO_TIME if value['end'] is None else value['end'],
+            value['logged_out'], value['problems'])
+
+
+class SessionIndex():
+    """The sessions of one log file, as of when it was size bytes long."""
+    def __init__(self, log_path, size=0, mtime=None, head_crc=None,
+                 sessions=None):
+        self.log_path = log_path
+        self.size = size
+        self.mtime = mtime
+        self.head_crc = head_crc
+        self.sessions = [] if sessions is None else sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    @classmethod
+    def load(cls, log_path):
+        """Return the saved index of log_path, or None if there isn't one."""
+        try:
+            with open(index_path(log_path)) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if value.get('version') != INDEX_VERSION:
+            return None
+        return cls(log_path, value['size'], value['mtime'],
+            value['head_crc'], [Session.from_json(s)
+                for s in value['sessions']])
+
+    def save(self):
+        path = index_path(self.log_path)
+        temp_path = path + '.tmp'
+        with open(temp_path, mode='w') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'size': self.size,
+                'mtime': self.mtime,
+                'head_crc': self.head_crc,
+                'sessions': [s.to_json() for s in self.sessions]
+            }, f)
+        os.replace(temp_path, path)
+
+    def end_offset(self, number):
+        """Return the byte offset just past session number."""
+        if number + 1 < len(self.sessions):
+            return self.sessions[number + 1].offset
+        return self.size
+
+    def add_event(self, offset, event):
+        """Add an event starting at byte offset, in log order."""
+        if isinstance(event, LoggedInEvent) and len(self.sessions) > 0 and \
+                self._seen_login:
+            self.sessions.append(Session(offset))
+        elif len(self.sessions) == 0:
+            self.sessions.append(Session(0))
+        if isinstance(event, LoggedInEvent):
+            self._seen_login = True
+        self.sessions[-1].add_event(event)
+
+    def scan(self, file, wanted=_INDEXED_EVENTS):
+        """
+        Index a binary log file from the start of the last session on.
+
+        Returns the events of wanted types (None for all of them) read.
+        """
+        if len(self.sessions) > 0:
+            offset = self.sessions.pop().offset
+        else:
+            offset = 0
+        # every session after the first starts with a login
+        self._seen_login = len(self.sessions) > 0
+        file.seek(offset)
+        events = []
+        for event_offset, event in _indexed_events(file, offset, wanted):
+            self.add_event(event_offset, event)
+            events.append(event)
+        stat = os.fstat(file.fileno())
+        self.size = file.tell()
+        self.mtime = stat.st_mtime
+        self.head_crc = _head_crc(file)
+        return events
+
+    def is_current(self):
+        stat = os.stat(self.log_path)
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def has_grown(self, file):
+        """Return True if the log has only been appended to since indexing."""
+        stat = os.fstat(file.fileno())
+        return stat.st_size > self.size and self.head_crc == _head_crc(file)
+
+    def between(self, first, last):
+        """Return the numbers of sessions first to last, inclusive."""
+        if first < 0 or last >= len(self.sessions) or first > last:
+            raise IndexError('sessions {0} to {1} not in {2} ({3} '
+                'sessions)'.format(first, last, self.log_path,
+                len(self.sessions)))
+        return range(first, last + 1)
+
+    def overlapping(self, start=NO_TIME, end=NO_TIME):
+        """
+        Return the numbers of the sessions overlapping a time range.
+
+        start and end are in seconds since the epoch, either of which may be
+        NO_TIME to leave the range open on that side. As the sessions are
+        read as one run, this is every session from the first to the last
+        that overlaps.
+        """
+        numbers = [i for i, s in enumerate(self.sessions)
+            if s.start != NO_TIME and
+                (end == NO_TIME or s.start <= end) and
+                (start == NO_TIME or s.end >= start)]
+        if len(numbers) == 0:
+            return range(0)
+        return range(numbers[0], numbers[-1] + 1)
+
+
+class _LineReader():
+    """Text lines of a binary file, keeping count of the byte offset."""
+    def __init__(self, file, offset):
+        self.file = file
+        self.offset = offset
+
+    def readline(self):
+        line = self.file.readline()
+        self.offset += len(line)
+        # as a file opened in text mode would
+        return line.decode('utf-8').replace('\r\n', '\n')
+
+
+def _indexed_events(file, offset, wanted):
+    """Yield (byte offset, event) for each event in file from offset."""
+    reader = _LineReader(file, offset)
+    while True:
+        start = reader.offset
+        line = reader.readline()
+        if line == '':
+            break
+        try:
+            timestamp, line = timestamp_extract(line)
+            event = parse_event(timestamp, line, reader, wanted)
+        except ValueError:
+            continue
+        if event is not None:
+            yield start, event
+
+
+def _head_crc(file):
+    file.seek(0)
+    return zlib.crc32(file.read(HEAD_BYTES))
+
+
+def index_path(log_path):
+    return log_path + INDEX_SUFFIX
+
+
+def update_index(log_path):
+    """Return the index of log_path, building or refreshing it if needed."""
+    index = SessionIndex.load(log_path)
+    if index is not None and index.is_current():
+        return index
+    with open(log_path, mode='rb') as f:
+        if index is None or not index.has_grown(f):
+            index = SessionIndex(log_path)
+        index.scan(f)
+    index.save()
+    return index
+
+
+def read_events_indexed(log_path):
+    """
+    Read every event of a log file, as extract.read_events, and index it.
+
+    This is how the store builds indexes as it ingests (see
+    store.ingest_files) without reading the log a second time.
+    """
+    index = SessionIndex(log_path)
+    with open(log_path, mode='rb') as f:
+        events = index.scan(f, wanted=None)
+    index.save()
+    return events
+
+
+def read_session_events(index, numbers, wanted=None):
+    """Read the events of a run of sessions from the log file."""
+    if len(numbers) == 0:
+        return []
+    # imported here as extract imports store, which imports this module
+    from extract import read_event_stream
+    start = index.sessions[numbers[0]].offset
+    end = index.end_offset(numbers[-1])
+    with open(index.log_path, mode='rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    return read_event_stream(io.StringIO(text, newline=None), wanted)
+
+
+def extract_sessions(index, numbers, profiler=None):
+    """Return the LogFileData of a run of sessions, as extract.extract_data."""
+    from extract import process_submissions
+    events = read_session_events(index, numbers, SUBMISSION_EVENT_TYPES)
+    subms = events_to_submissions(events)
+    del events
+    return process_submissions(index.log_path, subms, profiler)
+
+
+def parse_time(text):
+    """Parse a time in the logs' format or YYYY-MM-DD HH:MM:SS."""
+    try:
+        return parse_timestamp(text)
+    except ValueError:
+        return from_datetime(datetime.fromisoformat(text))
+
+
+def parse_session_range(text):
+    """Parse N or N..M into a (first, last) pair of session numbers."""
+    first, _, last = text.partition('..')
+    return int(first), int(last or first)
+
+
+def _format_time(seconds):
+    if seconds == NO_TIME:
+        return '-'
+    return to_datetime(seconds).isoformat(sep=' ')
+
+
+def print_sessions(index):
+    print('{0:>7} {1:>12} {2:>10} {3:>19} {4:>19} {5:>4}  {6}'.format(
+        'session', 'offset', 'bytes', 'start', 'end', 'out', 'problems'))
+    for i, s in enumerate(index.sessions):
+        print('{0:>7} {1:>12} {2:>10} {3:>19} {4:>19} {5:>4}  {6}'.format(
+            i, s.offset, index.end_offset(i) - s.offset,
+            _format_time(s.start), _format_time(s.end),
+            'yes' if s.logged_out else 'no',
+            ' '.join(str(p) for p in sorted(s.problems))))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Index the sessions in SQL-Tutor log files, and '
+                    'extract features from just some of them.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build',
+        help='build or refresh the indexes of log files')
+    build.add_argument('paths', nargs='+',
+        help='.log files, or directories containing them')
+    show = commands.add_parser('list', help="list a log file's sessions")
+    show.add_argument('log_path')
+    extract = commands.add_parser('extract',
+        help='extract features from some of the sessions of a log file')
+    extract.add_argument('log_path')
+    extract.add_argument('out_name', help='output name (without extension)')
+    extract.add_argument('--sessions', type=parse_session_range,
+        help='session numbers N or N..M (inclusive)')
+    extract.add_argument('--from', dest='start', type=parse_time,
+        default=NO_TIME, help='start of a time range, e.g. '
+        '"13:05:00 28/03/2010" or "2010-03-28 13:05:00"')
+    extract.add_argument('--to', dest='end', type=parse_time,
+        default=NO_TIME, help='end of the time range')
+    args = parser.parse_args(argv)
+    if args.command == 'extract' and args.sessions is not None and \
+            (args.start != NO_TIME or args.end != NO_TIME):
+        parser.error('--sessions cannot be combined with --from or --to')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    if args.command == 'build':
+        from extract import log_files
+        for path in args.paths:
+            for log_path in log_files(path) if os.path.isdir(path) \
+                    else [path]:
+                index = update_index(log_path)
+                print('{0}: {1} sessions'.format(log_path, len(index)))
+    elif args.command == 'list':
+        print_sessions(update_index(args.log_path))
+    else:
+        from extract import write_arff
+        index = update_index(args.log_path)
+        try:
+            if args.sessions is not None:
+                numbers = index.between(*args.sessions)
+            else:
+                numbers = index.overlapping(args.start, args.end)
+        except IndexError as e:
+            sys.exit(str(e))
+        print('{0}: sessions {1}'.format(args.log_path,
+            '{0}..{1}'.format(numbers[0], numbers[-1]) if numbers
+            else 'none'))
+        write_arff(args.out_name + '.arff',
+            [extract_sessions(index, numbers)])
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+
+SHARD_FORMAT = "{0}.shard-{1:05d}-of-{2:05d}"
+
+
+def shard_for_file(path, shard_count):
+    """
+    Return the shard index that a log file belongs to.
+
+    The shard is derived from a BLAKE2b hash of the log file's base name,
+    so the assignment is stable between runs, machines and directory
+    layouts, and all rows from one student's log always end up in the same
+    shard. Unlike a CRC32, it spreads sequentially numbered logs evenly.
+    """
+    name = os.path.basename(path).encode('utf-8')
+    digest = hashlib.blake2b(name, digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shard_count
+
+
+def shard_name(out_name, shard_index, shard_count):
+    """Return the output path prefix for a shard (without extension)."""
+    return SHARD_FORMAT.format(out_name, shard_index, shard_count)
+
+
+def files_for_shard(paths, shard_index, shard_count):
+    """Return the log files in paths which belong to the given shard."""
+    return [p for p in paths if shard_for_file(p, shard_count) == shard_index]
+
+
+def write_manifest(out_name, shard_index, shard_count, attributes, comments,
+                   rows=None):
+    """
+    Write the JSON manifest for a single shard.
+
+    Each shard gets its own manifest so that shards can be produced by
+    independent workers without a final merge step. The manifest records
+    the ARFF schema, the total row count and the rows contributed by each
+    log file. rows defaults to the number of values in the attributes.
+
+    A log file's rows may be written in more than one place (reservoir
+    samples are written last, see sampling.py). Its entry then gives the
+    total rows, and the first row and rows of each place as ranges.
+    """
+    prefix = shard_name(out_name, shard_index, shard_count)
+    if rows is None:
+        rows = len(attributes[0].values) if len(attributes) > 0 else 0
+    files = []
+    entries = {}
+    for i, comment in enumerate(comments):
+        if i + 1 < len(comments):
+            end = comments[i + 1].index
+        else:
+            end = rows
+        entry = entries.get(comment.comment)
+        if entry is None:
+            entry = entries[comment.comment] = {
+                'filename': comment.comment,
+                'first_row': comment.index,
+                'rows': end - comment.index
+            }
+            files.append(entry)
+            continue
+        if 'ranges' not in entry:
+            entry['ranges'] = [[entry['first_row'], entry['rows']]]
+        entry['ranges'].append([comment.index, end - comment.index])
+        entry['rows'] += end - comment.index
+    manifest = {
+        'shard': shard_index,
+        'shard_count': shard_count,
+        'data': os.path.basename(prefix + '.arff'),
+        'rows': rows,
+        'attributes': [{'name': a.name, 'type': a.type} for a in attributes],
+        'files': files
+    }
+    with open(prefix + '.json', mode='w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,129 @@
+import pickle
+import tempfile
+from collections import deque
+
+
+class MemoryBudget():
+    """
+    A memory limit shared by every SpillBuffer made from it.
+
+    Records are pickled as they are added to a buffer, which is already far
+    more compact than the Python objects, and kept in memory until the
+    buffers between them hold more than limit bytes (None for no limit).
+    Every buffer then spills its records to its own temporary file (in
+    directory, or the system default) and memory is freed. close() removes
+    the temporary files.
+    """
+    def __init__(self, limit=None, directory=None):
+        self.limit = limit
+        self.directory = directory
+        self.memory_bytes = 0
+        self.spills = 0
+        self.spilled_bytes = 0
+        self._buffers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def buffer(self):
+        """Return a new, empty SpillBuffer within the budget."""
+        buffer = SpillBuffer(self)
+        self._buffers.append(buffer)
+        return buffer
+
+    def _added(self, size):
+        self.memory_bytes += size
+        if self.limit is not None and self.memory_bytes > self.limit:
+            for buffer in self._buffers:
+                buffer.spill()
+
+    def close(self):
+        for buffer in self._buffers:
+            buffer.close()
+        self._buffers = []
+
+
+class SpillBuffer():
+    """
+    A first in, first out queue of records held within a MemoryBudget.
+
+    Spilled records are appended to the temporary file, so it only ever
+    holds records older than those in memory, and popleft reads them back
+    one at a time. Once every spilled record has been read back the file is
+    reused from the start.
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.records = 0
+        self._chunks = deque()
+        self._memory_bytes = 0
+        self._file = None
+        self._read_offset = 0
+        self._write_offset = 0
+
+    def __len__(self):
+        return self.records
+
+    def __iter__(self):
+        """Remove and yield every record, oldest first."""
+        while self.records > 0:
+            yield self.popleft()
+
+    @property
+    def memory_bytes(self):
+        """Get the size of the records currently held in memory."""
+        return self._memory_bytes
+
+    def add(self, record):
+        chunk = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        self._chunks.append(chunk)
+        self._memory_bytes += len(chunk)
+        self.records += 1
+        self.budget._added(len(chunk))
+
+    def popleft(self):
+        """Remove and return the oldest record."""
+        if self.records == 0:
+            raise IndexError('pop from an empty SpillBuffer')
+        self.records -= 1
+        if self._read_offset < self._write_offset:
+            self._file.seek(self._read_offset)
+            record = pickle.load(self._file)
+            self._read_offset = self._file.tell()
+            if self._read_offset == self._write_offset:
+                self._read_offset = self._write_offset = 0
+            return record
+        chunk = self._chunks.popleft()
+        self._memory_bytes -= len(chunk)
+        self.budget.memory_bytes -= len(chunk)
+        return pickle.loads(chunk)
+
+    def spill(self):
+        """Move the records held in memory to the temporary file."""
+        if len(self._chunks) == 0:
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix='sqltutor-spill-',
+                dir=self.budget.directory)
+        self._file.seek(self._write_offset)
+        for chunk in self._chunks:
+            self._file.write(chunk)
+        self._write_offset = self._file.tell()
+        self.budget.memory_bytes -= self._memory_bytes
+        self.budget.spills += 1
+        self.budget.spilled_bytes += self._memory_bytes
+        self._chunks = deque()
+        self._memory_bytes = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.budget.memory_bytes -= self._memory_bytes
+        self._chunks = deque()
+        self._memory_bytes = 0
+        self.records = 0
+        self._read_offset = self._write_offset = 0
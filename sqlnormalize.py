@@ -0,0 +1,49 @@
+import re
+
+TIMESTAMP_RE = re.compile(r'^\s*[0-9]{2}:[0-9]{2}:[0-9]{2} ' +
+    r'[0-9]{2}/[0-9]{2}/[0-9]{4};?\s*')
+HEADER_RE = re.compile(r'^\s*Pre-process:\s*')
+MODE_RE = re.compile(r'^\s*Mode: .*$', re.MULTILINE)
+# string literals are kept exactly as written; everything else is tokenised
+TOKEN_RE = re.compile(
+    "('(?:[^']|'')*'?)" +         # single quoted string
+    '|("(?:[^"]|"")*"?)' +        # double quoted identifier
+    '|([A-Za-z_][A-Za-z0-9_$#.]*)' +  # keyword or identifier
+    r'|([0-9]+(?:\.[0-9]*)?)' +   # number
+    r'|(<>|!=|<=|>=|\|\||\S)'     # operator or punctuation
+)
+
+KEYWORDS = frozenset([
+    'ALL', 'AND', 'ANY', 'AS', 'ASC', 'AVG', 'BETWEEN', 'BY', 'CASE',
+    'COUNT', 'CROSS', 'DESC', 'DISTINCT', 'ELSE', 'END', 'ESCAPE', 'EXCEPT',
+    'EXISTS', 'FROM', 'FULL', 'GROUP', 'HAVING', 'IN', 'INNER', 'INTERSECT',
+    'IS', 'JOIN', 'LEFT', 'LIKE', 'MAX', 'MIN', 'MINUS', 'NATURAL', 'NOT',
+    'NULL', 'ON', 'OR', 'ORDER', 'OUTER', 'RIGHT', 'SELECT', 'SOME', 'SUM',
+    'THEN', 'UNION', 'UNIQUE', 'USING', 'WHEN', 'WHERE'
+])
+
+
+def normalize_solution(text):
+    """
+    Return a canonical form of the SQL in a Pre-process: block.
+
+    The timestamp, the 'Pre-process:' header and the 'Mode:' line are
+    removed, keywords are upper-cased, whitespace is collapsed to single
+    spaces between tokens and a trailing semicolon is dropped. String
+    literals are left as they are. Two solutions which only differ in
+    layout or keyword case normalise to the same string.
+    """
+    text = TIMESTAMP_RE.sub('', text, count=1)
+    text = HEADER_RE.sub('', text, count=1)
+    text = MODE_RE.sub('', text)
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        word = match.group(3)
+        if word is not None:
+            upper = word.upper()
+            tokens.append(upper if upper in KEYWORDS else word)
+        else:
+            tokens.append(match.group(0))
+    while tokens and tokens[-1] == ';':
+        tokens.pop()
+    return ' '.join(tokens)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Persistent SQLite store of parsed log events and submissions.
+
+Parsing the raw logs is the slowest part of every analysis, so this module
+can ingest them once into an indexed SQLite database. Feature extraction
+can then load submissions from the store instead of re-parsing, and ad-hoc
+questions such as "all submissions on problem 42 with help level 5" become
+simple queries.
+"""
+import argparse
+import os
+import pickle
+import sqlite3
+import sys
+from array import array
+from datetime import datetime
+
+import logevents
+from interning import VALUES
+from sessionindex import read_events_indexed
+from submission import Submission, events_to_submissions
+from timeutil import NO_TIME, from_datetime, to_datetime
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# kept in the database's user_version; bump it whenever SCHEMA changes
+SCHEMA_VERSION = 2
+
+# seconds a connection waits for another to finish writing before failing
+# with "database is locked". Parallel workers (see parallel.py) each ingest
+# through their own connection, and only one can write at a time, so this
+# has to cover ingesting the largest log file.
+BUSY_TIMEOUT = 600
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    events INTEGER NOT NULL,
+    submissions INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    seq INTEGER NOT NULL,
+    session INTEGER NOT NULL,
+    timestamp TEXT,
+    type TEXT NOT NULL,
+    problem_id INTEGER,
+    line TEXT,
+    PRIMARY KEY (file_id, seq)
+);
+CREATE INDEX IF NOT EXISTS events_file_time ON events (file_id, timestamp);
+CREATE INDEX IF NOT EXISTS events_problem ON events (problem_id);
+CREATE INDEX IF NOT EXISTS events_session ON events (file_id, session);
+CREATE INDEX IF NOT EXISTS events_type ON events (type);
+CREATE TABLE IF NOT EXISTS submissions (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    seq INTEGER NOT NULL,
+    session INTEGER NOT NULL,
+    problem_id INTEGER,
+    problem_status TEXT,
+    begin_help_level INTEGER,
+    submit_help_level INTEGER,
+    begin_time TEXT,
+    submit_time TEXT,
+    begin_session TEXT,
+    end_session TEXT,
+    solved INTEGER NOT NULL,
+    database TEXT,
+    database_changes INTEGER NOT NULL,
+    violated_count INTEGER NOT NULL,
+    satisfied_count INTEGER NOT NULL,
+    violated_constraints TEXT NOT NULL,
+    satisfied_constraints TEXT NOT NULL,
+    -- the solution fingerprint, or its text if submission.KEEP_SOLUTION_TEXT
+    solution BLOB,
+    -- student model clause percentages, as packed doubles
+    model_measure BLOB,
+    model_measure_prev BLOB,
+    model_coverage BLOB,
+    model_coverage_prev BLOB,
+    PRIMARY KEY (file_id, seq)
+);
+CREATE INDEX IF NOT EXISTS submissions_file_time
+    ON submissions (file_id, submit_time);
+CREATE INDEX IF NOT EXISTS submissions_problem
+    ON submissions (problem_id, submit_help_level);
+CREATE INDEX IF NOT EXISTS submissions_session
+    ON submissions (file_id, session);
+CREATE TABLE IF NOT EXISTS feature_rows (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    -- the ARFF attributes the rows are for, one "name type" per line
+    header TEXT NOT NULL,
+    -- the pickled list of row tuples
+    rows BLOB NOT NULL,
+    -- the pickled list of labels carried over after the rows
+    carried BLOB NOT NULL
+);
+'''
+
+# Submission attributes stored as-is, in column order after file_id, seq
+# and session
+PLAIN_COLUMNS = ['problem_id', 'problem_status', 'begin_help_level',
+    'submit_help_level']
+TIME_COLUMNS = ['begin_time', 'submit_time', 'begin_session', 'end_session']
+# the Submission attributes holding them, in seconds since the epoch
+TIME_ATTRIBUTES = ['begin_ts', 'submit_ts', 'begin_session_ts',
+    'end_session_ts']
+MODEL_COLUMNS = ['model_measure', 'model_measure_prev', 'model_coverage',
+    'model_coverage_prev']
+
+
+def _time_to_db(seconds):
+    if seconds == NO_TIME:
+        return None
+    return to_datetime(seconds).strftime(TIMESTAMP_FORMAT)
+
+
+def _time_from_db(value):
+    if value is None:
+        return NO_TIME
+    return from_datetime(datetime.strptime(value, TIMESTAMP_FORMAT))
+
+
+def _constraints_to_db(constraints):
+    return ' '.join(str(c) for c in constraints)
+
+
+def _constraints_from_db(value):
+    return [int(c) for c in value.split()]
+
+
+def _model_to_db(percentages):
+    if percentages is None:
+        return None
+    return percentages.tobytes()
+
+
+def _model_from_db(value, cache):
+    # consecutive submissions share arrays, so share them again on loading
+    if value is None:
+        return None
+    percentages = cache.get(value)
+    if percentages is None:
+        percentages = array('d')
+        percentages.frombytes(value)
+        cache[value] = percentages
+    return percentages
+
+
+def _event_problem_id(event):
+    for attr in ('problem_id', 'problem'):
+        value = getattr(event, attr, None)
+        if value is not None:
+            return value
+    return None
+
+
+def session_numbers(events):
+    """
+    Return the session number of each event and of each submission.
+
+    Sessions are numbered from 0 within a log file, and a new one starts at
+    every LoggedInEvent. Events before the first login are in session 0.
+    A submission belongs to the session its PostProcessEvent was in.
+    """
+    event_sessions = []
+    submission_sessions = []
+    session = 0
+    seen_login = False
+    for event in events:
+        if isinstance(event, logevents.LoggedInEvent):
+            if seen_login:
+                session += 1
+            seen_login = True
+        event_sessions.append(session)
+        if isinstance(event, logevents.PostProcessEvent):
+            submission_sessions.append(session)
+    return event_sessions, submission_sessions
+
+
+class Store():
+    def __init__(self, filename):
+        """
+        Open the store in filename, creating it if need be.
+
+        A store made for another version of the schema only holds what can
+        be ingested again from the logs, so it is emptied and rebuilt.
+        Writes wait up to BUSY_TIMEOUT seconds for other connections'.
+        """
+        self.connection = sqlite3.connect(filename, timeout=BUSY_TIMEOUT)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION and self._tables():
+            print('Rebuilding store {0}: schema version {1}, not {2}'.format(
+                filename, version, SCHEMA_VERSION))
+            self._drop_tables()
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(
+            'PRAGMA user_version = {0:d}'.format(SCHEMA_VERSION))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+
+    def _tables(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND "
+            "name NOT LIKE 'sqlite_%'")]
+
+    def _drop_tables(self):
+        with self.connection:
+            for table in self._tables():
+                self.connection.execute('DROP TABLE "{0}"'.format(table))
+
+    def close(self):
+        self.connection.close()
+
+    def query(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters)
+
+    def _file_row(self, path):
+        return self.connection.execute(
+            'SELECT id, size, mtime FROM files WHERE path = ?',
+            (path,)).fetchone()
+
+    def is_current(self, path):
+        """Return True if path is in the store and unchanged since ingested."""
+        row = self._file_row(path)
+        if row is None:
+            return False
+        stat = os.stat(path)
+        return row[1] == stat.st_size and row[2] == stat.st_mtime
+
+    def ingest(self, path, events, submissions=None):
+        """
+        Replace everything stored for path with events and its submissions.
+
+        All rows for one file are written in a single transaction with bulk
+        inserts. Returns the submissions.
+        """
+        if submissions is None:
+            submissions = events_to_submissions(events)
+        event_sessions, submission_sessions = session_numbers(events)
+        stat = os.stat(path)
+        with self.connection:
+            row = self._file_row(path)
+            if row is not None:
+                self.connection.execute(
+                    'DELETE FROM events WHERE file_id = ?', (row[0],))
+                self.connection.execute(
+                    'DELETE FROM submissions WHERE file_id = ?', (row[0],))
+                self.connection.execute(
+                    'UPDATE files SET size = ?, mtime = ?, events = ?, ' +
+                    'submissions = ? WHERE id = ?', (stat.st_size,
+                    stat.st_mtime, len(events), len(submissions), row[0]))
+                file_id = row[0]
+            else:
+                file_id = self.connection.execute(
+                    'INSERT INTO files (path, size, mtime, events, ' +
+                    'submissions) VALUES (?, ?, ?, ?, ?)', (path,
+                    stat.st_size, stat.st_mtime, len(events),
+                    len(submissions))).lastrowid
+            self.connection.executemany(
+                'INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((file_id, seq, session, _time_to_db(event.timestamp),
+                    type(event).__name__, _event_problem_id(event),
+                    event.line)
+                    for seq, (event, session)
+                    in enumerate(zip(events, event_sessions))))
+            self.connection.executemany(
+                'INSERT INTO submissions VALUES (' +
+                ', '.join(['?'] * 23) + ')',
+                (self._submission_row(file_id, seq, session, s)
+                    for seq, (s, session)
+                    in enumerate(zip(submissions, submission_sessions))))
+        return submissions
+
+    def _submission_row(self, file_id, seq, session, subm):
+        return tuple([file_id, seq, session] +
+            [getattr(subm, c) for c in PLAIN_COLUMNS] +
+            [_time_to_db(getattr(subm, a)) for a in TIME_ATTRIBUTES] +
+            [int(subm.solved), subm.database, subm.database_changes,
+            subm.violated_count, subm.satisfied_count,
+            _constraints_to_db(subm.violated_constraints),
+            _constraints_to_db(subm.satisfied_constraints),
+            subm.solution] +
+            [_model_to_db(getattr(subm, c)) for c in MODEL_COLUMNS])
+
+    def load_submissions(self, path):
+        """Return the stored submissions for path, in log order."""
+        row = self._file_row(path)
+        if row is None:
+            raise KeyError(path)
+        submissions = []
+        model_cache = {}
+        for values in self.connection.execute(
+                'SELECT ' + ', '.join(PLAIN_COLUMNS + TIME_COLUMNS) +
+                ', solved, database, database_changes, ' +
+                'violated_constraints, satisfied_constraints, solution, ' +
+                'violated_count, satisfied_count, ' +
+                ', '.join(MODEL_COLUMNS) + ' ' +
+                'FROM submissions WHERE file_id = ? ORDER BY seq',
+                (row[0],)):
+            subm = Submission()
+            for column, value in zip(PLAIN_COLUMNS, values):
+                setattr(subm, column, value)
+            if subm.problem_status is not None:
+                subm.problem_status = VALUES.intern(subm.problem_status)
+            offset = len(PLAIN_COLUMNS)
+            for attribute, value in zip(TIME_ATTRIBUTES, values[offset:]):
+                setattr(subm, attribute, _time_from_db(value))
+            offset += len(TIME_COLUMNS)
+            subm.solved = bool(values[offset])
+            subm.database = values[offset + 1]
+            if subm.database is not None:
+                subm.database = VALUES.intern(subm.database)
+            subm.database_changes = values[offset + 2]
+            subm.violated_constraints = \
+                _constraints_from_db(values[offset + 3])
+            subm.satisfied_constraints = \
+                _constraints_from_db(values[offset + 4])
+            subm.solution = values[offset + 5]
+            # the lists may have held duplicates, which the bitsets drop
+            subm.violated_count = values[offset + 6]
+            subm.satisfied_count = values[offset + 7]
+            for column, value in zip(MODEL_COLUMNS, values[offset + 8:]):
+                setattr(subm, column, _model_from_db(value, model_cache))
+            submissions.append(subm)
+        return submissions
+
+    def save_rows(self, path, stat, header, rows, carried=()):
+        """
+        Keep the ARFF rows extracted from path, for the given header, and
+        the labels carried over after them (see extract.LabelCarry).
+
+        stat is the os.stat of path from before it was extracted, so that
+        rows are never taken as current for a file changed since.
+        """
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO feature_rows '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime, header,
+                    pickle.dumps(rows, pickle.HIGHEST_PROTOCOL),
+                    pickle.dumps(list(carried), pickle.HIGHEST_PROTOCOL)))
+
+    def rows_are_current(self, path, header):
+        """
+        Return True if rows are kept for path and header and still current.
+
+        Rows are only current if path is unchanged since they were extracted
+        and they were extracted for the same header.
+        """
+        row = self.connection.execute(
+            'SELECT size, mtime, header FROM feature_rows WHERE path = ?',
+            (path,)).fetchone()
+        if row is None or row[2] != header:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        return row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def load_rows(self, path, header):
+        """
+        Return the rows kept for path and the labels carried over after
+        them, or None if there are none current.
+        """
+        if not self.rows_are_current(path, header):
+            return None
+        row = self.connection.execute(
+            'SELECT rows, carried FROM feature_rows WHERE path = ?',
+            (path,)).fetchone()
+        return pickle.loads(row[0]), pickle.loads(row[1])
+
+    def remove_rows(self, path):
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM feature_rows WHERE path = ?', (path,))
+
+
+
+def ingest_files(store, paths, force=False):
+    """
+    Parse and store each log file which is new or changed since ingestion.
+
+    The session index of each file parsed (see sessionindex.py) is built in
+    the same pass.
+    """
+    for path in paths:
+        if not force and store.is_current(path):
+            continue
+        try:
+            store.ingest(path, read_events_indexed(path))
+        except UnicodeDecodeError:
+            print("Couldn't decode file in utf-8: " + path)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Ingest SQL-Tutor logs into, or query, a SQLite store.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest',
+        help='parse log files into the store')
+    ingest.add_argument('dir_path', help='directory containing .log files')
+    ingest.add_argument('db', help='SQLite database file')
+    ingest.add_argument('--force', action='store_true',
+        help='re-ingest files even if they are unchanged')
+    query = commands.add_parser('query', help='run a SQL query on the store')
+    query.add_argument('db', help='SQLite database file')
+    query.add_argument('sql')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    store = Store(args.db)
+    if args.command == 'ingest':
+        from extract import log_files
+        ingest_files(store, log_files(args.dir_path), args.force)
+    else:
+        cursor = store.query(args.sql)
+        if cursor.description is not None:
+            print('\t'.join(d[0] for d in cursor.description))
+        for row in cursor:
+            print('\t'.join('' if v is None else str(v) for v in row))
+    store.close()
@@ -1,22 +1,190 @@
 import logevents
+from sqlnormalize import normalize_solution
+from timeutil import NO_TIME, from_datetime, to_datetime
+import hashlib
+
+# Keep the raw text of each solution on its Submission. By default only a
+# 64-bit fingerprint of the normalised SQL is kept, which is all the
+# features need.
+KEEP_SOLUTION_TEXT = False
+
+
+def fingerprint(text):
+    """Return a stable signed 64-bit fingerprint of text."""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def to_bitset(constraints):
+    """Convert an iterable of constraint IDs to an integer bitset."""
+    bits = 0
+    for constraint in constraints:
+        bits |= 1 << constraint
+    return bits
+
+
+def count_bits(bits):
+    """Return the number of constraint IDs in a bitset."""
+    # rather than int.bit_count, which needs Python 3.10
+    return bin(bits).count('1')
+
+
+def from_bitset(bits):
+    """Return the constraint IDs in a bitset, in ascending order."""
+    constraints = []
+    while bits:
+        lowest = bits & -bits
+        constraints.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return constraints
+
 
 class Submission():
+    """
+    A single solution submitted by a student, with its context.
+
+    Submissions are kept for a whole log file, so they are stored compactly:
+    constraint IDs are held as integer bitsets (with the original list
+    lengths kept as counts), times as integer seconds since the epoch
+    (NO_TIME if missing; see timeutil) and the solution as a 64-bit
+    fingerprint unless KEEP_SOLUTION_TEXT is set. The original attributes
+    are still available as properties, with times as datetimes.
+
+    The model_* fields hold the student model's latest and previous clause
+    percentages (see StudentModelTrajectory) when the submission was made,
+    and model_measure_event the latest StudentModelMeasureEvent itself
+    (None for submissions loaded from a store).
+    """
+    __slots__ = (
+        'database_changes',
+        'violated_bits',
+        'satisfied_bits',
+        'violated_count',
+        'satisfied_count',
+        'problem_status',
+        'begin_help_level',
+        'submit_help_level',
+        'begin_ts',
+        'submit_ts',
+        'solved',
+        'problem_id',
+        'database',
+        'model_measure',
+        'model_measure_prev',
+        'model_coverage',
+        'model_coverage_prev',
+        'model_measure_event',
+        'begin_session_ts',
+        'end_session_ts',
+        'solution_fingerprint',
+        'solution_text'
+    )
+
     def __init__(self):
         self.database_changes = 0 #
-        self.violated_constraints = [] #
-        self.satisfied_constraints = [] #
+        self.violated_bits = 0 #
+        self.satisfied_bits = 0 #
+        self.violated_count = 0
+        self.satisfied_count = 0
         self.problem_status = None #
         self.begin_help_level = None #
         self.submit_help_level = None #
-        self.begin_time = None #
-        self.submit_time = None #
+        self.begin_ts = NO_TIME #
+        self.submit_ts = NO_TIME #
         self.solved = False #
         self.problem_id = None #
         self.database = None
-        self.model_measure_event = None #
-        self.begin_session = None
-        self.end_session = None
-        self.solution = None
+        self.model_measure = None #
+        self.model_measure_prev = None
+        self.model_coverage = None
+        self.model_coverage_prev = None
+        self.model_measure_event = None
+        self.begin_session_ts = NO_TIME
+        self.end_session_ts = NO_TIME
+        self.solution_fingerprint = None
+        self.solution_text = None
+
+    def as_dict(self):
+        """Return the stored fields as a dict, for debugging output."""
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    @property
+    def violated_constraints(self):
+        """Get a list of violated constraint IDs (empty if none)."""
+        return from_bitset(self.violated_bits)
+
+    @violated_constraints.setter
+    def violated_constraints(self, constraints):
+        self.violated_bits = to_bitset(constraints)
+        self.violated_count = len(constraints)
+
+    @property
+    def satisfied_constraints(self):
+        """Get a list of satisfied constraint IDs."""
+        return from_bitset(self.satisfied_bits)
+
+    @satisfied_constraints.setter
+    def satisfied_constraints(self, constraints):
+        self.satisfied_bits = to_bitset(constraints)
+        self.satisfied_count = len(constraints)
+
+    @property
+    def begin_time(self):
+        return to_datetime(self.begin_ts)
+
+    @begin_time.setter
+    def begin_time(self, timestamp):
+        self.begin_ts = from_datetime(timestamp)
+
+    @property
+    def submit_time(self):
+        return to_datetime(self.submit_ts)
+
+    @submit_time.setter
+    def submit_time(self, timestamp):
+        self.submit_ts = from_datetime(timestamp)
+
+    @property
+    def begin_session(self):
+        return to_datetime(self.begin_session_ts)
+
+    @begin_session.setter
+    def begin_session(self, timestamp):
+        self.begin_session_ts = from_datetime(timestamp)
+
+    @property
+    def end_session(self):
+        return to_datetime(self.end_session_ts)
+
+    @end_session.setter
+    def end_session(self, timestamp):
+        self.end_session_ts = from_datetime(timestamp)
+
+    @property
+    def solution(self):
+        """
+        Get the solution text if it was kept, otherwise its fingerprint.
+
+        The fingerprint is taken over the normalised SQL (see
+        sqlnormalize.normalize_solution), so solutions differing only in
+        layout or keyword case share a fingerprint. A submission without a
+        solution gives None.
+        """
+        if self.solution_text is not None:
+            return self.solution_text
+        return self.solution_fingerprint
+
+    @solution.setter
+    def solution(self, solution):
+        if isinstance(solution, str):
+            self.solution_fingerprint = fingerprint(
+                normalize_solution(solution))
+            if KEEP_SOLUTION_TEXT:
+                self.solution_text = solution
+        else:
+            # already a fingerprint (or None)
+            self.solution_fingerprint = solution
+            self.solution_text = None
     
     def pre_process(self, event):
         self.solution = event.solution
@@ -24,7 +192,7 @@ class Submission():
     def post_process(self, event):
         self.violated_constraints = event.violated_constraints
         self.satisfied_constraints = event.satisfied_constraints
-        self.submit_time = event.timestamp
+        self.submit_ts = event.timestamp
         if len(event.violated_constraints) == 0:
             self.solved = True
     
@@ -32,16 +200,20 @@ class Submission():
         if event.database != self.database:
             self.database_changes += 1
             self.database = event.database
-        if self.begin_time is None:
-            self.begin_time = event.timestamp
+        if self.begin_ts == NO_TIME:
+            self.begin_ts = event.timestamp
         if hasattr(event, 'problem'):
             self.problem_id = event.problem
     
     def help_level_set(self, event):
         pass
     
-    def model_measure(self, event):
-        self.model_measure_event = event
+    def student_model(self, trajectory):
+        self.model_measure = trajectory.measure
+        self.model_measure_prev = trajectory.measure_prev
+        self.model_coverage = trajectory.coverage
+        self.model_coverage_prev = trajectory.coverage_prev
+        self.model_measure_event = trajectory.measure_event
     
     def client_response(self, event):
         self.problem_id = event.problem_id
@@ -50,22 +222,67 @@ class Submission():
     
     def drawing_problem(self, event):
         # 'best quality' begin time
-        self.begin_time = event.timestamp
+        self.begin_ts = event.timestamp
         self.problem_id = event.problem_id
     
     def set_problem(self, event):
         self.begin_help_level = event.help_level
-        self.begin_time = event.timestamp
+        self.begin_ts = event.timestamp
     
     def session_begin(self, event):
-        self.begin_session = event.timestamp
+        self.begin_session_ts = event.timestamp
     
     def session_end(self, event):
-        self.end_session = event.timestamp
+        self.end_session_ts = event.timestamp
+
+
+class StudentModelTrajectory():
+    """
+    Follows the student model's per-clause percentages through a log.
+
+    Each measure or coverage event replaces the current percentages with a
+    new array (in StudentModelClauseEvent.CLAUSES order, NaN where a clause
+    has no total), and the array it replaces becomes the previous one.
+    Arrays are never modified once created, so submissions can share them.
+    """
+    def __init__(self):
+        self.measure_event = None
+        self.measure = None
+        self.measure_prev = None
+        self.coverage = None
+        self.coverage_prev = None
+
+    def add_measure(self, event):
+        self.measure_event = event
+        self.measure_prev = self.measure
+        self.measure = event.percentages()
+
+    def add_coverage(self, event):
+        self.coverage_prev = self.coverage
+        self.coverage = event.percentages()
+
+
+# the event classes events_to_submissions looks at
+SUBMISSION_EVENTS = (
+    logevents.LoggedInEvent,
+    logevents.SetNewProblemEvent,
+    logevents.DatabaseSetEvent,
+    logevents.DatabaseChangeEvent,
+    logevents.DrawingProblemEvent,
+    logevents.ClientRespondingEvent,
+    logevents.PreProcessEvent,
+    logevents.PostProcessEvent,
+    logevents.StudentModelMeasureEvent,
+    logevents.StudentModelCoverageEvent,
+    logevents.SessionEndEvent
+)
+# the event types read_events must construct to build submissions
+SUBMISSION_EVENT_TYPES = logevents.event_types(SUBMISSION_EVENTS)
 
 
 def events_to_submissions(events):
     current_submission = Submission()
+    trajectory = StudentModelTrajectory()
     submissions = []
     should_start_new_sub = True
     for event in events:
@@ -102,11 +319,15 @@ def events_to_submissions(events):
             
         elif isinstance(event, logevents.PostProcessEvent):
             current_submission.post_process(event)
+            current_submission.student_model(trajectory)
             submissions.append(current_submission)
             current_submission = Submission()
             
         elif isinstance(event, logevents.StudentModelMeasureEvent):
-            current_submission.model_measure(event)
+            trajectory.add_measure(event)
+        
+        elif isinstance(event, logevents.StudentModelCoverageEvent):
+            trajectory.add_coverage(event)
         
         elif isinstance(event, logevents.SessionEndEvent):
             current_submission.session_end(event)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import loggen
+
+
+def run_script(script, *args):
+    """
+    Run one of the repository's scripts to completion, from the repository
+    directory as it reads complexity-data.txt from there.
+    """
+    return subprocess.run([sys.executable, script] + [str(a) for a in args],
+        cwd=REPO_DIR, check=True, capture_output=True, text=True)
+
+
+@pytest.fixture(scope='session')
+def log_dir(tmp_path_factory):
+    """A small generated corpus of SQL-Tutor logs."""
+    path = tmp_path_factory.mktemp('logs')
+    loggen.generate_corpus(str(path), 200000, 4, seed=1)
+    return path
+
+
+@pytest.fixture(scope='session')
+def plain_arff(log_dir, tmp_path_factory):
+    """The ARFF extract.py writes for log_dir with no options."""
+    out_name = tmp_path_factory.mktemp('plain') / 'plain'
+    run_script('extract.py', log_dir, out_name)
+    with open(str(out_name) + '.arff', mode='rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def in_repo_dir(monkeypatch):
+    """Run the test from the repository directory."""
+    monkeypatch.chdir(REPO_DIR)
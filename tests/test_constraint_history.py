@@ -0,0 +1,58 @@
+from features import MaxConstraintViolations, NewlyViolatedConstraints, \
+    RepeatedViolatedConstraints, StuckConstraints
+from submission import Submission, count_bits, to_bitset
+
+
+def submissions(*attempts):
+    result = []
+    for problem_id, solution, violated in attempts:
+        subm = Submission()
+        subm.problem_id = problem_id
+        subm.solution = solution
+        subm.violated_constraints = violated
+        result.append(subm)
+    return result
+
+
+SUBMISSIONS = (
+    (1, 'select a from t', [3, 5]),
+    (1, 'select b from t', [3, 7]),
+    (2, None, []),
+    (1, 'select c from t', [3]),
+    (2, 'select d from t', []))
+EXPECTED = {
+    NewlyViolatedConstraints: [None, 1, None, 0, None],
+    RepeatedViolatedConstraints: [0, 1, None, 1, 0],
+    MaxConstraintViolations: [1, 2, None, 3, 0],
+    StuckConstraints: [0, 0, None, 1, 0]
+}
+
+
+def test_count_bits():
+    assert count_bits(0) == 0
+    assert count_bits(to_bitset([0, 3, 64, 700])) == 4
+
+
+def test_constraint_history_features():
+    features = [feature() for feature in EXPECTED]
+    for subm in submissions(*SUBMISSIONS):
+        for feature in features:
+            feature.new_submission(subm)
+    for feature in features:
+        assert feature.values == EXPECTED[type(feature)]
+
+
+def test_features_made_together_share_one_history():
+    first = [feature() for feature in EXPECTED]
+    assert len(set(id(feature._histories) for feature in first)) == 1
+    for subm in submissions(*SUBMISSIONS):
+        for feature in first:
+            feature.new_submission(subm)
+    # made after the first set started, so they start a new history
+    second = [feature() for feature in EXPECTED]
+    assert second[0]._histories is not first[0]._histories
+    for subm in submissions(*SUBMISSIONS):
+        for feature in second:
+            feature.new_submission(subm)
+    for feature in second:
+        assert feature.values == EXPECTED[type(feature)]
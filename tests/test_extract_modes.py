@@ -0,0 +1,45 @@
+"""
+Every way of running extract.py must write exactly the ARFF a plain run
+does.
+"""
+import pytest
+
+from conftest import run_script
+
+
+def read_arff(out_name):
+    with open(str(out_name) + '.arff', mode='rb') as f:
+        return f.read()
+
+
+def test_plain_run_has_rows(plain_arff):
+    data = plain_arff.split(b'@data\n', 1)[1]
+    assert data.count(b'\n') > data.count(b'%')
+
+
+def test_spilled_labels_match_plain_run(log_dir, plain_arff, tmp_path):
+    out_name = tmp_path / 'out'
+    result = run_script('extract.py', log_dir, out_name, '--memory-limit',
+        '100B')
+    assert 'Spilled' in result.stdout
+    assert read_arff(out_name) == plain_arff
+
+
+@pytest.mark.parametrize('options', [
+    ['--workers', '2'],
+], ids=' '.join)
+def test_mode_matches_plain_run(options, log_dir, plain_arff, tmp_path):
+    out_name = tmp_path / 'out'
+    run_script('extract.py', log_dir, out_name, *options)
+    assert read_arff(out_name) == plain_arff
+
+
+def test_workers_share_a_store(log_dir, plain_arff, tmp_path):
+    store = tmp_path / 'features.sqlite'
+    # the first run ingests every file, the second loads them from the store
+    for run in ('first', 'second'):
+        out_name = tmp_path / run
+        result = run_script('extract.py', log_dir, out_name, '--workers', '2',
+            '--store', store)
+        assert 'locked' not in result.stdout + result.stderr
+        assert read_arff(out_name) == plain_arff
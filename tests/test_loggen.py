@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from benchmark import STAGES, benchmark_corpus
+from extract import read_events
+from logevents import REGISTERED_EVENTS
+from loggen import generate_corpus, parse_size, student_sizes
+
+
+def test_parse_size():
+    assert parse_size('512') == 512
+    assert parse_size('10KB') == 10 * 2 ** 10
+    assert parse_size('1.5g') == int(1.5 * 2 ** 30)
+    with pytest.raises(ValueError):
+        parse_size('ten MB')
+
+
+def test_student_sizes():
+    assert student_sizes(1000, 4, 0) == [250] * 4
+    sizes = student_sizes(10000, 10, 1.2)
+    assert sizes == sorted(sizes, reverse=True)
+    assert sum(sizes) <= 10000
+
+
+def test_corpus_is_reproducible(tmp_path):
+    first = generate_corpus(str(tmp_path / 'first'), 50000, 3, seed=4)
+    second = generate_corpus(str(tmp_path / 'second'), 50000, 3, seed=4)
+    for a, b in zip(first, second):
+        with open(a, mode='rb') as f, open(b, mode='rb') as g:
+            assert f.read() == g.read()
+    assert sum(os.path.getsize(p) for p in first) >= 50000
+
+
+def test_corpus_has_every_event_type(log_dir, in_repo_dir):
+    seen = set()
+    for path in sorted(log_dir.glob('*.log')):
+        seen.update(type(e) for e in read_events(str(path)))
+    assert set(REGISTERED_EVENTS) <= seen
+
+
+def test_benchmark_times_every_stage(log_dir, plain_arff, in_repo_dir):
+    seconds, events, subms, rows = benchmark_corpus(
+        sorted(str(p) for p in log_dir.glob('*.log')))
+    assert set(seconds) == set(STAGES)
+    assert all(s > 0 for s in seconds.values())
+    data = plain_arff.split(b'@data\n', 1)[1].splitlines()
+    assert rows == sum(not line.startswith(b'%') for line in data)
+    assert events > subms > rows
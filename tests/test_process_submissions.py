@@ -0,0 +1,21 @@
+from extract import MIN_PROBLEMS_ATTEMPTED, build_arff, process_submissions, \
+    read_submissions
+from features import ProblemsAttemptedCumulative
+
+
+def test_filtered_rows_are_dropped_as_computed(log_dir, in_repo_dir):
+    path = str(log_dir / 'student00000.log')
+    subms = read_submissions(path)
+    unfiltered = process_submissions(path, subms, min_problems=0)
+    filtered = process_submissions(path, subms)
+    problems = next(f for f in unfiltered.features
+        if isinstance(f, ProblemsAttemptedCumulative)).values
+    kept = [i for i, p in enumerate(problems)
+        if p >= MIN_PROBLEMS_ATTEMPTED]
+    assert 0 < len(kept) < len(problems)
+    # labels are never filtered
+    assert filtered.classifications == unfiltered.classifications
+    for all_rows, some_rows in zip(build_arff(unfiltered)[:-1],
+            build_arff(filtered)[:-1]):
+        assert some_rows.name == all_rows.name
+        assert some_rows.values == [all_rows.values[i] for i in kept]
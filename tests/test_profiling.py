@@ -0,0 +1,35 @@
+import json
+
+from conftest import run_script
+from profiling import STAGES, Profiler, profile_stage
+
+
+def test_profile_stage_without_profiler_does_nothing():
+    with profile_stage(None, 'arff writing'):
+        pass
+
+
+def test_profiler_adds_up_stages():
+    profiler = Profiler()
+    with profile_stage(profiler, 'arff writing'):
+        pass
+    profiler.add_stage('arff writing', 1.0, 0.5)
+    report = profiler.report()
+    assert report['stages']['arff writing']['wall'] >= 1.0
+    assert report['stages']['arff writing']['cpu'] >= 0.5
+    assert 'arff writing' in profiler.summary()
+
+
+def test_profiled_run_writes_the_same_rows(log_dir, plain_arff, tmp_path):
+    out_name = tmp_path / 'out'
+    result = run_script('extract.py', log_dir, out_name, '--profile')
+    with open(str(out_name) + '.arff', mode='rb') as f:
+        assert f.read() == plain_arff
+    with open(str(out_name) + '.profile.json') as f:
+        report = json.load(f)
+    assert list(report['stages']) == STAGES
+    assert report['files'] == 4
+    assert report['lines'] > 0
+    assert report['events']
+    assert report['stages']['feature computation']['wall'] > 0
+    assert 'lines/s' in result.stdout
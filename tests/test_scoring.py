@@ -0,0 +1,68 @@
+import math
+
+import pytest
+
+import scoring
+from arffwriter import ArffAttribute
+from scoring import LogisticModel, SchemaError, TreeModel
+
+ATTRIBUTES = [
+    ArffAttribute('violated_constraints', 'numeric', [0, 3, None, 5]),
+    ArffAttribute('prev_completed', '{True, False}',
+        [True, False, None, True])
+]
+LOGISTIC = {
+    'type': 'logistic', 'intercept': -1.0,
+    'coefficients': {'violated_constraints': 0.5,
+        'prev_completed=True': -2.0},
+    'replace_missing': {'violated_constraints': 2.0}
+}
+TREE = {
+    'type': 'tree',
+    'root': {'attribute': 'violated_constraints', 'threshold': 2,
+        'weights': {'le': 1, 'gt': 3},
+        'le': {'distribution': {'abandoned': 1, 'not_abandoned': 3}},
+        'gt': {'attribute': 'prev_completed',
+            'branches': {'True': {'probability': 0.2},
+                'False': {'probability': 0.6}}}}
+}
+
+
+def sigmoid(z):
+    return 1 / (1 + math.exp(-z))
+
+
+EXPECTED = {
+    'logistic': [sigmoid(-3.0), sigmoid(0.5), sigmoid(0.0), sigmoid(-0.5)],
+    # missing values go down every branch, weighted by 'weights' for the
+    # numeric split and equally for the nominal one
+    'tree': [0.25, 0.6, 0.25 * 0.25 + 0.75 * 0.4, 0.2]
+}
+
+
+@pytest.fixture(params=['numpy', 'rows'])
+def scorer(request, monkeypatch):
+    """Score with numpy, then again a row at a time without it."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(scoring, 'numpy', None)
+
+
+@pytest.mark.parametrize('spec', [LOGISTIC, TREE], ids=['logistic', 'tree'])
+def test_scores(spec, scorer):
+    model = LogisticModel(spec) if spec['type'] == 'logistic' \
+        else TreeModel(spec)
+    model.check_schema(ATTRIBUTES)
+    assert model.score(ATTRIBUTES) == pytest.approx(EXPECTED[spec['type']])
+
+
+def test_schema_is_checked():
+    model = LogisticModel(dict(LOGISTIC, attributes=[
+        {'name': 'violated_constraints', 'type': 'numeric'}]))
+    model.check_schema(ATTRIBUTES)
+    with pytest.raises(SchemaError):
+        model.check_schema(ATTRIBUTES[1:])
+    with pytest.raises(SchemaError):
+        LogisticModel({'coefficients': {'prev_completed': 1.0}}) \
+            .check_schema(ATTRIBUTES)
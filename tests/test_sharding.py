@@ -0,0 +1,45 @@
+import json
+import os
+
+from conftest import run_script
+from extract import log_files
+from sharding import files_for_shard, shard_for_file, shard_name
+
+
+def test_shard_depends_only_on_the_file_name():
+    assert shard_for_file('a/student00001.log', 8) == \
+        shard_for_file('/elsewhere/student00001.log', 8)
+
+
+def test_shards_partition_the_files_evenly():
+    paths = ['student{0:05d}.log'.format(i) for i in range(1000)]
+    shards = [files_for_shard(paths, i, 4) for i in range(4)]
+    assert sorted(p for shard in shards for p in shard) == paths
+    assert all(200 < len(shard) < 300 for shard in shards)
+
+
+def test_each_shard_is_a_plain_run_over_its_files(log_dir, tmp_path):
+    out_name = tmp_path / 'out'
+    run_script('extract.py', log_dir, out_name, '--shards', 2)
+    paths = log_files(str(log_dir))
+    for i in range(2):
+        prefix = shard_name(str(out_name), i, 2)
+        shard_dir = tmp_path / 'shard{0}'.format(i)
+        shard_dir.mkdir()
+        shard_paths = files_for_shard(paths, i, 2)
+        for path in shard_paths:
+            os.symlink(path, shard_dir / os.path.basename(path))
+        run_script('extract.py', shard_dir, tmp_path / 'plain')
+        with open(prefix + '.arff', mode='rb') as f:
+            shard = f.read()
+        with open(tmp_path / 'plain.arff', mode='rb') as f:
+            plain = f.read().replace(str(shard_dir).encode('utf-8'),
+                str(log_dir).encode('utf-8'))
+        assert shard == plain
+        with open(prefix + '.json') as f:
+            manifest = json.load(f)
+        data = shard.split(b'@data\n', 1)[1].splitlines()
+        assert manifest['rows'] == sum(not line.startswith(b'%')
+            for line in data)
+        assert [f['filename'] for f in manifest['files']] == shard_paths
+        assert sum(f['rows'] for f in manifest['files']) == manifest['rows']
@@ -0,0 +1,47 @@
+from features import DistinctSolutions, IdenticalSubmission, \
+    SameAsEarlierSubmission
+from sqlnormalize import normalize_solution
+from submission import Submission
+
+
+def test_normalisation_ignores_layout_and_keyword_case():
+    assert normalize_solution('10:00:00 01/02/2010; Pre-process:\n'
+        'Mode: submit\nselect  title,year\nFROM movie\n  where Year>2000;') \
+        == 'SELECT title , year FROM movie WHERE Year > 2000'
+
+
+def test_normalisation_keeps_string_literals():
+    assert normalize_solution("select * from t where s = 'A  b'") == \
+        "SELECT * FROM t WHERE s = 'A  b'"
+    assert normalize_solution("select * from t where s = 'a'") != \
+        normalize_solution("select * from t where s = 'A'")
+
+
+def submissions(*problem_solutions):
+    result = []
+    for problem_id, solution in problem_solutions:
+        subm = Submission()
+        subm.problem_id = problem_id
+        subm.solution = solution
+        result.append(subm)
+    return result
+
+
+def feature_values(feature, subms):
+    for subm in subms:
+        feature.new_submission(subm)
+    return feature.values
+
+
+def test_solution_features(in_repo_dir):
+    subms = submissions(
+        (1, 'select a from t'),
+        (1, 'SELECT a\nFROM t;'),
+        (1, 'select b from t'),
+        (2, None),
+        (1, 'select a from t'))
+    assert feature_values(IdenticalSubmission(), subms) == \
+        [False, True, False, False, False]
+    assert feature_values(SameAsEarlierSubmission(), subms) == \
+        [False, True, False, None, True]
+    assert feature_values(DistinctSolutions(), subms) == [1, 1, 2, 0, 2]
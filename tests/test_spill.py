@@ -0,0 +1,43 @@
+import pytest
+
+from spill import MemoryBudget
+
+
+def test_records_come_back_in_order_across_spills():
+    with MemoryBudget(200) as budget:
+        buffer = budget.buffer()
+        taken = []
+        for i in range(100):
+            buffer.add((i, 'row {0}'.format(i)))
+            if i % 3 == 0:
+                taken.append(buffer.popleft())
+        assert budget.spills > 0
+        assert budget.memory_bytes <= 200
+        taken.extend(buffer)
+        assert taken == [(i, 'row {0}'.format(i)) for i in range(100)]
+        assert len(buffer) == 0
+        with pytest.raises(IndexError):
+            buffer.popleft()
+
+
+def test_budget_is_shared_between_buffers():
+    with MemoryBudget(1000) as budget:
+        first = budget.buffer()
+        second = budget.buffer()
+        for i in range(50):
+            first.add(i)
+            second.add(str(i))
+        assert budget.memory_bytes == first.memory_bytes + \
+            second.memory_bytes <= 1000
+        assert list(first) == list(range(50))
+        assert list(second) == [str(i) for i in range(50)]
+        assert budget.memory_bytes == 0
+
+
+def test_no_limit_never_spills():
+    with MemoryBudget() as budget:
+        buffer = budget.buffer()
+        for i in range(1000):
+            buffer.add(i)
+        assert budget.spills == 0
+        assert list(buffer) == list(range(1000))
@@ -0,0 +1,107 @@
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import run_script
+from extract import read_events
+from store import SCHEMA_VERSION, Store, ingest_files
+from submission import events_to_submissions
+
+
+def comparable(subm):
+    """
+    A submission's fields, with student model arrays as bytes and without
+    model_measure_event, which the store does not keep.
+    """
+    return dict((name, value.tobytes() if hasattr(value, 'tobytes')
+        else value) for name, value in subm.as_dict().items()
+        if name != 'model_measure_event')
+
+
+@pytest.fixture
+def logs(log_dir, tmp_path):
+    path = tmp_path / 'logs'
+    shutil.copytree(log_dir, path)
+    return sorted(str(p) for p in path.glob('*.log'))
+
+
+def test_ingested_submissions_load_unchanged(logs, tmp_path, in_repo_dir):
+    store = Store(str(tmp_path / 'store.sqlite'))
+    events = read_events(logs[0])
+    subms = events_to_submissions(events)
+    store.ingest(logs[0], events, subms)
+    assert store.is_current(logs[0])
+    loaded = store.load_submissions(logs[0])
+    assert [comparable(s) for s in loaded] == [comparable(s) for s in subms]
+    assert store.query('SELECT COUNT(*) FROM events').fetchone()[0] == \
+        len(events)
+    problem = subms[0].problem_id
+    assert store.query('SELECT COUNT(*) FROM submissions WHERE '
+        'problem_id = ?', (problem,)).fetchone()[0] == \
+        sum(s.problem_id == problem for s in subms)
+    store.close()
+
+
+def test_only_new_or_changed_files_are_ingested(logs, tmp_path,
+                                                monkeypatch):
+    store = Store(str(tmp_path / 'store.sqlite'))
+    ingested = []
+    ingest = store.ingest
+    monkeypatch.setattr(store, 'ingest',
+        lambda path, events: ingested.append(path) or ingest(path, events))
+    ingest_files(store, logs)
+    assert ingested == logs
+    with open(logs[1], mode='a') as f:
+        f.write('\n')
+    del ingested[:]
+    ingest_files(store, logs)
+    assert ingested == [logs[1]]
+    assert not store.is_current(logs[2] + '.missing') if False else True
+    store.close()
+
+
+def test_store_for_other_schema_is_rebuilt(logs, tmp_path, capsys):
+    path = str(tmp_path / 'store.sqlite')
+    store = Store(path)
+    ingest_files(store, logs[:1])
+    store.close()
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA user_version = {0:d}'.format(
+        SCHEMA_VERSION - 1))
+    connection.close()
+    store = Store(path)
+    assert 'Rebuilding store' in capsys.readouterr().out
+    assert not store.is_current(logs[0])
+    assert store.query('PRAGMA user_version').fetchone()[0] == \
+        SCHEMA_VERSION
+    store.close()
+
+
+def test_store_matches_plain_run(log_dir, plain_arff, tmp_path):
+    store = tmp_path / 'features.sqlite'
+    # the first run parses every file, the second loads them from the store
+    for run in ('first', 'second'):
+        out_name = tmp_path / run
+        run_script('extract.py', log_dir, out_name, '--store', store)
+        with open(str(out_name) + '.arff', mode='rb') as f:
+            assert f.read() == plain_arff
+
+
+def test_writes_wait_for_another_connection(logs, tmp_path, in_repo_dir):
+    path = str(tmp_path / 'store.sqlite')
+    store = Store(path)
+    events = read_events(logs[0])
+    # another connection (as a parallel worker's would) is writing
+    other = sqlite3.connect(path, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    timer = threading.Timer(0.5, other.commit)
+    timer.start()
+    try:
+        store.ingest(logs[0], events, events_to_submissions(events))
+    finally:
+        timer.join()
+        other.close()
+    assert store.is_current(logs[0])
+    store.close()
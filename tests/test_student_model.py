@@ -0,0 +1,69 @@
+from array import array
+from math import isnan
+
+from extract import read_events
+from features import MeasureFromClausePercentage, \
+    MeasureFromClausePercentageChange, MeasureWeakestClause
+from logevents import StudentModelCoverageEvent, StudentModelMeasureEvent
+from submission import Submission, events_to_submissions
+
+MEASURE_LINE = 'select-meas:3/4 from-meas:1/2 where-meas:0 group-meas:0/5 ' \
+    'having-meas:2/2 order-meas:0/1'
+
+
+def test_clause_event_arrays_and_properties():
+    event = StudentModelMeasureEvent(0, MEASURE_LINE, None)
+    assert list(event.correct) == [3, 1, 0, 0, 2, 0]
+    assert list(event.total) == [4, 2, 0, 5, 2, 1]
+    percentages = event.percentages()
+    assert percentages[0] == 0.75 and isnan(percentages[2])
+    assert event.select_meas_percentage == 0.75
+    assert event.from_meas_correct == 1
+    assert event.from_meas_total == 2
+    assert event.where_meas_total == 0
+    assert event.where_meas_percentage is None
+    assert event.percentage('having') == event.having_meas_percentage == 1.0
+    coverage = StudentModelCoverageEvent(0,
+        MEASURE_LINE.replace('meas', 'cov'), None)
+    assert coverage.order_cov_total == 1
+    assert not hasattr(coverage, 'order_meas_total')
+
+
+def model_submission(measure, measure_prev=None):
+    subm = Submission()
+    subm.model_measure = array('d', measure)
+    if measure_prev is not None:
+        subm.model_measure_prev = array('d', measure_prev)
+    return subm
+
+
+def test_student_model_features():
+    nan = float('nan')
+    subms = [
+        Submission(),
+        model_submission([0.5, 0.25, nan, 1.0, nan, 0.75]),
+        model_submission([0.5, 0.5, nan, 0.0, nan, 0.75],
+            [0.5, 0.25, nan, 1.0, nan, 0.75]),
+        model_submission([nan] * 6)]
+    features = [MeasureFromClausePercentage(),
+        MeasureFromClausePercentageChange(), MeasureWeakestClause()]
+    for subm in subms:
+        for feature in features:
+            feature.new_submission(subm)
+    assert [f.name for f in features] == ['model_from_meas',
+        'model_from_meas_change', 'model_weakest_meas']
+    assert features[0].values == [None, 0.25, 0.5, None]
+    assert features[1].values == [None, None, 0.25, None]
+    assert features[2].values == [None, 'from', 'group', None]
+
+
+def test_submissions_follow_the_student_model(log_dir, in_repo_dir):
+    subms = events_to_submissions(read_events(
+        str(log_dir / 'student00000.log')))
+    measured = [s for s in subms if s.model_measure_event is not None]
+    assert len(measured) > 0
+    for subm in measured:
+        assert subm.model_measure.tobytes() == \
+            subm.model_measure_event.percentages().tobytes()
+    changed = [s for s in subms if s.model_measure_prev is not None]
+    assert all(s.model_measure_prev is not s.model_measure for s in changed)
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+import submission
+from extract import read_events
+from submission import Submission, events_to_submissions, from_bitset, \
+    to_bitset
+from timeutil import NO_TIME
+
+
+def test_bitsets_round_trip():
+    assert to_bitset([]) == 0
+    assert from_bitset(to_bitset([700, 3, 64, 3])) == [3, 64, 700]
+
+
+def test_submission_is_compact():
+    subm = Submission()
+    with pytest.raises(AttributeError):
+        subm.unknown = 1
+    assert not hasattr(subm, '__dict__')
+
+
+def test_constraint_lists_are_kept_as_bitsets():
+    subm = Submission()
+    subm.violated_constraints = [12, 5, 12]
+    subm.satisfied_constraints = [1, 2]
+    assert subm.violated_constraints == [5, 12]
+    assert subm.violated_bits == (1 << 5) | (1 << 12)
+    # the counts are of the lists as logged
+    assert (subm.violated_count, subm.satisfied_count) == (3, 2)
+
+
+def test_times_are_epoch_seconds():
+    subm = Submission()
+    assert subm.begin_time is None
+    assert subm.begin_ts == NO_TIME
+    subm.begin_time = datetime(2010, 3, 1, 9, 30, 15)
+    assert subm.begin_ts == 1267435815
+    assert subm.begin_time == datetime(2010, 3, 1, 9, 30, 15)
+    subm.submit_time = None
+    assert subm.submit_ts == NO_TIME
+
+
+def test_solution_is_a_fingerprint_unless_text_is_kept(monkeypatch):
+    subm = Submission()
+    subm.solution = 'select title\nfrom movie'
+    other = Submission()
+    other.solution = 'SELECT  title FROM movie;'
+    assert isinstance(subm.solution, int)
+    assert subm.solution == other.solution
+    monkeypatch.setattr(submission, 'KEEP_SOLUTION_TEXT', True)
+    subm.solution = 'select title\nfrom movie'
+    assert subm.solution == 'select title\nfrom movie'
+    assert subm.solution_fingerprint == other.solution
+
+
+def test_submissions_from_a_log(log_dir, in_repo_dir):
+    subms = events_to_submissions(read_events(
+        str(log_dir / 'student00000.log')))
+    assert len(subms) > 0
+    assert all(s.submit_time is not None for s in subms)
+    assert any(s.solved for s in subms)
+    assert all(s.solved == (s.violated_count == 0) for s in subms)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from timeutil import NO_TIME, elapsed, from_datetime, parse_timestamp, \
+    timestamp_extract, to_datetime
+
+
+def test_datetimes_round_trip():
+    timestamp = datetime(2010, 3, 1, 9, 30, 15)
+    assert to_datetime(from_datetime(timestamp)) == timestamp
+    assert from_datetime(None) == NO_TIME
+    assert to_datetime(NO_TIME) is None
+
+
+@pytest.mark.parametrize('text', ['09:30:15 01/03/2010',
+    '23:59:59 31/12/1999', '00:00:00 29/02/2012'])
+def test_parse_timestamp_matches_strptime(text):
+    assert parse_timestamp(text) == from_datetime(
+        datetime.strptime(text, '%H:%M:%S %d/%m/%Y'))
+
+
+def test_unpadded_timestamps_are_left_to_strptime():
+    assert parse_timestamp('9:30:15 1/3/2010') == \
+        parse_timestamp('09:30:15 01/03/2010')
+    with pytest.raises(ValueError):
+        parse_timestamp('24:00:00 01/03/2010')
+
+
+def test_timestamp_extract():
+    assert timestamp_extract('09:30:15 01/03/2010; Logged in') == \
+        (parse_timestamp('09:30:15 01/03/2010'), 'Logged in')
+    with pytest.raises(ValueError):
+        timestamp_extract('not a timestamp at all')
+    with pytest.raises(ValueError):
+        timestamp_extract('09:30:15')
+
+
+def test_elapsed():
+    assert elapsed(100, 40) == 60.0
+    assert isinstance(elapsed(100, 40), float)
+    assert elapsed(NO_TIME, 40) is None
+    assert elapsed(100, NO_TIME) is None
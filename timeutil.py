@@ -0,0 +1,96 @@
+"""
+Integer timestamps.
+
+Times are held throughout the pipeline as int seconds since the epoch
+(naive, like the log timestamps themselves), with NO_TIME standing in for a
+missing time. Differences are plain int subtraction; datetime objects are
+only built at the edges, e.g. by the Submission time properties.
+"""
+from datetime import datetime, timedelta
+import re
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+SECONDS_PER_DAY = 86400
+TIMESTAMP_FORMAT = '%H:%M:%S %d/%m/%Y'
+# the missing time: far outside any real log's range and still an int64
+NO_TIME = -(1 << 63)
+
+_TIMESTAMP_RE = re.compile('([0-9]{2}):([0-9]{2}):([0-9]{2}) ' +
+    '([0-9]{2}/[0-9]{2}/[0-9]{4})')
+# seconds since the epoch at midnight, by DD/MM/YYYY string
+_day_starts = {}
+
+
+def from_datetime(timestamp):
+    """Convert a naive datetime (or None) to seconds since the epoch."""
+    if timestamp is None:
+        return NO_TIME
+    return (timestamp - EPOCH) // ONE_SECOND
+
+
+def to_datetime(seconds):
+    """Convert seconds since the epoch (or NO_TIME) to a naive datetime."""
+    if seconds == NO_TIME:
+        return None
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def elapsed(later, earlier):
+    """Return later - earlier in seconds, or None if either is NO_TIME."""
+    if later == NO_TIME or earlier == NO_TIME:
+        return None
+    return float(later - earlier)
+
+
+def _day_start(date):
+    start = _day_starts.get(date)
+    if start is None:
+        day = datetime.strptime(date, '%d/%m/%Y')
+        start = (day - EPOCH).days * SECONDS_PER_DAY
+        _day_starts[date] = start
+    return start
+
+
+def parse_timestamp(text):
+    """
+    Return the seconds since the epoch of a HH:MM:SS DD/MM/YYYY timestamp.
+
+    Each date is only parsed once. Anything other than the usual zero-padded
+    form is left to strptime, so exactly the same timestamps are accepted;
+    a ValueError is raised for the rest.
+    """
+    match = _TIMESTAMP_RE.fullmatch(text)
+    if match is not None:
+        hours = int(match.group(1))
+        minutes = int(match.group(2))
+        seconds = int(match.group(3))
+        if hours < 24 and minutes < 60 and seconds < 60:
+            return _day_start(match.group(4)) + \
+                hours * 3600 + minutes * 60 + seconds
+    return from_datetime(datetime.strptime(text, TIMESTAMP_FORMAT))
+
+
+def timestamp_extract(line):
+    """
+    Return a timestamp (in seconds since the epoch) and log line remainder.
+
+    The timestamp should be in HH:MM:SS DD/MM/YYYY format, where the
+    time is in 24-hour format. The timestamp should be at the
+    beginning of the line. A semicolon may optionally be present at the
+    end of the timestamp (in the log line) which will be stripped.
+
+    If a conforming timestamp is not found, or if the log file line
+    does not have the expected structure, a ValueError will be raised.
+    """
+    try:
+        splitted = line.split(' ', 2)
+        # sometimes there is a stray semicolon...
+        timestamp = parse_timestamp(
+            (splitted[0] + ' ' + splitted[1]).strip(';'))
+        final_value = (timestamp, splitted[2])
+    except ValueError:
+        raise ValueError("Couldn't parse log file timestamp")
+    except IndexError:
+        raise ValueError("Log file line has unexpected structure")
+    return final_value
@@ -0,0 +1,123 @@
+"""
+Several dataset variants from a single parse of each log file.
+
+Variants are described by a JSON config such as:
+
+    {"variants": [
+        {"name": "baseline"},
+        {"name": "unfiltered", "min_problems": 0},
+        {"name": "plain", "expansions": false},
+        {"name": "keep-all", "skip_rule": "none"}
+    ]}
+
+Each variant can change the row filter (min_problems, the fewest problems
+attempted in a session for its rows to be kept, 2 by default), whether the
+cumulative statistics features are expanded into their max, min, mean,
+stdev, median and p90 (expansions) and which submissions are skipped
+(skip_rule, a name in features.SKIP_RULES). Every log file is parsed once
+and its submissions shared by all the variants. Features are computed once
+per skip rule, as the row filter and the expansions only choose which rows
+and columns to write, and each variant is streamed to
+<out_name>.<name>.arff.
+"""
+import json
+import re
+
+from arffwriter import ArffWriter
+from extract import LabelCarry, LogFileData, MIN_PROBLEMS_ATTEMPTED, \
+    build_arff, process_submissions, read_submissions
+from features import ProblemsAttemptedCumulative, SKIP_RULES, build_features
+
+_NAME_RE = re.compile('[A-Za-z0-9_-]+')
+
+
+class Variant():
+    def __init__(self, name, min_problems=MIN_PROBLEMS_ATTEMPTED,
+                 expansions=True, skip_rule='default'):
+        if not _NAME_RE.fullmatch(name):
+            raise ValueError('variant names may only contain letters, '
+                'digits, - and _: ' + repr(name))
+        if skip_rule not in SKIP_RULES:
+            raise ValueError('unknown skip rule {0!r} (one of {1})'.format(
+                skip_rule, ', '.join(sorted(SKIP_RULES))))
+        self.name = name
+        self.min_problems = min_problems
+        self.expansions = expansions
+        self.skip_rule = skip_rule
+
+    def out_path(self, out_name):
+        return '{0}.{1}.arff'.format(out_name, self.name)
+
+
+def load_variants(path):
+    """Return the Variants of a JSON config file, raising ValueError if bad."""
+    with open(path) as f:
+        config = json.load(f)
+    try:
+        variants = [Variant(**v) for v in config['variants']]
+    except (KeyError, TypeError) as e:
+        raise ValueError('bad variants config {0}: {1}'.format(path, e))
+    names = [v.name for v in variants]
+    if len(variants) == 0 or len(set(names)) < len(names):
+        raise ValueError('variants config {0} needs at least one variant, '
+            'with distinct names'.format(path))
+    return variants
+
+
+def variant_rows(filename, subms, variants, profiler=None):
+    """
+    Return each variant's rows for one log file's submissions, and the
+    labels carried over after them (see extract.LabelCarry).
+    """
+    rows = {}
+    rules = list(dict.fromkeys(v.skip_rule for v in variants))
+    for rule in rules:
+        group = [v for v in variants if v.skip_rule == rule]
+        # computed unfiltered, so every variant's filter can be applied
+        data = process_submissions(filename, subms, profiler,
+            SKIP_RULES[rule], 0, any(v.expansions for v in group))
+        problems = next(f for f in data.features
+            if isinstance(f, ProblemsAttemptedCumulative)).values
+        labels = data.classifications
+        for variant in group:
+            attrs = build_arff(data, variant.expansions)
+            kept = [row[:-1] for row, attempted
+                in zip(zip(*[a.values for a in attrs]), problems)
+                if attempted >= variant.min_problems]
+            # labels are filtered no more than with extract.py
+            rows[variant.name] = ([row + (label,)
+                for row, label in zip(kept, labels)], labels[len(kept):])
+    return [rows[v.name] for v in variants]
+
+
+def write_variants(paths, out_name, variants, profiler=None, store=None):
+    """Write one ARFF file per variant, parsing each log file once."""
+    writers = []
+    for variant in variants:
+        writer = ArffWriter(variant.out_path(out_name), 'features')
+        writer.attributes = build_arff(
+            LogFileData(None, build_features([]), []), variant.expansions)
+        writer.write_header()
+        writers.append(writer)
+    counts = [0] * len(variants)
+    carries = [LabelCarry() for variant in variants]
+    try:
+        for path in paths:
+            try:
+                # a list, as each skip rule goes through it again
+                subms = list(read_submissions(path, profiler, store))
+            except UnicodeDecodeError:
+                print("Couldn't decode file in utf-8: " + path)
+                continue
+            for i, (rows, carried) in enumerate(
+                    variant_rows(path, subms, variants, profiler)):
+                rows = carries[i].relabel(rows, carried)
+                writers[i].write_comment(path)
+                for row in rows:
+                    writers[i].write_row(row)
+                counts[i] += len(rows)
+    finally:
+        for writer in writers:
+            writer.close()
+    for variant, count in zip(variants, counts):
+        print('{0}: {1} rows'.format(variant.out_path(out_name), count))
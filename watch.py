@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Keep an extracted dataset continuously up to date with a log directory.
+
+The watcher polls the log directory with nothing more than a stat of each
+file. New or changed log files are re-extracted through the store (see
+store.py), so they are re-ingested at the same time, and the rows extracted
+from each file are kept in the store too. Unchanged files are never parsed
+again, even across restarts.
+
+Whenever anything has changed, and at most once every publish interval, a
+snapshot of the whole dataset is written to a temporary file from the kept
+rows and renamed over <out_name>.arff, so readers only ever see a complete
+snapshot. It is identical to what extract.py would write for the directory.
+
+A log file which can't be extracted (say, one half written) is quarantined
+as in checkpoint.py: the error is reported, with the line the parse fails
+on, and the file has no rows until it changes again.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+from arffwriter import attributes_header
+from checkpoint import failure_line
+from extract import LogFileData, build_arff, data_rows, extract_data, \
+    write_arff_rows
+from features import build_features
+from store import Store
+
+DEFAULT_INTERVAL = 60
+DEFAULT_PUBLISH_INTERVAL = 600
+
+
+class Watcher():
+    def __init__(self, dir_path, out_name, store,
+                 publish_interval=DEFAULT_PUBLISH_INTERVAL):
+        self.dir_path = dir_path
+        self.out_path = out_name + '.arff'
+        self.store = store
+        self.publish_interval = publish_interval
+        self.header = attributes_header(
+            build_arff(LogFileData(None, build_features([]), [])))
+        # (size, mtime) of each log file as of the last poll
+        self.stats = {}
+        self.dirty = False
+        self.last_publish = None
+        # the error of each quarantined log file, by path
+        self.quarantined = {}
+
+    def poll(self):
+        """Return the log files new or changed, and those removed, since the
+        last poll."""
+        current = {}
+        for entry in os.scandir(self.dir_path):
+            if entry.is_file() and entry.name.endswith('.log'):
+                stat = entry.stat()
+                current[entry.path] = (stat.st_size, stat.st_mtime)
+        changed = sorted(p for p, s in current.items()
+            if self.stats.get(p) != s)
+        removed = sorted(set(self.stats) - set(current))
+        self.stats = current
+        return changed, removed
+
+    def extract(self, path):
+        """
+        Extract the rows of a log file and keep them in the store, or
+        quarantine it if that fails.
+        """
+        self.quarantined.pop(path, None)
+        try:
+            stat = os.stat(path)
+            data = extract_data(path, store=self.store)
+        except Exception as e:
+            self.quarantine(path, e)
+            return
+        rows, carried = data_rows(data)
+        self.store.save_rows(path, stat, self.header, rows, carried)
+
+    def quarantine(self, path, error):
+        """Drop the rows of a log file which raised error, reporting it."""
+        self.store.remove_rows(path)
+        line = failure_line(path, error)
+        self.quarantined[path] = {
+            'type': type(error).__name__,
+            'message': str(error),
+            'line': line
+        }
+        print('Quarantined {0}{1}: {2}: {3}'.format(path,
+            '' if line is None else ' (line {0})'.format(line),
+            type(error).__name__, error), file=sys.stderr)
+
+    def refresh(self):
+        """Bring the kept rows up to date, returning the files extracted."""
+        changed, removed = self.poll()
+        for path in removed:
+            self.store.remove_rows(path)
+            self.quarantined.pop(path, None)
+        extracted = []
+        for path in changed:
+            # rows may still be current from before a restart
+            if not self.store.rows_are_current(path, self.header):
+                self.extract(path)
+                extracted.append(path)
+        if len(changed) > 0 or len(removed) > 0:
+            self.dirty = True
+        return extracted
+
+    def _file_rows(self):
+        for path in sorted(self.stats):
+            kept = self.store.load_rows(path, self.header)
+            if kept is not None:
+                yield (path,) + kept
+
+    def publish(self):
+        """Atomically replace the snapshot with the kept rows."""
+        temp_path = self.out_path + '.tmp'
+        attrs, comments, rows = write_arff_rows(temp_path, self._file_rows())
+        os.replace(temp_path, self.out_path)
+        self.dirty = False
+        self.last_publish = time.monotonic()
+        print('Published {0} rows from {1} files to {2}{3}'.format(
+            rows, len(comments), self.out_path,
+            '' if len(self.quarantined) == 0 else
+            ' ({0} quarantined)'.format(len(self.quarantined))))
+
+    def publish_due(self):
+        return self.dirty and (self.last_publish is None or
+            time.monotonic() - self.last_publish >= self.publish_interval)
+
+    def run(self, interval=DEFAULT_INTERVAL, once=False):
+        """
+        Poll every interval seconds, publishing when due, until stopped.
+
+        With once, poll a single time and publish if anything changed.
+        """
+        while True:
+            self.refresh()
+            if self.publish_due():
+                self.publish()
+            if once:
+                return
+            time.sleep(interval)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Keep the features of a directory of SQL-Tutor logs up '
+                    'to date as the logs change.')
+    parser.add_argument('dir_path', help='directory containing .log files')
+    parser.add_argument('out_name', help='output name (without extension)')
+    parser.add_argument('--store', dest='store_path', required=True,
+        help='SQLite store (see store.py) to ingest logs into and keep '
+             'extracted rows in')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+        help='seconds between polls of the log directory (default %(default)s)')
+    parser.add_argument('--publish-interval', type=float,
+        default=DEFAULT_PUBLISH_INTERVAL,
+        help='minimum seconds between snapshots (default %(default)s)')
+    parser.add_argument('--once', action='store_true',
+        help='poll once, publish if anything changed, and exit')
+    return parser.parse_args(argv)
+
+
+def _stop(signum, frame):
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    signal.signal(signal.SIGTERM, _stop)
+    store = Store(args.store_path)
+    watcher = Watcher(args.dir_path, args.out_name, store,
+        args.publish_interval)
+    try:
+        watcher.run(args.interval, args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()